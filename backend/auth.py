@@ -1,9 +1,15 @@
 from fastapi import Security, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
+from collections import OrderedDict
+import hashlib
 import os
+import threading
+import time
 from enum import Enum
-from typing import List, Optional
+from typing import Dict, List, Optional
+from database import get_supabase, run_db
+from crud import user as user_crud
 
 class UserRole(str, Enum):
     PARTNER = "PARTNER"
@@ -14,30 +20,100 @@ class UserRole(str, Enum):
 SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET", "placeholder-secret")
 ALGORITHM = "HS256"
 
+# Verified claims are reused until the token expires; the same bearer token arrives on every dashboard call
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+# Upper bound for tokens without an exp claim
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "300"))
+
 security = HTTPBearer()
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(security)):
+class TokenCache:
+    """Bounded LRU of verified claims keyed by a SHA-256 digest of the raw token."""
+
+    def __init__(self, max_entries: int = AUTH_CACHE_SIZE, ttl: int = AUTH_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        # Digest rather than the token itself so the cache never holds usable credentials
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[Dict]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, expires_at = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return payload
+                del self._entries[key]
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, token: str, payload: Dict):
+        expires_at = time.time() + self.ttl
+        if isinstance(payload.get("exp"), (int, float)):
+            expires_at = min(expires_at, payload["exp"])
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (payload, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        return {**self.stats, "entries": len(self._entries)}
+
+token_cache = TokenCache()
+
+def verify_token(token: str) -> Dict:
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=[ALGORITHM], options={"verify_aud": False})
+        token_cache.set(token, payload)
+    return payload
+
+ROLE_VALUES = frozenset(role.value for role in UserRole)
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(security), db=Depends(get_supabase)):
     token = credentials.credentials
     try:
-        payload = jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=[ALGORITHM], options={"verify_aud": False})
-        user_id: str = payload.get("sub")
-        # In Supabase, custom roles are often in user_metadata or app_metadata
-        # For this portal, we'll assume they are stored in the profiles table and optionally injected into JWT
-        role: str = payload.get("role", "MANAGER") # Default to lowest role if not in JWT
-        
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        
-        return {"id": user_id, "role": role}
+        payload = verify_token(token)
     except JWTError:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
 
+    user_id: str = payload.get("sub")
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+
+    # profiles.role is authoritative (update_user_role writes it); the cached lookup
+    # only goes to the DB on a miss. Users without a valid profile role get the lowest
+    # role, never a role claimed in the token.
+    # Peek at the cache first so a hit skips the thread-pool hop as well
+    profile = user_crud.profile_cache.get(user_id)
+    role = profile.get("role") if profile is not None else await run_db(user_crud.get_user_role, db, user_id)
+    if role not in ROLE_VALUES:
+        role = UserRole.MANAGER.value
+
+    return {"id": user_id, "role": role}
+
 class RoleChecker:
     def __init__(self, allowed_roles: List[UserRole]):
         self.allowed_roles = allowed_roles
+        self._allowed = frozenset(role.value for role in allowed_roles)
 
     def __call__(self, user=Depends(get_current_user)):
-        if user["role"] not in [role.value for role in self.allowed_roles]:
+        if user["role"] not in self._allowed:
             raise HTTPException(
                 status_code=403, 
                 detail=f"Role {user['role']} does not have access to this resource"
@@ -0,0 +1,40 @@
+"""
+Per-request auth overhead: full jwt.decode plus a rebuilt role list (old path)
+against the verified-token cache plus a frozenset lookup (current path).
+
+    cd backend && python -m bench.auth_overhead [iterations]
+"""
+import sys
+import time
+from jose import jwt
+import auth
+from auth import ALGORITHM, SUPABASE_JWT_SECRET, RoleChecker, UserRole, token_cache, verify_token
+
+ROLES = [UserRole.PARTNER, UserRole.DIRECTOR, UserRole.MANAGER]
+
+def uncached(token: str):
+    payload = jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=[ALGORITHM], options={"verify_aud": False})
+    return payload["role"] in [role.value for role in ROLES]
+
+def cached(token: str, checker=RoleChecker(ROLES)):
+    payload = verify_token(token)
+    return payload["role"] in checker._allowed
+
+def measure(fn, token: str, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(token)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    token = jwt.encode({"sub": "bench-user", "role": "MANAGER", "exp": int(time.time()) + 3600},
+                       SUPABASE_JWT_SECRET, algorithm=ALGORITHM)
+    token_cache.clear()
+    before = measure(uncached, token, iterations)
+    after = measure(cached, token, iterations)
+    print(f"iterations:          {iterations}")
+    print(f"jwt.decode + list:   {before:8.2f} us/request")
+    print(f"cache + frozenset:   {after:8.2f} us/request")
+    print(f"speedup:             {before / after:8.1f}x")
+    print(f"cache stats:         {auth.token_cache.get_stats()}")
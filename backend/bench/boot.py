@@ -0,0 +1,134 @@
+"""
+Worker boot time and memory under gunicorn, lazy imports (the default) against
+GUNICORN_PRELOAD=true. Runs the Procfile command against the in-memory database
+and reports, per mode, how long until every worker has finished application
+startup and the memory of each worker: idle after boot, then after traffic on
+the report and export routes that import pandas / openpyxl / pyarrow.
+RSS counts shared pages in full in every process; PSS splits them between the
+processes mapping them, so total PSS (master + workers) is the real footprint.
+
+    cd backend && python -m bench.boot [--workers 4] [--modes lazy,preload] [--requests 120]
+"""
+import argparse
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+import httpx
+from jose import jwt
+
+SECRET = "bench-secret"
+PARTNER = "00000000-0000-0000-0000-00000000000a"
+# Each of these imports a heavy module on first use in the worker that serves it
+HEAVY_ROUTES = ("/api/reports/aging", "/api/export/invoices?format=xlsx", "/api/export/invoices?format=parquet")
+LOG_LINE = re.compile(r"\[(\d+)\] \[INFO\] (Booting worker|Application startup complete)")
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[name] = int(value.split()[0]) / 1024
+    return {"rss": fields["Rss"], "pss": fields["Pss"], "private": fields["Private_Clean"] + fields["Private_Dirty"]}
+
+class Server:
+    def __init__(self, workers: int, preload: bool):
+        self.workers = workers
+        self.port = free_port()
+        env = {**os.environ, "SUPABASE_URL": "memory://bench", "SUPABASE_KEY": "bench", "SUPABASE_JWT_SECRET": SECRET,
+               "REPORTS_USE_RPC": "false", "GUNICORN_PRELOAD": "true" if preload else "false"}
+        self.booting: Dict[int, float] = {}
+        self.ready: Dict[int, float] = {}
+        self._all_ready = threading.Event()
+        self.started = time.perf_counter()
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-w", str(workers), "-k", "uvicorn.workers.UvicornWorker",
+             "-b", f"127.0.0.1:{self.port}", "main:app"],
+            env=env, stderr=subprocess.PIPE, text=True,
+        )
+        threading.Thread(target=self._read_log, daemon=True).start()
+
+    def _read_log(self):
+        for line in self.proc.stderr:
+            match = LOG_LINE.search(line)
+            if not match:
+                continue
+            pid, event = int(match.group(1)), match.group(2)
+            (self.booting if event == "Booting worker" else self.ready)[pid] = time.perf_counter()
+            if len(self.ready) >= self.workers:
+                self._all_ready.set()
+
+    def wait_ready(self, timeout: float = 120) -> float:
+        if not self._all_ready.wait(timeout):
+            self.stop()
+            raise SystemExit(f"workers not ready after {timeout}s")
+        return max(self.ready.values()) - self.started
+
+    def worker_pids(self) -> List[int]:
+        with open(f"/proc/{self.proc.pid}/task/{self.proc.pid}/children") as f:
+            return [int(pid) for pid in f.read().split()]
+
+    def memory(self) -> Dict[str, float]:
+        workers = [memory_mb(pid) for pid in self.worker_pids()]
+        master = memory_mb(self.proc.pid)
+        return {
+            **{f"worker_{k}": sum(w[k] for w in workers) / len(workers) for k in ("rss", "pss", "private")},
+            "master_rss": master["rss"],
+            "total_pss": master["pss"] + sum(w["pss"] for w in workers),
+        }
+
+    def stop(self):
+        self.proc.terminate()
+        self.proc.wait(30)
+
+def traffic(port: int, requests: int):
+    claims = {"sub": PARTNER, "role": "PARTNER", "email": "partner@bench.local"}
+    headers = {"Authorization": "Bearer " + jwt.encode(claims, SECRET, algorithm="HS256")}
+
+    def one(i: int):
+        # A new connection per request so the kernel spreads them across workers
+        response = httpx.get(f"http://127.0.0.1:{port}{HEAVY_ROUTES[i % len(HEAVY_ROUTES)]}", headers=headers, timeout=60)
+        response.raise_for_status()
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(one, range(requests)))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", default="lazy,preload")
+    parser.add_argument("--requests", type=int, default=120, help="requests across the heavy routes after boot")
+    args = parser.parse_args()
+
+    print(f"{args.workers} uvicorn workers, in-memory database; memory in MiB, worker figures are per-worker means")
+    print(f"  {'mode':<8} {'phase':<8} {'boot s':>7} {'worker s':>9} {'master RSS':>11} {'worker RSS':>11} "
+          f"{'worker PSS':>11} {'private':>8} {'total PSS':>10}")
+    for mode in args.modes.split(","):
+        server = Server(args.workers, preload=mode == "preload")
+        try:
+            boot = server.wait_ready()
+            # Fork-to-ready per worker: in preload mode the app import happened before the fork
+            per_worker = sum(server.ready[pid] - server.booting.get(pid, server.started) for pid in server.ready) / len(server.ready)
+            time.sleep(1)  # let startup work (search index build) settle
+            phases = [("idle", server.memory())]
+            traffic(server.port, args.requests)
+            phases.append(("traffic", server.memory()))
+        finally:
+            server.stop()
+        for phase, m in phases:
+            print(f"  {mode:<8} {phase:<8} {boot:>7.2f} {per_worker:>9.2f} {m['master_rss']:>11.1f} {m['worker_rss']:>11.1f} "
+                  f"{m['worker_pss']:>11.1f} {m['worker_private']:>8.1f} {m['total_pss']:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""
+Latency, throughput and memory for every API endpoint, driven through the ASGI
+app against the in-memory Supabase stand-in (utils/memory_db.py) with an
+injected per-query round trip.
+
+    cd backend && python -m bench.endpoints [--scales 1000,10000,100000] [--latency-ms 2]
+        [--requests 40] [--concurrency 8] [--only list.,reports.] [--out results.json]
+        [--baseline bench/baseline.json] [--save-baseline] [--threshold 0.25] [--min-delta-ms 5]
+
+A scale is the number of invoices; the other tables are seeded in proportion.
+Each scenario reports p50/p99 latency, throughput and the process's peak RSS
+so far (scales run smallest first). Pass --save-baseline on the reference
+machine to store the run, and later runs are compared against it: a p50/p99
+or RSS increase, or a throughput drop, beyond --threshold is flagged and the
+exit status is 1. A missing baseline file is exit status 2. bench/baseline.json
+is committed; re-record it with the default options when the reference machine
+or an intended performance trade-off changes.
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import resource
+import sys
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+# The app reads these at import time
+os.environ["SUPABASE_URL"] = "memory://bench"
+os.environ.setdefault("SUPABASE_KEY", "bench")
+os.environ["SUPABASE_JWT_SECRET"] = "bench-secret"
+# The stand-in has no SQL functions, so skip straight to the Python report paths
+os.environ.setdefault("REPORTS_USE_RPC", "false")
+
+import httpx
+from jose import jwt
+import database
+import main
+from utils.cache import invalidate_tables
+from utils.search import search_index
+from utils.visibility import visibility_index
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+TABLES = ("profiles", "clients", "proposals", "assignments", "invoices", "receipts", "audit_logs")
+USERS = {
+    "PARTNER": "00000000-0000-0000-0000-00000000000a",
+    "DIRECTOR": "00000000-0000-0000-0000-00000000000b",
+    "MANAGER": "00000000-0000-0000-0000-00000000000c",
+}
+SERVICES = ("Statutory audit", "Tax audit", "GST advisory", "Transfer pricing", "Due diligence")
+NAMES = "acme globex initech umbrella stark wayne wonka tyrell hooli vandelay oscorp monarch".split()
+UPLOAD_ROWS = 10_000
+
+def token(role: str) -> dict:
+    claims = {"sub": USERS[role], "role": role, "email": f"{role.lower()}@bench.local"}
+    return {"Authorization": "Bearer " + jwt.encode(claims, os.environ["SUPABASE_JWT_SECRET"], algorithm="HS256")}
+
+def seed(db, invoices: int):
+    rng = random.Random(invoices)
+    n_clients, n_assignments, n_proposals, n_receipts = max(invoices // 10, 10), max(invoices // 4, 10), max(invoices // 4, 10), invoices // 2
+    start = date(2023, 4, 1)
+
+    db.seed("profiles", [{"id": uid, "role": role, "email": f"{role.lower()}@bench.local", "full_name": role.title()}
+                         for role, uid in USERS.items()])
+    db.seed("clients", [{
+        "client_code": f"C{i:06d}",
+        "client_name": f"{rng.choice(NAMES).title()} {rng.choice(NAMES).title()} Ltd",
+        "group_name": f"{rng.choice(NAMES).title()} Group",
+        "status": "Active" if i % 5 else "Inactive",
+        "relationship_partner": USERS["PARTNER"],
+        "created_by": USERS["PARTNER"],
+        "created_at": f"{start + timedelta(days=i % 700)}T10:00:00+00:00",
+    } for i in range(n_clients)])
+    db.seed("proposals", [{
+        "proposal_id": i + 1,
+        "client_code": f"C{i % n_clients:06d}",
+        "service_line": rng.choice(SERVICES),
+        "scope_summary": f"{rng.choice(SERVICES)} for {rng.choice(NAMES)} division",
+        "estimated_fees": rng.randrange(50_000, 500_000),
+        "status": ("Draft", "Sent", "Won", "Lost")[i % 4],
+        "issued_date": str(start + timedelta(days=i % 700)),
+        "created_by": USERS["PARTNER"],
+        "created_at": f"{start + timedelta(days=i % 700)}T11:00:00+00:00",
+    } for i in range(n_proposals)])
+    # Every 20th assignment is the manager's, which drives their visible client set
+    db.seed("assignments", [{
+        "assignment_code": f"A{i:06d}",
+        "client_code": f"C{i % n_clients:06d}",
+        "title": f"{rng.choice(SERVICES)} FY{rng.randint(21, 25)}",
+        "partner_lead": USERS["PARTNER"],
+        "manager": USERS["MANAGER"] if i % 20 == 0 else None,
+        "contracted_fee": rng.randrange(100_000, 1_000_000),
+        "status": ("Planned", "Ongoing", "Completed")[i % 3],
+        "start_date": str(start + timedelta(days=i % 700)),
+        "created_by": USERS["PARTNER"],
+        "created_at": f"{start + timedelta(days=i % 700)}T12:00:00+00:00",
+    } for i in range(n_assignments)])
+    db.seed("invoices", [{
+        "invoice_no": f"INV{i:07d}",
+        "assignment_code": f"A{i % n_assignments:06d}",
+        "invoice_date": str(start + timedelta(days=i % 700)),
+        "due_date": str(start + timedelta(days=i % 700 + 30)),
+        "amount_before_tax": float(rng.randrange(10_000, 200_000)),
+        "gst_pct": 18.0,
+        "status": ("Issued", "Part-Paid", "Paid", "Overdue")[i % 4],
+        "created_by": USERS["DIRECTOR"],
+        "created_at": f"{start + timedelta(days=i % 700)}T13:00:00+00:00",
+    } for i in range(invoices)])
+    db.seed("receipts", [{
+        "receipt_id": i + 1,
+        "invoice_no": f"INV{i * 2 % invoices:07d}",
+        "amount_received": float(rng.randrange(5_000, 100_000)),
+        "tds_amount": 1000.0,
+        "receipt_date": str(start + timedelta(days=i % 700 + 20)),
+        "mode": "NEFT",
+        "created_by": USERS["DIRECTOR"],
+        "created_at": f"{start + timedelta(days=i % 700 + 20)}T14:00:00+00:00",
+    } for i in range(n_receipts)])
+    return {"clients": n_clients, "assignments": n_assignments, "proposals": n_proposals, "invoices": invoices, "receipts": n_receipts}
+
+def upload_csv(entity: str, prefix: str, sizes: dict) -> bytes:
+    out = io.StringIO()
+    if entity == "clients":
+        out.write("client_code,client_name,group_name,industry,status\n")
+        for i in range(UPLOAD_ROWS):
+            out.write(f"{prefix}{i:06d},Upload {prefix} {i},Bench Group,Manufacturing,Active\n")
+    else:
+        out.write("invoice_no,assignment_code,invoice_date,amount_before_tax,gst_pct\n")
+        for i in range(UPLOAD_ROWS):
+            out.write(f"{prefix}{i:06d},A{i % sizes['assignments']:06d},2024-06-01,25000,18\n")
+    return out.getvalue().encode()
+
+class Scenario(NamedTuple):
+    method: str
+    path: str
+    # Builds the request kwargs (or the upload body) per request, so writes get unique keys
+    make_kwargs: Optional[Callable[[], Any]]
+    role: str
+    expected: int
+    # Invalidate cached reports before each request to time the computation, not the cache
+    cold_cache: bool = False
+    concurrency: Optional[int] = None
+
+def scenarios(sizes: dict) -> Dict[str, Scenario]:
+    seq = itertools.count()
+    half_invoices = f"INV{sizes['invoices'] // 2:07d}"
+    items = {
+        "health": Scenario("GET", "/api/health", None, "PARTNER", 200),
+        "list.clients": Scenario("GET", "/api/clients", lambda: {"params": {"limit": 50}}, "PARTNER", 200),
+        "list.clients.manager": Scenario("GET", "/api/clients", lambda: {"params": {"limit": 50}}, "MANAGER", 200),
+        "list.clients.search": Scenario("GET", "/api/clients", lambda: {"params": {"limit": 50, "search": "acme"}}, "PARTNER", 200),
+        "list.proposals.recent": Scenario("GET", "/api/proposals", lambda: {"params": {"limit": 50, "sort": "-created_at"}}, "PARTNER", 200),
+        "list.assignments": Scenario("GET", "/api/assignments", lambda: {"params": {"limit": 100}}, "PARTNER", 200),
+        "list.invoices": Scenario("GET", "/api/invoices", lambda: {"params": {"limit": 50}}, "DIRECTOR", 200),
+        "list.invoices.500": Scenario("GET", "/api/invoices", lambda: {"params": {"limit": 500}}, "DIRECTOR", 200),
+        "list.invoices.sparse": Scenario("GET", "/api/invoices", lambda: {"params": {"limit": 500, "fields": "invoice_no,status,amount_with_tax"}}, "DIRECTOR", 200),
+        "list.invoices.by_date": Scenario("GET", "/api/invoices", lambda: {"params": {"limit": 100, "sort": "-invoice_date", "date_from": "2024-01-01"}}, "DIRECTOR", 200),
+        "list.receipts": Scenario("GET", "/api/receipts", lambda: {"params": {"limit": 100}}, "DIRECTOR", 200),
+        "statement": Scenario("GET", "/api/clients/C000001/statement", None, "PARTNER", 200),
+        "receivables.open": Scenario("GET", "/api/receivables/open", lambda: {"params": {"limit": 100}}, "PARTNER", 200),
+        "search": Scenario("GET", "/api/search", lambda: {"params": {"q": "acme glob"}}, "PARTNER", 200),
+        "search.manager": Scenario("GET", "/api/search", lambda: {"params": {"q": "tax audit"}}, "MANAGER", 200),
+        "dashboard": Scenario("GET", "/api/dashboard", None, "PARTNER", 200),
+        "reports.billing": Scenario("GET", "/api/reports/billing", None, "PARTNER", 200, cold_cache=True),
+        "reports.aging": Scenario("GET", "/api/reports/aging", None, "PARTNER", 200, cold_cache=True),
+        "reports.aging.by_client": Scenario("GET", "/api/reports/aging", lambda: {"params": {"group_by": "client", "basis": "due_date"}}, "PARTNER", 200, cold_cache=True),
+        "reports.aging.cached": Scenario("GET", "/api/reports/aging", None, "PARTNER", 200),
+        "reports.proposals": Scenario("GET", "/api/reports/proposals", None, "PARTNER", 200, cold_cache=True),
+        "reports.cache_stats": Scenario("GET", "/api/reports/cache-stats", None, "PARTNER", 200),
+        "audit_logs": Scenario("GET", "/api/audit-logs", None, "PARTNER", 200),
+        "audit_logs.stats": Scenario("GET", "/api/audit-logs/stats", None, "PARTNER", 200),
+        "users": Scenario("GET", "/api/users", None, "PARTNER", 200),
+        "users.role": Scenario("PUT", f"/api/users/{USERS['MANAGER']}/role", lambda: {"json": {"role": "MANAGER"}}, "PARTNER", 200),
+        "create.client": Scenario("POST", "/api/clients", lambda: {"json": {
+            "client_code": f"NEWC{next(seq):06d}", "client_name": "Bench New Client", "relationship_partner": USERS["PARTNER"]}}, "PARTNER", 201),
+        "create.proposal": Scenario("POST", "/api/proposals", lambda: {"json": {
+            "client_code": "C000001", "service_line": "Tax audit", "estimated_fees": 100000}}, "PARTNER", 201),
+        "create.assignment": Scenario("POST", "/api/assignments", lambda: {"json": {
+            "assignment_code": f"NEWA{next(seq):06d}", "client_code": "C000001", "title": "Bench assignment"}}, "PARTNER", 201),
+        "create.invoice": Scenario("POST", "/api/invoices", lambda: {"json": {
+            "invoice_no": f"NEWI{next(seq):06d}", "assignment_code": "A000001", "invoice_date": "2024-06-01",
+            "amount_before_tax": 50000}}, "DIRECTOR", 201),
+        "create.receipt": Scenario("POST", "/api/receipts", lambda: {"json": {
+            "invoice_no": half_invoices, "amount_received": 100.0, "receipt_date": "2024-07-01", "mode": "NEFT"}}, "DIRECTOR", 201),
+        "ledger.reconcile": Scenario("POST", "/api/ledger/reconcile", lambda: {"params": {"dry_run": "true"}}, "PARTNER", 200, concurrency=1),
+        "export.invoices.csv": Scenario("GET", "/api/export/invoices", lambda: {"params": {"format": "csv"}}, "PARTNER", 200, concurrency=1),
+        "export.invoices.parquet": Scenario("GET", "/api/export/invoices", lambda: {"params": {"format": "parquet"}}, "PARTNER", 200, concurrency=1),
+        "export.invoices.arrow": Scenario("GET", "/api/export/invoices", lambda: {"params": {"format": "arrow"}}, "PARTNER", 200, concurrency=1),
+        "export.clients.xlsx": Scenario("GET", "/api/export/clients", lambda: {"params": {"format": "xlsx"}}, "PARTNER", 200, concurrency=1),
+        "export.workbook": Scenario("GET", "/api/export/workbook", lambda: {}, "PARTNER", 200, concurrency=1),
+        "upload.clients.10k": Scenario("UPLOAD", "/api/upload/clients", lambda: upload_csv("clients", f"U{next(seq):03d}", sizes), "PARTNER", 202, concurrency=1),
+        "upload.invoices.10k": Scenario("UPLOAD", "/api/upload/invoices", lambda: upload_csv("invoices", f"UI{next(seq):03d}", sizes), "DIRECTOR", 202, concurrency=1),
+    }
+    return items
+
+# Heavy scenarios run fewer times so the 100k scale finishes in reasonable time
+REPEATS = {"export.": 3, "upload.": 2, "ledger.": 3, "reports.aging": 10}
+
+def percentile(sorted_values, pct: float) -> float:
+    # Nearest-rank, so p99 of a small sample is its slowest request rather than an interpolation
+    return sorted_values[max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)]
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+async def run_scenario(client: httpx.AsyncClient, spec: Scenario, requests: int, concurrency: int):
+    method, path, make_kwargs, role, expected, cold_cache, cap = spec
+    headers = token(role)
+    gate = asyncio.Semaphore(min(concurrency, cap or concurrency))
+    latencies, failures = [], []
+
+    async def one(timed: bool = True):
+        kwargs = make_kwargs() if make_kwargs else {}
+        async with gate:
+            if cold_cache:
+                invalidate_tables("invoices", "receipts", "assignments", "proposals")
+            start = time.perf_counter()
+            if method == "UPLOAD":
+                response = await client.post(path, headers=headers, files={"file": ("bench.csv", kwargs, "text/csv")})
+                # The import runs as a background task inside the same ASGI call, so it is done here
+                job = (await client.get(f"/api/upload/jobs/{response.json()['job_id']}", headers=headers)).json()
+                if job["status"] != "completed":
+                    failures.append(f"import {job['status']}: {job.get('summary')}")
+            else:
+                response = await client.request(method, path, headers=headers, **kwargs)
+            if timed:
+                latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code != expected:
+            failures.append(f"{response.status_code}: {response.text[:200]}")
+
+    if method == "GET":
+        # Untimed first request: lazy imports, index builds and (unless cold) the report cache
+        await one(timed=False)
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": requests,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "throughput_rps": round(requests / wall, 1),
+        "peak_rss_mb": peak_rss_mb(),
+        "errors": len(failures),
+        "first_error": failures[0] if failures else None,
+    }
+
+async def run_scale(db, invoices: int, args) -> dict:
+    db.clear()
+    seed_start = time.perf_counter()
+    sizes = seed(db, invoices)
+    # Fresh data under the same table names: drop everything derived from the previous scale
+    invalidate_tables(*TABLES)
+    db.rpc("ledger_refresh", {"p_invoice_nos": None, "p_client_codes": None}).execute()
+    visibility_index.reset()
+    search_index.build(db)
+    print(f"\n== {invoices} invoices {sizes} seeded in {time.perf_counter() - seed_start:.1f}s, latency {db.latency_ms} ms/query")
+
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name, spec in scenarios(sizes).items():
+            if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                continue
+            requests = next((n for prefix, n in REPEATS.items() if name.startswith(prefix)), args.requests)
+            result = await run_scenario(client, spec, min(requests, args.requests), args.concurrency)
+            results[f"{invoices}/{name}"] = result
+            flag = f"  ERRORS {result['errors']}: {result['first_error']}" if result["errors"] else ""
+            print(f"  {name:<26} p50 {result['p50_ms']:9.2f} ms  p99 {result['p99_ms']:9.2f} ms  "
+                  f"{result['throughput_rps']:8.1f} req/s  peak RSS {result['peak_rss_mb']:7.1f} MB{flag}")
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta_ms: float):
+    regressions = []
+    print(f"\n== vs baseline ({baseline['meta'].get('recorded_at')}, threshold {threshold:.0%})")
+    for key, current in results.items():
+        before = baseline["results"].get(key)
+        if not before:
+            print(f"  {key:<36} not in baseline")
+            continue
+        changes = {
+            "p50_ms": current["p50_ms"] / before["p50_ms"] - 1 if before["p50_ms"] else 0,
+            "p99_ms": current["p99_ms"] / before["p99_ms"] - 1 if before["p99_ms"] else 0,
+            "throughput_rps": before["throughput_rps"] / current["throughput_rps"] - 1 if current["throughput_rps"] else 0,
+            "peak_rss_mb": current["peak_rss_mb"] / before["peak_rss_mb"] - 1 if before["peak_rss_mb"] else 0,
+        }
+        # A few ms either way on a fast endpoint is scheduling noise, not a regression
+        for metric in ("p50_ms", "p99_ms"):
+            if current[metric] - before[metric] < min_delta_ms:
+                changes[metric] = min(changes[metric], 0)
+        if current["throughput_rps"] and 1000 / current["throughput_rps"] - 1000 / before["throughput_rps"] < min_delta_ms:
+            changes["throughput_rps"] = min(changes["throughput_rps"], 0)
+        worse = [f"{metric} {before[metric]} -> {current[metric]}" for metric, change in changes.items() if change > threshold]
+        status = "REGRESSED " + "; ".join(worse) if worse else "ok"
+        print(f"  {key:<36} p50 {changes['p50_ms']:+7.1%}  p99 {changes['p99_ms']:+7.1%}  {status}")
+        if worse:
+            regressions.append(key)
+    return regressions
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="1000,10000,100000", help="comma-separated invoice counts")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="injected latency per PostgREST call")
+    parser.add_argument("--jitter-ms", type=float, default=0.5)
+    parser.add_argument("--requests", type=int, default=40, help="requests per scenario (heavy ones run fewer)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--only", type=lambda s: [p for p in s.split(",") if p], default=None,
+                        help="comma-separated scenario name prefixes")
+    parser.add_argument("--out", help="write this run's results as JSON")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative change that counts as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="ignore latency increases smaller than this")
+    args = parser.parse_args()
+
+    db = database.get_client()
+    db.latency_ms, db.jitter_ms = args.latency_ms, args.jitter_ms
+    results = {}
+    for scale in (int(s) for s in args.scales.split(",")):
+        results.update(asyncio.run(run_scale(db, scale, args)))
+
+    run = {
+        "meta": {
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            **{k: getattr(args, k) for k in ("scales", "latency_ms", "jitter_ms", "requests", "concurrency")},
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(run, f, indent=2)
+
+    failed = [key for key, result in results.items() if result["errors"]]
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("latency_ms") != args.latency_ms:
+            print(f"\nNote: baseline was recorded with {baseline['meta'].get('latency_ms')} ms injected latency")
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+    else:
+        # Not comparing is not passing: without a baseline no regression can be detected
+        print(f"\nNo baseline at {args.baseline}, nothing was compared. "
+              f"Record one with --save-baseline on the reference machine.", file=sys.stderr)
+        sys.exit(2)
+
+    if failed:
+        print(f"\n{len(failed)} scenario(s) had errors: {', '.join(failed)}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+    sys.exit(1 if failed or regressions else 0)
+
+if __name__ == "__main__":
+    main_cli()
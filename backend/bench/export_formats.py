@@ -0,0 +1,46 @@
+"""
+Export generation time, file size and re-ingest time per format for an
+invoices export, using the same chunk generators the /api/export responses
+stream (no DB, so this is pure serialization cost).
+
+    cd backend && python -m bench.export_formats [rows]
+"""
+import io
+import sys
+import time
+import pandas as pd
+import pyarrow as pa
+from bench.serialization import make_page
+from schemas.transaction import Invoice
+from utils import io as io_utils
+
+def generate(fmt: str, rows):
+    schema = io_utils.arrow_schema(Invoice)
+    if fmt == "csv":
+        return b"".join(chunk.encode() for chunk in io_utils._csv_chunks(iter(rows), list(Invoice.model_fields)))
+    if fmt == "xlsx":
+        return b"".join(io_utils._excel_chunks(iter(rows), "bench", list(Invoice.model_fields)))
+    return b"".join(io_utils._columnar_chunks(iter(rows), schema, fmt))
+
+READERS = {
+    "csv": lambda data: pd.read_csv(io.BytesIO(data)),
+    "xlsx": lambda data: pd.read_excel(io.BytesIO(data), sheet_name="Data"),
+    "parquet": lambda data: pd.read_parquet(io.BytesIO(data)),
+    "arrow": lambda data: pa.ipc.open_stream(data).read_all().to_pandas(),
+}
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rows = make_page(n)["items"]
+    print(f"{n} invoice rows, batches of {io_utils.ARROW_BATCH_ROWS}, parquet compression {io_utils.PARQUET_COMPRESSION}")
+    print(f"  {'format':<8} {'generate':>10} {'size':>11} {'re-ingest':>10}  dtypes")
+    for fmt in ("csv", "xlsx", "parquet", "arrow"):
+        start = time.perf_counter()
+        data = generate(fmt, rows)
+        generated = time.perf_counter() - start
+        start = time.perf_counter()
+        frame = READERS[fmt](data)
+        read = time.perf_counter() - start
+        # What a downstream reader gets without any parsing hints
+        typed = sorted({str(t) for t in frame.dtypes})
+        print(f"  {fmt:<8} {generated * 1000:8.0f} ms {len(data) / 1024 / 1024:8.2f} MiB {read * 1000:8.0f} ms  {', '.join(typed)}")
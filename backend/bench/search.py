@@ -0,0 +1,87 @@
+"""
+Search index build time and query latency on synthetic data.
+
+    cd backend && python -m bench.search [entities]
+"""
+import random
+import statistics
+import sys
+import time
+from utils.search import SearchIndex
+
+WORDS = ("acme globex initech umbrella stark wayne wonka tyrell cyberdyne soylent hooli vandelay "
+         "pied piper massive dynamic aperture oscorp gringotts monarch nakatomi").split()
+SUFFIXES = ("Pvt Ltd", "Ltd", "LLP", "Industries", "Holdings", "Traders", "Enterprises", "Foods")
+SERVICES = ("Statutory audit", "Tax audit", "Internal audit", "GST advisory", "Transfer pricing", "Due diligence")
+
+class _StubDB:
+    """Just enough of the PostgREST surface for SearchIndex.build."""
+    def __init__(self, tables):
+        self.tables = tables
+
+    def table(self, name):
+        return _Query(self.tables[name])
+
+class _Query:
+    def __init__(self, rows):
+        self.rows, self._gt, self._limit = rows, None, None
+
+    def select(self, *_):
+        return self
+
+    def gt(self, key, value):
+        self._gt = (key, value)
+        return self
+
+    def order(self, key):
+        self._key = key
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def execute(self):
+        # Rows are generated in key order, so a bisect-free slice is enough here
+        start = 0
+        if self._gt:
+            key, value = self._gt
+            start = next(i for i, r in enumerate(self.rows) if str(r[key]) == str(value)) + 1
+        return type("R", (), {"data": self.rows[start:start + self._limit]})
+
+def make_tables(n: int):
+    rng = random.Random(7)
+    clients = []
+    for i in range(n // 4):
+        name = f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {rng.choice(SUFFIXES)}"
+        clients.append({"client_code": f"C{i:06d}", "client_name": name, "group_name": f"{name.split()[0]} Group"})
+    assignments = [{
+        "assignment_code": f"A{i:06d}",
+        "client_code": clients[rng.randrange(len(clients))]["client_code"],
+        "title": f"{rng.choice(SERVICES)} FY{rng.randint(18, 25)}",
+    } for i in range(n // 2)]
+    proposals = [{
+        "proposal_id": i,
+        "client_code": clients[rng.randrange(len(clients))]["client_code"],
+        "scope_summary": f"{rng.choice(SERVICES)} for {rng.choice(WORDS)} division",
+    } for i in range(n - len(clients) - len(assignments))]
+    return {"clients": clients, "assignments": assignments, "proposals": proposals}
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    index = SearchIndex()
+    db = _StubDB(make_tables(n))
+    start = time.perf_counter()
+    index.build(db)
+    print(f"build: {time.perf_counter() - start:.2f}s  {index.get_stats()}")
+
+    queries = ["acme", "acm", "globx", "stark holdings", "tax audit", "C001234", "due dilgence", "wonka foods ltd", "tyrel"]
+    for q in queries:
+        timings = []
+        for _ in range(20):
+            t = time.perf_counter()
+            results = index.search(q, 20)
+            timings.append((time.perf_counter() - t) * 1000)
+        timings.sort()
+        top = results[0]["label"] if results else "-"
+        print(f"  {q!r:<20} p50 {statistics.median(timings):6.2f} ms  p99 {timings[-1]:6.2f} ms  top: {top}")
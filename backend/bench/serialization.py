@@ -0,0 +1,66 @@
+"""
+CPU per request for a 10k-row invoices page: response_model validation and
+encoding (what FastAPI did before) against orjson on trusted rows, plus the
+cost and size of gzip/brotli on the encoded body.
+
+    cd backend && python -m bench.serialization [rows] [repeats]
+"""
+import gzip
+import json
+import sys
+import time
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from schemas.pagination import Page
+from schemas.transaction import Invoice
+from utils.compression import BROTLI_QUALITY, GZIP_LEVEL, brotli
+from utils.serialization import TrustedJSONResponse
+
+def make_page(rows: int):
+    # Shaped like PostgREST output: JSON scalars only
+    return {
+        "items": [{
+            "invoice_no": f"INV-{i:06d}",
+            "assignment_code": f"ASG-{i % 800:04d}",
+            "invoice_date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+            "amount_before_tax": 10000.0 + i,
+            "gst_pct": 18.0,
+            "amount_with_tax": round((10000.0 + i) * 1.18, 2),
+            "due_date": None,
+            "status": ("Issued", "Part-Paid", "Paid", "Overdue")[i % 4],
+            "created_at": "2024-01-01T10:00:00+00:00",
+            "created_by": "11111111-1111-1111-1111-111111111111",
+        } for i in range(rows)],
+        "next_cursor": "WyIyMDI0LTAxLTAxIiwiSU5WLTAwMDAwMCJd",
+        "limit": rows,
+    }
+
+def cpu_ms(fn, repeats: int) -> float:
+    start = time.process_time()
+    for _ in range(repeats):
+        result = fn()
+    return (time.process_time() - start) / repeats * 1000, result
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    page = make_page(rows)
+    adapter = TypeAdapter(Page[Invoice])
+
+    cases = {
+        "validate + jsonable_encoder + json": lambda: json.dumps(jsonable_encoder(adapter.validate_python(page))).encode(),
+        "validate + pydantic dump_json": lambda: adapter.dump_json(adapter.validate_python(page)),
+        "trusted orjson": lambda: TrustedJSONResponse(page).body,
+    }
+    print(f"{rows} rows, {repeats} repeats, CPU ms per request")
+    body = None
+    for name, fn in cases.items():
+        ms, out = cpu_ms(fn, repeats)
+        body = out
+        print(f"  {name:<36} {ms:8.2f} ms  {len(out) / 1024:8.1f} KiB")
+
+    ms, out = cpu_ms(lambda: gzip.compress(body, compresslevel=GZIP_LEVEL), repeats)
+    print(f"  {'gzip level ' + str(GZIP_LEVEL):<36} {ms:8.2f} ms  {len(out) / 1024:8.1f} KiB")
+    if brotli is not None:
+        ms, out = cpu_ms(lambda: brotli.compress(body, quality=BROTLI_QUALITY), repeats)
+        print(f"  {'brotli quality ' + str(BROTLI_QUALITY):<36} {ms:8.2f} ms  {len(out) / 1024:8.1f} KiB")
@@ -0,0 +1,184 @@
+"""
+Exercise the PostgREST transport (utils/transport.py) against a local fake
+PostgREST server with injected faults: keep-alive reuse under concurrency,
+retries on flaky reads, no retry of writes, per-call timeouts and the circuit
+breaker opening, failing fast and recovering. Exits 1 if any check fails.
+
+    cd backend && python -m bench.transport
+"""
+import itertools
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ["SUPABASE_URL"] = "memory://bench"
+
+import httpx
+from supabase import ClientOptions, create_client
+from database import InstrumentedClient
+from utils.transport import CircuitBreaker, CircuitOpenError, ResilientTransport, build_http_client, call_timeout
+
+POOL_SIZE = 8
+ROWS = [{"client_code": f"C{i:03d}", "client_name": f"Client {i}"} for i in range(20)]
+
+class FakePostgREST(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.mode, self.delay = "ok", 0.0
+        self.connections = 0
+        self.requests = {"GET": 0, "POST": 0}
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def count(self, method: str) -> int:
+        with self.lock:
+            self.requests[method] += 1
+        return next(self.counter)
+
+    def handle_error(self, request, client_address):
+        # The timeout and breaker scenarios hang up on slow responses on purpose
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out as one write; without this, delayed ACKs add ~40ms per response
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("Content-Range", f"0-{len(ROWS) - 1}/{len(ROWS)}")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _handle(self, method: str):
+        n = self.server.count(method)
+        if self.headers.get("Content-Length"):
+            self.rfile.read(int(self.headers["Content-Length"]))
+        mode = self.server.mode
+        if mode == "down" or (mode == "flaky" and n % 2 == 0):
+            return self._reply(503, {"message": "upstream unavailable", "code": "503"})
+        if mode == "reset" and n % 2 == 0:
+            # Drop the connection without a response, as a restarting load balancer would
+            self.close_connection = True
+            return
+        if mode == "slow":
+            time.sleep(self.server.delay)
+        self._reply(200 if method == "GET" else 201, ROWS if method == "GET" else ROWS[:1])
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+def make_client(server: FakePostgREST):
+    # HTTP/2 is only negotiated over TLS (ALPN) and the fake server is plain HTTP/1.1
+    transport = ResilientTransport(POOL_SIZE, http2=False, retries=2, backoff=0.01, backoff_max=0.05,
+                                   breaker=CircuitBreaker(threshold=5, reset_after=0.5))
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    # Any three-part token passes the SDK's key check; the fake server ignores auth
+    http = build_http_client(transport)
+    client = create_client(url, "bench.service.key", options=ClientOptions(httpx_client=http))
+    protocol = http.get(f"{url}/rest/v1/clients").http_version
+    return InstrumentedClient(client), transport, protocol
+
+def read(db):
+    return db.table("clients").select("*").execute().data
+
+def check(results, name: str, ok: bool, detail: str):
+    results.append(ok)
+    print(f"  {'ok  ' if ok else 'FAIL'} {name:<22} {detail}")
+
+def main():
+    server = FakePostgREST()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    db, transport, protocol = make_client(server)
+    results = []
+    print(f"fake PostgREST on port {server.server_address[1]}, pool {POOL_SIZE}, {protocol}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(32) as pool:
+        rows = list(pool.map(lambda _: len(read(db)), range(2000)))
+    elapsed = time.perf_counter() - start
+    check(results, "keep-alive", all(r == len(ROWS) for r in rows) and server.connections <= POOL_SIZE,
+          f"2000 reads from 32 threads over {server.connections} connections, {2000 / elapsed:.0f} req/s")
+
+    server.mode = "flaky"
+    before = transport.stats["retries"]
+    ok = sum(1 for _ in range(50) if len(read(db)) == len(ROWS))
+    check(results, "flaky reads retried", ok == 50, f"50/50 succeeded after {transport.stats['retries'] - before} retries")
+
+    server.requests["POST"] = 0
+    try:
+        db.table("clients").insert({"client_code": "X1"}).execute()
+        # The write may have landed on the first try; only a 503 that was not retried is expected here
+        check(results, "write not retried", server.requests["POST"] == 1, "succeeded")
+    except Exception as e:
+        check(results, "write not retried", server.requests["POST"] == 1,
+              f"{type(e).__name__} after {server.requests['POST']} POST")
+
+    server.mode = "reset"
+    ok = sum(1 for _ in range(20) if len(read(db)) == len(ROWS))
+    check(results, "dropped connections", ok == 20, "20/20 reads survived servers closing mid-request")
+
+    server.mode, server.delay = "slow", 1.0
+    start = time.perf_counter()
+    try:
+        with call_timeout(0.1):
+            read(db)
+        check(results, "per-call timeout", False, "slow read returned")
+    except httpx.TimeoutException as e:
+        elapsed = time.perf_counter() - start
+        check(results, "per-call timeout", elapsed < 0.6, f"{type(e).__name__} after {elapsed:.2f}s (3 attempts x 0.1s)")
+    transport.breaker.record_success()
+
+    server.mode = "down"
+    failures = 0
+    while transport.breaker.state != "open" and failures < 20:
+        try:
+            read(db)
+        except Exception:
+            failures += 1
+    hits = server.requests["GET"]
+    start = time.perf_counter()
+    try:
+        read(db)
+        fast = False
+    except CircuitOpenError:
+        fast = True
+    elapsed = (time.perf_counter() - start) * 1000
+    check(results, "breaker opens", fast and server.requests["GET"] == hits,
+          f"open after {failures} failed reads; next read rejected in {elapsed:.2f} ms without a round trip")
+
+    server.mode = "ok"
+    time.sleep(transport.breaker.reset_after)
+    recovered = len(read(db)) == len(ROWS) and transport.breaker.state == "closed"
+    check(results, "breaker recovers", recovered, f"half-open probe succeeded, state {transport.breaker.state}")
+
+    print(json.dumps(transport.get_stats(), indent=1))
+    server.shutdown()
+    raise SystemExit(0 if all(results) else 1)
+
+if __name__ == "__main__":
+    main()
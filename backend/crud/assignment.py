@@ -1,16 +1,20 @@
 from supabase import Client
 from schemas.assignment import AssignmentCreate, AssignmentUpdate
 from schemas.audit import AuditLogCreate
-from crud.audit import log_action
+from crud.audit import log_action, log_actions
+from crud import ledger
 from uuid import UUID
 from datetime import date
+from typing import List, Optional
+from utils.cache import invalidate_tables
+from utils.pagination import DEFAULT_PAGE_SIZE, apply_filters, paginate
+from utils.fields import select_columns
+from utils.visibility import visibility_index
+from utils.search import search_index
 
-def get_assignments(db: Client):
-    result = db.table("assignments").select("*").execute()
-    return result.data
+SORT_FIELDS = {"title", "created_at"}
 
-def create_assignment(db: Client, assignment: AssignmentCreate, user_id: UUID):
-    data = assignment.dict(exclude_unset=True)
+def _serialize(data: dict):
     # Convert dates to string for JSON serialization
     for key in ["start_date", "end_date"]:
         if key in data and data[key]:
@@ -19,10 +23,23 @@ def create_assignment(db: Client, assignment: AssignmentCreate, user_id: UUID):
     for key in ["partner_lead", "director", "manager"]:
         if key in data and data[key]:
             data[key] = str(data[key])
-            
+    return data
+
+def get_assignments(db: Client, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                    sort: Optional[str] = None, status: Optional[str] = None, client_code: Optional[str] = None,
+                    date_from: Optional[date] = None, date_to: Optional[date] = None, fields: Optional[List[str]] = None):
+    query = db.table("assignments").select(select_columns(fields, "assignment_code", sort, SORT_FIELDS))
+    query = apply_filters(query, {"status": status, "client_code": client_code}, "start_date", date_from, date_to)
+    return paginate(query, "assignment_code", sort, SORT_FIELDS, cursor, limit)
+
+def create_assignment(db: Client, assignment: AssignmentCreate, user_id: UUID):
+    data = _serialize(assignment.dict(exclude_unset=True))
     data["created_by"] = str(user_id)
     result = db.table("assignments").insert(data).execute()
+    invalidate_tables("assignments")
     new_asg = result.data[0]
+    visibility_index.assignment_changed(new_asg)
+    search_index.upsert("assignment", [new_asg])
     
     log_action(db, AuditLogCreate(
         user_id=str(user_id),
@@ -34,14 +51,47 @@ def create_assignment(db: Client, assignment: AssignmentCreate, user_id: UUID):
     
     return new_asg
 
+def create_assignments(db: Client, assignments: List[AssignmentCreate], user_id: UUID):
+    rows = []
+    for assignment in assignments:
+        data = _serialize(assignment.dict(exclude_unset=True))
+        data["created_by"] = str(user_id)
+        rows.append(data)
+    if not rows:
+        return []
+
+    result = db.table("assignments").insert(rows).execute()
+    invalidate_tables("assignments")
+    for new_asg in result.data:
+        visibility_index.assignment_changed(new_asg)
+    search_index.upsert("assignment", result.data)
+    log_actions(db, [
+        AuditLogCreate(
+            user_id=str(user_id),
+            action="CREATE",
+            entity_type="assignment",
+            entity_id=new_asg["assignment_code"],
+            details=f"Imported assignment: {new_asg['title']}"
+        )
+        for new_asg in result.data
+    ])
+    return result.data
+
+def delete_assignments(db: Client, assignment_codes: List[str]):
+    if not assignment_codes:
+        return []
+    deleted = db.table("assignments").delete().in_("assignment_code", assignment_codes).execute().data
+    # ON DELETE CASCADE removes dependent rows too
+    invalidate_tables("assignments", "invoices", "receipts")
+    visibility_index.assignments_deleted(asg["assignment_code"] for asg in deleted)
+    search_index.remove("assignment", [asg["assignment_code"] for asg in deleted])
+    ledger.refresh(db, [], {asg["client_code"] for asg in deleted if asg.get("client_code")})
+    return deleted
+
 def update_assignment(db: Client, assignment_code: str, assignment: AssignmentUpdate):
-    data = assignment.dict(exclude_unset=True)
-    for key in ["start_date", "end_date"]:
-        if key in data and data[key]:
-            data[key] = data[key].isoformat()
-    for key in ["partner_lead", "director", "manager"]:
-        if key in data and data[key]:
-            data[key] = str(data[key])
-            
+    data = _serialize(assignment.dict(exclude_unset=True))
     result = db.table("assignments").update(data).eq("assignment_code", assignment_code).execute()
+    invalidate_tables("assignments")
+    visibility_index.assignment_changed(result.data[0])
+    search_index.upsert("assignment", result.data)
     return result.data[0]
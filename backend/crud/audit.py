@@ -1,21 +1,273 @@
 from supabase import Client
 from schemas.audit import AuditLogCreate
-from datetime import datetime
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Optional
+from collections import deque
+import argparse
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+from utils.audit_archive import audit_archive, parse_ts, sort_key
+from utils.pagination import DEFAULT_PAGE_SIZE, InvalidQueryError, apply_filters, decode_cursor, encode_cursor, iter_select, paginate
 
-def log_action(db: Client, log: AuditLogCreate):
-    data = {
+logger = logging.getLogger(__name__)
+
+# Write-behind settings. AUDIT_WRITE_MODE=sync restores one insert per action everywhere.
+AUDIT_WRITE_MODE = os.getenv("AUDIT_WRITE_MODE", "async")
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "100"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "2.0"))
+AUDIT_SPOOL_DIR = os.getenv("AUDIT_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "kpca-audit-spool"))
+# Rows older than this many days are moved to the archive by `python -m crud.audit archive`
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", "365"))
+# Rows per archive pass: written to segments, then deleted from audit_logs
+AUDIT_ARCHIVE_BATCH = int(os.getenv("AUDIT_ARCHIVE_BATCH", "50000"))
+DELETE_BATCH = 500
+
+AUDIT_SORT_FIELDS = {"created_at"}
+
+def _audit_row(log: AuditLogCreate, created_at: str):
+    return {
         "user_id": log.user_id,
         "action": log.action,
         "entity_type": log.entity_type,
         "entity_id": log.entity_id,
         "details": log.details,
-        "created_at": datetime.now().isoformat()
+        "created_at": created_at
     }
-    return db.table("audit_logs").insert(data).execute()
-
-def get_audit_logs(db: Client, limit: int = 100):
-    return db.table("audit_logs") \
-        .select("*") \
-        .order("created_at", desc=True) \
-        .limit(limit) \
-        .execute().data
+
+class AuditQueue:
+    """
+    In-process buffer for audit rows, flushed as multi-row inserts by a
+    background thread when AUDIT_BATCH_SIZE rows are waiting or every
+    AUDIT_FLUSH_INTERVAL seconds. Failed batches go to a per-process JSONL
+    spool file; any worker's next flush replays every spool in the directory.
+    """
+
+    def __init__(self, batch_size: int = AUDIT_BATCH_SIZE, flush_interval: float = AUDIT_FLUSH_INTERVAL,
+                 spool_dir: str = AUDIT_SPOOL_DIR):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_dir = spool_dir
+        self.db = None
+        self._rows = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.stats = {
+            "enqueued": 0,
+            "flushed": 0,
+            "flushes": 0,
+            "failed_flushes": 0,
+            "spooled": 0,
+            "respooled": 0,
+            "replayed": 0,
+            "last_flush_at": None,
+        }
+
+    def put(self, db: Client, rows: List[dict]):
+        with self._lock:
+            self.db = db
+            self._rows.extend(rows)
+            self.stats["enqueued"] += len(rows)
+            depth = len(self._rows)
+            # Started lazily so each gunicorn worker gets its own thread after fork
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._run, name="audit-flusher", daemon=True)
+                self._thread.start()
+        if depth >= self.batch_size:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _take(self) -> List[dict]:
+        with self._lock:
+            batch = []
+            while self._rows and len(batch) < self.batch_size:
+                batch.append(self._rows.popleft())
+            return batch
+
+    def flush(self):
+        """Write everything currently queued. Safe to call from any thread."""
+        with self._flush_lock:
+            if self.db is None:
+                return
+            self._replay_spool()
+            while True:
+                batch = self._take()
+                if not batch:
+                    break
+                try:
+                    self.db.table("audit_logs").insert(batch).execute()
+                    self.stats["flushed"] += len(batch)
+                    self.stats["flushes"] += 1
+                    self.stats["last_flush_at"] = datetime.now().isoformat()
+                except Exception as e:
+                    self.stats["failed_flushes"] += 1
+                    logger.warning("Audit flush failed, spooling %d rows: %s", len(batch), e)
+                    self._spool(batch)
+
+    def _spool_files(self) -> List[str]:
+        return glob.glob(os.path.join(self.spool_dir, "*.jsonl"))
+
+    def _spool(self, rows: List[dict], stat: str = "spooled"):
+        # "spooled" counts rows from failed flushes, "respooled" rows written back after a failed replay
+        os.makedirs(self.spool_dir, exist_ok=True)
+        # pid is read per call: the queue may be created in a preloading master before fork
+        with open(os.path.join(self.spool_dir, f"audit-{os.getpid()}.jsonl"), "a") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+        self.stats[stat] += len(rows)
+
+    def _replay_spool(self):
+        for path in self._spool_files():
+            replay_path = f"{path}.replay-{os.getpid()}"
+            try:
+                # Atomic claim so two workers never replay the same file
+                os.replace(path, replay_path)
+            except FileNotFoundError:
+                continue
+            with open(replay_path) as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+            os.remove(replay_path)
+            for offset in range(0, len(rows), self.batch_size):
+                batch = rows[offset:offset + self.batch_size]
+                try:
+                    self.db.table("audit_logs").insert(batch).execute()
+                    self.stats["replayed"] += len(batch)
+                except Exception:
+                    # Still failing: put the remainder back and try again next tick
+                    self._spool(rows[offset:], stat="respooled")
+                    return
+
+    def close(self):
+        """Stop the flusher and drain the queue; called on application shutdown."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def get_stats(self):
+        with self._lock:
+            depth = len(self._rows)
+        spool_depth = 0
+        for path in self._spool_files():
+            with open(path) as f:
+                spool_depth += sum(1 for _ in f)
+        return {**self.stats, "queue_depth": depth, "spool_depth": spool_depth, "mode": AUDIT_WRITE_MODE}
+
+audit_queue = AuditQueue()
+
+def log_action(db: Client, log: AuditLogCreate, sync: bool = False):
+    """Record an audit entry. Pass sync=True when the write must not return before the entry is stored."""
+    data = _audit_row(log, datetime.now().isoformat())
+    if sync or AUDIT_WRITE_MODE == "sync":
+        return db.table("audit_logs").insert(data).execute()
+    audit_queue.put(db, [data])
+
+def log_actions(db: Client, logs: List[AuditLogCreate], sync: bool = False):
+    # One multi-row insert for bulk operations instead of a round trip per entry
+    if not logs:
+        return None
+    created_at = datetime.now().isoformat()
+    rows = [_audit_row(log, created_at) for log in logs]
+    if sync or AUDIT_WRITE_MODE == "sync":
+        return db.table("audit_logs").insert(rows).execute()
+    audit_queue.put(db, rows)
+
+def _day_start(day: Optional[date]) -> Optional[datetime]:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc) if day else None
+
+def get_audit_logs(db: Client, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                   user_id: Optional[str] = None, entity_type: Optional[str] = None, entity_id: Optional[str] = None,
+                   action: Optional[str] = None, date_from: Optional[date] = None, date_to: Optional[date] = None):
+    """
+    Newest first across audit_logs and the archive, with one (created_at, id) keyset
+    cursor for both. The archive is only opened when the page reaches back far enough.
+    """
+    # Flush first so entries from this worker are visible right after the write that produced them
+    audit_queue.flush()
+    filters = {"user_id": user_id, "entity_type": entity_type, "entity_id": entity_id, "action": action}
+    query = apply_filters(db.table("audit_logs").select("*"), filters, "created_at", date_from, date_to)
+    page = paginate(query, "id", "-created_at", AUDIT_SORT_FIELDS, cursor, limit)
+
+    start, end = _day_start(date_from), _day_start(date_to + timedelta(days=1) if date_to else None)
+    newest_archived = audit_archive.newest(filters, start, end)
+    if newest_archived is None or (page["next_cursor"] and sort_key(page["items"][-1])[0] > newest_archived):
+        return page
+
+    before = None
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        try:
+            before = (parse_ts(created_at), int(row_id))
+        except (TypeError, ValueError):
+            raise InvalidQueryError("Invalid cursor")
+    archived = audit_archive.query(filters, before, start, end, page["limit"] + 1)
+
+    # A run interrupted before its delete leaves rows in both places
+    seen = {row["id"] for row in page["items"]}
+    rows = page["items"] + [row for row in archived if row["id"] not in seen]
+    rows.sort(key=sort_key, reverse=True)
+    has_more = len(rows) > page["limit"] or page["next_cursor"] is not None
+    rows = rows[:page["limit"]]
+    next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if has_more and rows else None
+    return {"items": rows, "next_cursor": next_cursor, "limit": page["limit"]}
+
+def _batches(rows, size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def archive_logs(db: Client, retention_days: int = AUDIT_RETENTION_DAYS, dry_run: bool = False,
+                 batch_size: int = AUDIT_ARCHIVE_BATCH):
+    """
+    Move audit_logs rows older than the retention window into archive segments.
+    Each batch is written and indexed before it is deleted, so a failed run leaves
+    rows in both places (reads de-duplicate by id) rather than in neither.
+    """
+    audit_queue.flush()
+    now = datetime.now(timezone.utc)
+    cutoff = (now - timedelta(days=retention_days)).isoformat()
+    run = now.strftime("%Y%m%dT%H%M%S")
+    report = {"cutoff": cutoff, "dry_run": dry_run, "archived": 0, "deleted": 0, "segments": []}
+    old_rows = iter_select(lambda: db.table("audit_logs").select("*").lt("created_at", cutoff), "id")
+
+    with audit_archive.writer_lock():
+        for n, batch in enumerate(_batches(old_rows, batch_size)):
+            report["archived"] += len(batch)
+            if dry_run:
+                continue
+            added = audit_archive.append(batch, f"{run}-{n}")
+            report["segments"].extend(segment["file"] for segment in added)
+            ids = [row["id"] for row in batch]
+            for offset in range(0, len(ids), DELETE_BATCH):
+                db.table("audit_logs").delete().in_("id", ids[offset:offset + DELETE_BATCH]).execute()
+            report["deleted"] += len(ids)
+    logger.info("Audit archive run %s: %s", run, {k: v for k, v in report.items() if k != "segments"})
+    return report
+
+if __name__ == "__main__":
+    # python -m crud.audit archive [--dry-run] [--retention-days N]
+    from database import get_supabase
+    parser = argparse.ArgumentParser(description="Audit log maintenance")
+    parser.add_argument("command", choices=["archive"])
+    parser.add_argument("--dry-run", action="store_true", help="Count rows that would be archived")
+    parser.add_argument("--retention-days", type=int, default=AUDIT_RETENTION_DAYS)
+    args = parser.parse_args()
+    print(archive_logs(get_supabase(), args.retention_days, args.dry_run))
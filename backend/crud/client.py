@@ -1,28 +1,43 @@
 from supabase import Client
 from schemas.client import ClientCreate, ClientUpdate
 from schemas.audit import AuditLogCreate
-from crud.audit import log_action
+from crud.audit import log_action, log_actions
 from typing import List, Optional
 from uuid import UUID
+from datetime import date
+from utils.cache import invalidate_tables
+from utils.pagination import DEFAULT_PAGE_SIZE, apply_filters, paginate, paginate_in
+from utils.fields import select_columns
+from utils.visibility import visibility_index
+from utils.search import search_index
 
-def get_clients(db: Client, user_id: UUID, role: str):
-    # RLS will actually handle most of this, but we can add explicit filters if needed
-    query = db.table("clients").select("*")
+SORT_FIELDS = {"client_name", "created_at"}
+# Sorts paginate_in can merge across batches of visible codes; client_name is free text, so
+# only the database orders it correctly. Assumes client codes are letters and digits of one case.
+MERGE_SORT_FIELDS = {"created_at"}
+
+def get_clients(db: Client, user_id: UUID, role: str, cursor: Optional[str] = None,
+                limit: int = DEFAULT_PAGE_SIZE, sort: Optional[str] = None, status: Optional[str] = None,
+                date_from: Optional[date] = None, date_to: Optional[date] = None, fields: Optional[List[str]] = None):
+    def query():
+        selected = db.table("clients").select(select_columns(fields, "client_code", sort, SORT_FIELDS))
+        return apply_filters(selected, {"status": status}, "created_at", date_from, date_to)
     
-    # If using service role, we might need to apply filters manually if we want to mimic RLS
-    # But usually we rely on RLS with the user's token. 
-    # For now, let's assume we are using service role and applying logic
+    # The backend uses the service role key, so RLS does not apply and the manager rule
+    # (relationship partner OR tagged on an assignment) is enforced here via the index
     if role == "MANAGER":
-        # Managers see clients where they are relationship partner OR tagged in assignments
-        # This is complex for a single query in PostgREST without a view, 
-        # but RLS in schema.sql already handles it.
-        pass 
+        visible = visibility_index.visible_clients(db, user_id)
+        if not visible:
+            return {"items": [], "next_cursor": None, "limit": limit}
+        return paginate_in(query, "client_code", sorted(visible), "client_code", sort, SORT_FIELDS, cursor, limit,
+                           merge_sorts=MERGE_SORT_FIELDS)
     
-    result = query.execute()
-    return result.data
+    return paginate(query(), "client_code", sort, SORT_FIELDS, cursor, limit)
 
 def create_client(db: Client, client: ClientCreate, user_id: UUID):
     data = client.dict(exclude_unset=True)
+    if data.get("relationship_partner"):
+        data["relationship_partner"] = str(data["relationship_partner"])
     data["created_by"] = str(user_id)
     
     # If client_code is missing, Supabase/trigger should handle or we generate here
@@ -31,7 +46,10 @@ def create_client(db: Client, client: ClientCreate, user_id: UUID):
         pass
 
     result = db.table("clients").insert(data).execute()
+    invalidate_tables("clients")
     new_client = result.data[0]
+    visibility_index.client_changed(new_client)
+    search_index.upsert("client", [new_client])
     
     log_action(db, AuditLogCreate(
         user_id=str(user_id),
@@ -43,10 +61,54 @@ def create_client(db: Client, client: ClientCreate, user_id: UUID):
     
     return new_client
 
+def create_clients(db: Client, clients: List[ClientCreate], user_id: UUID):
+    # Bulk path for imports: one insert and one audit insert per batch
+    rows = []
+    for client in clients:
+        data = client.dict(exclude_unset=True)
+        if data.get("relationship_partner"):
+            data["relationship_partner"] = str(data["relationship_partner"])
+        data["created_by"] = str(user_id)
+        rows.append(data)
+    if not rows:
+        return []
+
+    result = db.table("clients").insert(rows).execute()
+    invalidate_tables("clients")
+    for new_client in result.data:
+        visibility_index.client_changed(new_client)
+    search_index.upsert("client", result.data)
+    log_actions(db, [
+        AuditLogCreate(
+            user_id=str(user_id),
+            action="CREATE",
+            entity_type="client",
+            entity_id=new_client["client_code"],
+            details=f"Imported client: {new_client['client_name']}"
+        )
+        for new_client in result.data
+    ])
+    return result.data
+
+def delete_clients(db: Client, client_codes: List[str]):
+    if not client_codes:
+        return []
+    deleted = db.table("clients").delete().in_("client_code", client_codes).execute().data
+    # ON DELETE CASCADE removes dependent rows too
+    invalidate_tables("clients", "proposals", "assignments", "invoices", "receipts")
+    visibility_index.clients_deleted(c["client_code"] for c in deleted)
+    search_index.remove_clients(c["client_code"] for c in deleted)
+    return deleted
+
 def update_client(db: Client, client_code: str, client: ClientUpdate):
     data = client.dict(exclude_unset=True)
+    if data.get("relationship_partner"):
+        data["relationship_partner"] = str(data["relationship_partner"])
     result = db.table("clients").update(data).eq("client_code", client_code).execute()
+    invalidate_tables("clients")
     updated_client = result.data[0]
+    visibility_index.client_changed(updated_client)
+    search_index.upsert("client", [updated_client])
     
     # In a real app, we'd pass user_id here too
     # For now, we'll log it as a system action or modify the signature if needed
@@ -0,0 +1,75 @@
+from supabase import Client
+from typing import Any, Callable, Dict
+from functools import partial
+import asyncio
+import logging
+import time
+from database import run_db
+from crud import assignment as assignment_crud
+from crud import proposal as proposal_crud
+from crud import reports as reports_crud
+from utils.pagination import apply_filters, batched
+from utils.visibility import visibility_index
+
+logger = logging.getLogger(__name__)
+
+FINANCE_ROLES = {"PARTNER", "DIRECTOR"}
+RECENT_ITEMS = 5
+
+def count_rows(db: Client, table: str, key: str, filters: Dict[str, Any]) -> int:
+    # count=exact with a one-row page: the total comes back in Content-Range, no rows needed
+    query = apply_filters(db.table(table).select(key, count="exact"), filters)
+    return query.limit(1).execute().count or 0
+
+def count_active_clients(db: Client, user_id: str, role: str) -> int:
+    if role != "MANAGER":
+        return count_rows(db, "clients", "client_code", {"status": "Active"})
+    visible = visibility_index.visible_clients(db, user_id)
+    if not visible:
+        return 0
+    # The batches are disjoint, so their counts add up
+    return sum(
+        db.table("clients").select("client_code", count="exact").eq("status", "Active")
+        .in_("client_code", batch).limit(1).execute().count or 0
+        for batch in batched(sorted(visible))
+    )
+
+def dashboard_sections(user: Dict) -> Dict[str, Callable[[Client], Any]]:
+    """Independent sections of the home page; each is one DB task and runs concurrently with the rest."""
+    sections = {
+        "active_clients": partial(count_active_clients, user_id=user["id"], role=user["role"]),
+        "proposal_stats": reports_crud.get_proposal_stats,
+        "ongoing_assignments": partial(count_rows, table="assignments", key="assignment_code", filters={"status": "Ongoing"}),
+        "overdue_invoices": partial(count_rows, table="invoices", key="invoice_no", filters={"status": "Overdue"}),
+        "recent_proposals": lambda db: proposal_crud.get_proposals(
+            db, limit=RECENT_ITEMS, sort="-created_at",
+            fields=["client_code", "service_line", "issued_date", "status"])["items"],
+        "recent_assignments": lambda db: assignment_crud.get_assignments(
+            db, limit=RECENT_ITEMS, sort="-created_at",
+            fields=["assignment_code", "title", "start_date", "status"])["items"],
+    }
+    # Same role rules as /api/reports/billing and /api/reports/aging
+    if user["role"] in FINANCE_ROLES:
+        sections["billing"] = reports_crud.get_billing_summary
+        sections["aging"] = reports_crud.get_ar_aging
+    return sections
+
+async def _run_section(db: Client, name: str, fn: Callable[[Client], Any]):
+    start = time.perf_counter()
+    try:
+        data, error = await run_db(fn, db), None
+    except Exception as e:
+        # One failing section shouldn't blank the whole dashboard
+        logger.warning("Dashboard section %s failed: %s", name, e)
+        data, error = None, str(e)
+    return name, data, error, round((time.perf_counter() - start) * 1000, 2)
+
+async def get_dashboard(db: Client, user: Dict):
+    start = time.perf_counter()
+    results = await asyncio.gather(*(_run_section(db, name, fn) for name, fn in dashboard_sections(user).items()))
+    return {
+        "sections": {name: data for name, data, error, ms in results},
+        "errors": {name: error for name, data, error, ms in results if error},
+        "timings_ms": {name: ms for name, data, error, ms in results},
+        "total_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
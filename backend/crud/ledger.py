@@ -0,0 +1,138 @@
+from supabase import Client
+from typing import Iterable, Optional
+from datetime import datetime
+import argparse
+import logging
+from utils.cache import invalidate_tables
+from utils.pagination import DEFAULT_PAGE_SIZE, apply_filters, batched, iter_select, paginate
+from utils.transport import call_timeout
+from utils.lazy import lazy_module
+
+pd = lazy_module("pandas")
+
+logger = logging.getLogger(__name__)
+
+OPEN_ITEM_SORT_FIELDS = {"invoice_date", "outstanding"}
+# Differences below this are rounding noise between DECIMAL and float sums
+TOLERANCE = 0.005
+# A full rebuild recomputes every invoice in one statement; well past the per-call DB_TIMEOUT
+REBUILD_TIMEOUT = 300
+
+def refresh(db: Client, invoice_nos: Optional[Iterable[str]] = None, client_codes: Optional[Iterable[str]] = None):
+    """
+    Bring the ledger up to date for the given invoices (and clients), or rebuild
+    everything when both are None. Runs as one transaction in ledger_refresh.
+    A failure here never fails the write that triggered it; reconcile repairs drift.
+    """
+    params = {
+        "p_invoice_nos": list(invoice_nos) if invoice_nos is not None else None,
+        "p_client_codes": list(client_codes) if client_codes is not None else None,
+    }
+    if params["p_invoice_nos"] == [] and not params["p_client_codes"]:
+        return 0
+    try:
+        refreshed = db.rpc("ledger_refresh", params).execute().data
+    except Exception as e:
+        logger.warning("Ledger refresh failed for %s: %s", params, e)
+        return 0
+    # ledger_refresh may also move invoice status
+    invalidate_tables("invoices", "invoice_ledger", "client_ledger")
+    return refreshed
+
+def get_client_ledger(db: Client, client_code: str):
+    rows = db.table("client_ledger").select("*").eq("client_code", client_code).execute().data
+    return rows[0] if rows else None
+
+def get_client_statement(db: Client, client_code: str, date_from=None, date_to=None):
+    summary = get_client_ledger(db, client_code)
+    invoices = list(iter_select(lambda: apply_filters(
+        db.table("invoice_ledger").select("*").eq("client_code", client_code), {}, "invoice_date", date_from, date_to
+    ), "invoice_no"))
+    invoices.sort(key=lambda r: (r["invoice_date"] or "", r["invoice_no"]))
+
+    receipts = []
+    invoice_nos = [r["invoice_no"] for r in invoices]
+    for batch in batched(invoice_nos):
+        receipts.extend(iter_select(lambda: db.table("receipts").select("*").in_("invoice_no", batch), "receipt_id"))
+    receipts.sort(key=lambda r: (r["receipt_date"], r["receipt_id"]))
+
+    return {
+        "client_code": client_code,
+        "generated_at": datetime.now().isoformat(),
+        "summary": summary or {"client_code": client_code, "billed": 0, "paid": 0, "tds": 0, "outstanding": 0, "open_invoices": 0},
+        "invoices": invoices,
+        "receipts": receipts,
+    }
+
+def get_open_items(db: Client, client_code: Optional[str] = None, cursor: Optional[str] = None,
+                   limit: int = DEFAULT_PAGE_SIZE, sort: Optional[str] = None):
+    query = db.table("invoice_ledger").select("*").gt("outstanding", TOLERANCE)
+    query = apply_filters(query, {"client_code": client_code})
+    return paginate(query, "invoice_no", sort, OPEN_ITEM_SORT_FIELDS, cursor, limit)
+
+def expected_balances(db: Client) -> "pd.DataFrame":
+    """Recompute per-invoice balances from the source tables, independently of ledger_refresh."""
+    invoices = pd.DataFrame(
+        list(iter_select(lambda: db.table("invoices").select("invoice_no, assignment_code, amount_with_tax, status"), "invoice_no")),
+        columns=["invoice_no", "assignment_code", "amount_with_tax", "status"]
+    )
+    receipts = pd.DataFrame(
+        list(iter_select(lambda: db.table("receipts").select("receipt_id, invoice_no, amount_received, tds_amount"), "receipt_id")),
+        columns=["receipt_id", "invoice_no", "amount_received", "tds_amount"]
+    )
+    billed = invoices["amount_with_tax"].fillna(0).astype(float).where(invoices["status"] != "Cancelled", 0.0)
+    settled = receipts.groupby("invoice_no")[["amount_received", "tds_amount"]].sum()
+    expected = pd.DataFrame({
+        "invoice_no": invoices["invoice_no"],
+        "billed": billed,
+        "paid": invoices["invoice_no"].map(settled["amount_received"]).fillna(0).astype(float),
+        "tds": invoices["invoice_no"].map(settled["tds_amount"]).fillna(0).astype(float),
+    })
+    expected["outstanding"] = expected["billed"] - expected["paid"] - expected["tds"]
+    return expected.set_index("invoice_no")
+
+def reconcile(db: Client, fix: bool = True, sample: int = 20):
+    """
+    Compare the ledger with balances recomputed from invoices and receipts.
+    With fix=True the whole ledger is rebuilt and verified again.
+    """
+    expected = expected_balances(db)
+    actual = pd.DataFrame(
+        list(iter_select(lambda: db.table("invoice_ledger").select("invoice_no, billed, paid, tds, outstanding"), "invoice_no")),
+        columns=["invoice_no", "billed", "paid", "tds", "outstanding"]
+    ).set_index("invoice_no").astype(float)
+
+    missing = expected.index.difference(actual.index)
+    orphaned = actual.index.difference(expected.index)
+    common = expected.index.intersection(actual.index)
+    diff = (expected.loc[common] - actual.loc[common]).abs()
+    drifted = diff[(diff > TOLERANCE).any(axis=1)].index
+
+    report = {
+        "invoices": int(len(expected)),
+        "missing": int(len(missing)),
+        "orphaned": int(len(orphaned)),
+        "drifted": int(len(drifted)),
+        "sample": [str(x) for x in list(missing[:sample]) + list(drifted[:sample])],
+        "fixed": False,
+    }
+    if fix and (len(missing) or len(orphaned) or len(drifted)):
+        with call_timeout(REBUILD_TIMEOUT):
+            db.rpc("ledger_refresh", {"p_invoice_nos": None, "p_client_codes": None}).execute()
+        invalidate_tables("invoices", "invoice_ledger", "client_ledger")
+        report["fixed"] = True
+        report["after_fix"] = reconcile(db, fix=False, sample=sample)
+    return report
+
+if __name__ == "__main__":
+    # python -m crud.ledger reconcile [--dry-run]
+    from database import get_supabase
+    parser = argparse.ArgumentParser(description="Receivables ledger maintenance")
+    parser.add_argument("command", choices=["reconcile"])
+    parser.add_argument("--dry-run", action="store_true", help="Report drift without rebuilding")
+    args = parser.parse_args()
+    result = reconcile(get_supabase(), fix=not args.dry_run)
+    print(result)
+    if result["missing"] or result["orphaned"] or result["drifted"]:
+        remaining = result.get("after_fix", result)
+        raise SystemExit(1 if remaining["missing"] or remaining["orphaned"] or remaining["drifted"] else 0)
@@ -1,13 +1,23 @@
 from supabase import Client
 from schemas.proposal import ProposalCreate, ProposalUpdate
 from schemas.audit import AuditLogCreate
-from crud.audit import log_action
+from crud.audit import log_action, log_actions
 from uuid import UUID
 from datetime import date
+from typing import List, Optional
+from utils.cache import invalidate_tables
+from utils.pagination import DEFAULT_PAGE_SIZE, apply_filters, paginate
+from utils.fields import select_columns
+from utils.search import search_index
 
-def get_proposals(db: Client):
-    result = db.table("proposals").select("*").execute()
-    return result.data
+SORT_FIELDS = {"created_at"}
+
+def get_proposals(db: Client, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                  sort: Optional[str] = None, status: Optional[str] = None, client_code: Optional[str] = None,
+                  date_from: Optional[date] = None, date_to: Optional[date] = None, fields: Optional[List[str]] = None):
+    query = db.table("proposals").select(select_columns(fields, "proposal_id", sort, SORT_FIELDS))
+    query = apply_filters(query, {"status": status, "client_code": client_code}, "issued_date", date_from, date_to)
+    return paginate(query, "proposal_id", sort, SORT_FIELDS, cursor, limit)
 
 def create_proposal(db: Client, proposal: ProposalCreate, user_id: UUID):
     data = proposal.dict(exclude_unset=True)
@@ -16,7 +26,9 @@ def create_proposal(db: Client, proposal: ProposalCreate, user_id: UUID):
             data[key] = value.isoformat()
     data["created_by"] = str(user_id)
     result = db.table("proposals").insert(data).execute()
+    invalidate_tables("proposals")
     new_proposal = result.data[0]
+    search_index.upsert("proposal", [new_proposal])
     
     log_action(db, AuditLogCreate(
         user_id=str(user_id),
@@ -28,10 +40,47 @@ def create_proposal(db: Client, proposal: ProposalCreate, user_id: UUID):
     
     return new_proposal
 
+def create_proposals(db: Client, proposals: List[ProposalCreate], user_id: UUID):
+    rows = []
+    for proposal in proposals:
+        data = proposal.dict(exclude_unset=True)
+        for key, value in data.items():
+            if isinstance(value, (date,)):
+                data[key] = value.isoformat()
+        data["created_by"] = str(user_id)
+        rows.append(data)
+    if not rows:
+        return []
+
+    result = db.table("proposals").insert(rows).execute()
+    invalidate_tables("proposals")
+    search_index.upsert("proposal", result.data)
+    log_actions(db, [
+        AuditLogCreate(
+            user_id=str(user_id),
+            action="CREATE",
+            entity_type="proposal",
+            entity_id=str(new_proposal["proposal_id"]),
+            details=f"Imported proposal for client: {new_proposal['client_code']}"
+        )
+        for new_proposal in result.data
+    ])
+    return result.data
+
+def delete_proposals(db: Client, proposal_ids: List[int]):
+    if not proposal_ids:
+        return []
+    deleted = db.table("proposals").delete().in_("proposal_id", proposal_ids).execute().data
+    invalidate_tables("proposals")
+    search_index.remove("proposal", [p["proposal_id"] for p in deleted])
+    return deleted
+
 def update_proposal(db: Client, proposal_id: int, proposal: ProposalUpdate):
     data = proposal.dict(exclude_unset=True)
     for key, value in data.items():
         if isinstance(value, (date,)):
             data[key] = value.isoformat()
     result = db.table("proposals").update(data).eq("proposal_id", proposal_id).execute()
+    invalidate_tables("proposals")
+    search_index.upsert("proposal", result.data)
     return result.data[0]
@@ -1,46 +1,138 @@
 from supabase import Client
-from datetime import datetime, timedelta
+from postgrest.exceptions import APIError
+from datetime import datetime, timedelta, date
+from typing import Optional, Sequence
+import logging
+import os
+import time
+from utils.cache import report_cache
+from utils.pagination import InvalidQueryError, iter_select
+from utils.aging import AGING_BASES, AGING_GROUPS, DEFAULT_BUCKET_EDGES, compute_aging, net_open_items
+from utils.lazy import lazy_module
+
+pd = lazy_module("pandas")
+
+logger = logging.getLogger(__name__)
+
+# Aggregates are computed by the SQL functions in schema.sql (section 11).
+# The Python implementations stay as a fallback for databases without them.
+REPORTS_USE_RPC = os.getenv("REPORTS_USE_RPC", "true").lower() == "true"
+RPC_RETRY_SECONDS = 300
+
+# PostgREST: function not in its schema cache; Postgres: no function with that signature.
+# Anything else (timeouts, 5xx, an open circuit) is re-raised: falling back to the
+# whole-table Python path is the last thing a struggling database needs.
+MISSING_FUNCTION_CODES = {"PGRST202", "42883", "404"}
+
+_rpc_unavailable_until = {}
+
+def _rpc_available(name: str) -> bool:
+    return REPORTS_USE_RPC and _rpc_unavailable_until.get(name, 0) <= time.monotonic()
+
+def _rpc_missing(name: str, error: APIError) -> bool:
+    """True (and the RPC is skipped for RPC_RETRY_SECONDS) if the error says the function isn't deployed."""
+    if str(error.code) not in MISSING_FUNCTION_CODES:
+        return False
+    # The migration has not been applied; don't pay a failed round trip on every request
+    logger.warning("RPC %s not found, using Python fallback: %s", name, error)
+    _rpc_unavailable_until[name] = time.monotonic() + RPC_RETRY_SECONDS
+    return True
+
+def _call_rpc(db: Client, name: str, params: dict = None):
+    """Return the RPC rows, or None if the function is disabled or not deployed."""
+    if not _rpc_available(name):
+        return None
+    try:
+        return db.rpc(name, params or {}).execute().data
+    except APIError as e:
+        if not _rpc_missing(name, e):
+            raise
+        return None
 
 def get_billing_summary(db: Client):
+    return report_cache.get_or_compute("billing", ("invoices", "receipts"), {}, lambda: _billing_summary(db))
+
+def _billing_summary(db: Client):
+    rows = _call_rpc(db, "report_billing_summary")
+    if rows:
+        row = rows[0]
+        return {
+            "total_billed": float(row["total_billed"]),
+            "total_collected": float(row["total_collected"]),
+            "outstanding": float(row["outstanding"])
+        }
+    return get_billing_summary_python(db)
+
+def get_billing_summary_python(db: Client):
     # Total Billed
     invoices = db.table("invoices").select("amount_with_tax").execute()
-    total_billed = sum(i["amount_with_tax"] for i in invoices.data)
-    
+    total_billed = sum(i["amount_with_tax"] or 0 for i in invoices.data)
+
     # Total Collected
     receipts = db.table("receipts").select("amount_received, tds_amount").execute()
-    total_collected = sum(r["amount_received"] + r["tds_amount"] for r in receipts.data)
-    
+    total_collected = sum((r["amount_received"] or 0) + (r["tds_amount"] or 0) for r in receipts.data)
+
     return {
         "total_billed": total_billed,
         "total_collected": total_collected,
         "outstanding": total_billed - total_collected
     }
 
-def get_ar_aging(db: Client):
-    # Simplified aging logic
-    invoices = db.table("invoices").select("*").eq("status", "Issued").execute()
-    today = datetime.now().date()
-    
-    aging = {
-        "0-30": 0,
-        "31-60": 0,
-        "61-90": 0,
-        "90+": 0
-    }
-    
-    for inv in invoices.data:
-        issued_date = datetime.strptime(inv["invoice_date"], "%Y-%m-%d").date()
-        days_diff = (today - issued_date).days
-        
-        amt = inv["amount_with_tax"]
-        if days_diff <= 30: aging["0-30"] += amt
-        elif days_diff <= 60: aging["31-60"] += amt
-        elif days_diff <= 90: aging["61-90"] += amt
-        else: aging["90+"] += amt
-        
-    return aging
+OPEN_ITEM_COLUMNS = ["invoice_no", "assignment_code", "client_code", "partner_lead", "invoice_date", "due_date", "outstanding"]
+
+def get_ar_aging(db: Client, as_of: Optional[date] = None, basis: str = "invoice_date",
+                 edges: Sequence[int] = DEFAULT_BUCKET_EDGES, group_by: Optional[str] = None):
+    as_of = as_of or datetime.now().date()
+    if basis not in AGING_BASES:
+        raise InvalidQueryError(f"basis must be one of: {', '.join(AGING_BASES)}")
+    if group_by and group_by not in AGING_GROUPS:
+        raise InvalidQueryError(f"group_by must be one of: {', '.join(AGING_GROUPS)}")
+    params = {"as_of": as_of, "basis": basis, "edges": list(edges), "group_by": group_by}
+    return report_cache.get_or_compute(
+        "aging", ("invoices", "receipts", "assignments"), params,
+        lambda: compute_aging(get_open_items(db, as_of), as_of, basis, edges, group_by)
+    )
+
+def get_open_items(db: Client, as_of: date) -> "pd.DataFrame":
+    """Outstanding balance per invoice as of a date, net of receipts and TDS."""
+    name = "report_open_invoices"
+    if _rpc_available(name):
+        try:
+            rows = list(iter_select(lambda: db.rpc(name, {"as_of": as_of.isoformat()}), "invoice_no"))
+            frame = pd.DataFrame(rows, columns=OPEN_ITEM_COLUMNS)
+            frame["outstanding"] = frame["outstanding"].astype(float)
+            return frame
+        except APIError as e:
+            if not _rpc_missing(name, e):
+                raise
+    return get_open_items_python(db, as_of)
+
+def get_open_items_python(db: Client, as_of: date) -> "pd.DataFrame":
+    invoices = pd.DataFrame(
+        list(iter_select(lambda: db.table("invoices").select("invoice_no, assignment_code, invoice_date, due_date, amount_with_tax, status"), "invoice_no")),
+        columns=["invoice_no", "assignment_code", "invoice_date", "due_date", "amount_with_tax", "status"]
+    )
+    receipts = pd.DataFrame(
+        list(iter_select(lambda: db.table("receipts").select("receipt_id, invoice_no, amount_received, tds_amount, receipt_date"), "receipt_id")),
+        columns=["receipt_id", "invoice_no", "amount_received", "tds_amount", "receipt_date"]
+    )
+    assignments = pd.DataFrame(
+        list(iter_select(lambda: db.table("assignments").select("assignment_code, client_code, partner_lead"), "assignment_code")),
+        columns=["assignment_code", "client_code", "partner_lead"]
+    )
+    return net_open_items(invoices, receipts, assignments, as_of)
 
 def get_proposal_stats(db: Client):
+    return report_cache.get_or_compute("proposals", ("proposals",), {}, lambda: _proposal_stats(db))
+
+def _proposal_stats(db: Client):
+    rows = _call_rpc(db, "report_proposal_stats")
+    # An empty list is a valid answer here (no proposals yet), so only None means fall back
+    if rows is not None:
+        return {row["status"]: row["count"] for row in rows}
+    return get_proposal_stats_python(db)
+
+def get_proposal_stats_python(db: Client):
     proposals = db.table("proposals").select("status").execute()
     stats = {}
     for p in proposals.data:
@@ -0,0 +1,27 @@
+from supabase import Client
+from typing import Optional
+from uuid import UUID
+import time
+from utils.pagination import InvalidQueryError
+from utils.search import SEARCH_ENTITIES, search_index
+from utils.visibility import visibility_index
+
+def search(db: Client, q: str, user_id: UUID, role: str, limit: int = 20, entities: Optional[str] = None):
+    wanted = None
+    if entities:
+        wanted = {e.strip() for e in entities.split(",") if e.strip()}
+        unknown = wanted - set(SEARCH_ENTITIES)
+        if unknown:
+            raise InvalidQueryError(f"Unknown search entities: {', '.join(sorted(unknown))}")
+
+    search_index.ensure_built(db)
+    # Managers only find their own clients and those clients' proposals/assignments
+    client_codes = visibility_index.visible_clients(db, user_id) if role == "MANAGER" else None
+
+    start = time.perf_counter()
+    results = search_index.search(q, limit, wanted, client_codes)
+    return {
+        "query": q,
+        "results": results,
+        "took_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
@@ -1,14 +1,25 @@
 from supabase import Client
 from schemas.transaction import InvoiceCreate, InvoiceUpdate, ReceiptCreate
 from schemas.audit import AuditLogCreate
-from crud.audit import log_action
+from crud.audit import log_action, log_actions
+from crud import ledger
 from uuid import UUID
 from datetime import date
+from typing import List, Optional
+from utils.cache import invalidate_tables
+from utils.pagination import DEFAULT_PAGE_SIZE, apply_filters, paginate
+from utils.fields import select_columns
+
+INVOICE_SORT_FIELDS = {"invoice_date", "created_at"}
+RECEIPT_SORT_FIELDS = {"receipt_date", "created_at"}
 
 # INVOICES
-def get_invoices(db: Client):
-    result = db.table("invoices").select("*").execute()
-    return result.data
+def get_invoices(db: Client, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                 sort: Optional[str] = None, status: Optional[str] = None, assignment_code: Optional[str] = None,
+                 date_from: Optional[date] = None, date_to: Optional[date] = None, fields: Optional[List[str]] = None):
+    query = db.table("invoices").select(select_columns(fields, "invoice_no", sort, INVOICE_SORT_FIELDS))
+    query = apply_filters(query, {"status": status, "assignment_code": assignment_code}, "invoice_date", date_from, date_to)
+    return paginate(query, "invoice_no", sort, INVOICE_SORT_FIELDS, cursor, limit)
 
 def create_invoice(db: Client, invoice: InvoiceCreate, user_id: UUID):
     data = invoice.dict(exclude_unset=True)
@@ -17,6 +28,7 @@ def create_invoice(db: Client, invoice: InvoiceCreate, user_id: UUID):
             data[key] = data[key].isoformat()
     data["created_by"] = str(user_id)
     result = db.table("invoices").insert(data).execute()
+    invalidate_tables("invoices")
     new_inv = result.data[0]
     
     log_action(db, AuditLogCreate(
@@ -26,13 +38,57 @@ def create_invoice(db: Client, invoice: InvoiceCreate, user_id: UUID):
         entity_id=new_inv["invoice_no"],
         details=f"Generated invoice for assignment: {new_inv['assignment_code']}"
     ))
+    ledger.refresh(db, [new_inv["invoice_no"]])
     
     return new_inv
+
+def create_invoices(db: Client, invoices: List[InvoiceCreate], user_id: UUID):
+    rows = []
+    for invoice in invoices:
+        data = invoice.dict(exclude_unset=True)
+        for key in ["invoice_date", "due_date"]:
+            if key in data and data[key]:
+                data[key] = data[key].isoformat()
+        data["created_by"] = str(user_id)
+        rows.append(data)
+    if not rows:
+        return []
+
+    result = db.table("invoices").insert(rows).execute()
+    invalidate_tables("invoices")
+    log_actions(db, [
+        AuditLogCreate(
+            user_id=str(user_id),
+            action="CREATE",
+            entity_type="invoice",
+            entity_id=new_inv["invoice_no"],
+            details=f"Imported invoice for assignment: {new_inv['assignment_code']}"
+        )
+        for new_inv in result.data
+    ])
+    ledger.refresh(db, [inv["invoice_no"] for inv in result.data])
+    return result.data
+
+def delete_invoices(db: Client, invoice_nos: List[str]):
+    if not invoice_nos:
+        return []
+    deleted = db.table("invoices").delete().in_("invoice_no", invoice_nos).execute().data
+    # ON DELETE CASCADE removes dependent rows too
+    invalidate_tables("invoices", "receipts")
+    # The invoice_ledger rows cascade away; re-roll the owning clients' totals
+    assignment_codes = list({inv["assignment_code"] for inv in deleted if inv.get("assignment_code")})
+    if assignment_codes:
+        owners = db.table("assignments").select("client_code").in_("assignment_code", assignment_codes).execute().data
+        ledger.refresh(db, [], {a["client_code"] for a in owners if a.get("client_code")})
+    return deleted
     
 # RECEIPTS
-def get_receipts(db: Client):
-    result = db.table("receipts").select("*").execute()
-    return result.data
+def get_receipts(db: Client, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                 sort: Optional[str] = None, invoice_no: Optional[str] = None,
+                 date_from: Optional[date] = None, date_to: Optional[date] = None, fields: Optional[List[str]] = None):
+    query = db.table("receipts").select(select_columns(fields, "receipt_id", sort, RECEIPT_SORT_FIELDS))
+    query = apply_filters(query, {"invoice_no": invoice_no}, "receipt_date", date_from, date_to)
+    return paginate(query, "receipt_id", sort, RECEIPT_SORT_FIELDS, cursor, limit)
 
 def create_receipt(db: Client, receipt: ReceiptCreate, user_id: UUID):
     data = receipt.dict(exclude_unset=True)
@@ -40,6 +96,7 @@ def create_receipt(db: Client, receipt: ReceiptCreate, user_id: UUID):
         data["receipt_date"] = data["receipt_date"].isoformat()
     data["created_by"] = str(user_id)
     result = db.table("receipts").insert(data).execute()
+    invalidate_tables("receipts")
     new_rec = result.data[0]
     
     log_action(db, AuditLogCreate(
@@ -49,5 +106,41 @@ def create_receipt(db: Client, receipt: ReceiptCreate, user_id: UUID):
         entity_id=str(new_rec["receipt_id"]),
         details=f"Recorded receipt for invoice: {new_rec['invoice_no']}"
     ))
+    # Moves the invoice to Part-Paid/Paid and updates the client's running balance
+    ledger.refresh(db, [new_rec["invoice_no"]])
     
     return new_rec
+
+def create_receipts(db: Client, receipts: List[ReceiptCreate], user_id: UUID):
+    rows = []
+    for receipt in receipts:
+        data = receipt.dict(exclude_unset=True)
+        if "receipt_date" in data and data["receipt_date"]:
+            data["receipt_date"] = data["receipt_date"].isoformat()
+        data["created_by"] = str(user_id)
+        rows.append(data)
+    if not rows:
+        return []
+
+    result = db.table("receipts").insert(rows).execute()
+    invalidate_tables("receipts")
+    log_actions(db, [
+        AuditLogCreate(
+            user_id=str(user_id),
+            action="CREATE",
+            entity_type="receipt",
+            entity_id=str(new_rec["receipt_id"]),
+            details=f"Imported receipt for invoice: {new_rec['invoice_no']}"
+        )
+        for new_rec in result.data
+    ])
+    ledger.refresh(db, {rec["invoice_no"] for rec in result.data})
+    return result.data
+
+def delete_receipts(db: Client, receipt_ids: List[int]):
+    if not receipt_ids:
+        return []
+    deleted = db.table("receipts").delete().in_("receipt_id", receipt_ids).execute().data
+    invalidate_tables("receipts")
+    ledger.refresh(db, {rec["invoice_no"] for rec in deleted})
+    return deleted
@@ -1,11 +1,47 @@
 from supabase import Client
-from typing import List, Optional
+from typing import Dict, List, Optional
+import os
+from crud.audit import log_action
+from schemas.audit import AuditLogCreate
+from utils.cache import LocalCacheBackend
+
+# Roles come from profiles, not the JWT. Each worker keeps a short-lived copy so
+# role checks normally cost no round trip; the TTL bounds staleness on other workers.
+ROLE_CACHE_TTL = int(os.getenv("ROLE_CACHE_TTL", "60"))
+profile_cache = LocalCacheBackend(max_entries=int(os.getenv("ROLE_CACHE_SIZE", "4096")))
+
+def _cache_profile(user_id: str, profile: Optional[Dict]):
+    # An empty dict records "no profile" so unknown users don't hit the DB on every request
+    profile_cache.set(user_id, profile or {}, ROLE_CACHE_TTL)
+
+def get_profile(db: Client, user_id: str) -> Optional[Dict]:
+    profile = profile_cache.get(user_id)
+    if profile is None:
+        rows = db.table("profiles").select("*").eq("id", user_id).execute().data
+        profile = rows[0] if rows else {}
+        _cache_profile(user_id, profile)
+    return profile or None
+
+def get_user_role(db: Client, user_id: str) -> Optional[str]:
+    profile = get_profile(db, user_id)
+    return profile.get("role") if profile else None
 
 def get_users(db: Client):
     # Fetching from 'profiles' table which maps to auth.users
     result = db.table("profiles").select("*").execute()
+    for profile in result.data:
+        _cache_profile(profile["id"], profile)
     return result.data
 
-def update_user_role(db: Client, user_id: str, role: str):
-    result = db.table("profiles").update({"role": role}).eq("id", user_id).execute()
-    return result.data[0]
+def update_user_role(db: Client, user_id: str, role: str, changed_by: str):
+    updated = db.table("profiles").update({"role": role}).eq("id", user_id).execute().data[0]
+    profile_cache.delete(user_id)
+    # Access changes are audited synchronously: the response means the entry is stored
+    log_action(db, AuditLogCreate(
+        user_id=str(changed_by),
+        action="UPDATE",
+        entity_type="profile",
+        entity_id=user_id,
+        details=f"Role changed to {role}"
+    ), sync=True)
+    return updated
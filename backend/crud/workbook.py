@@ -0,0 +1,200 @@
+from supabase import Client
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import asyncio
+from database import run_db
+from schemas.client import Client as ClientModel
+from schemas.proposal import Proposal
+from schemas.assignment import Assignment
+from schemas.transaction import Invoice, Receipt
+from utils.metrics import stage
+from utils.pagination import apply_filters, batched, iter_select
+
+# table -> (primary key, column the date range applies to, response schema).
+# Clients and assignments are the dimensions every other sheet joins to, so a
+# date range never drops them; it applies to the dated transactions only.
+WORKBOOK_TABLES = {
+    "clients": ("client_code", None, ClientModel),
+    "proposals": ("proposal_id", "issued_date", Proposal),
+    "assignments": ("assignment_code", None, Assignment),
+    "invoices": ("invoice_no", "invoice_date", Invoice),
+    "receipts": ("receipt_id", "receipt_date", Receipt),
+}
+Sheet = Tuple[str, List[str], Iterator[Dict[str, Any]]]
+
+def _select(db: Client, table: str, date_from: Optional[date] = None, date_to: Optional[date] = None,
+            columns: str = "*", filters: Optional[Dict[str, Any]] = None,
+            in_column: Optional[str] = None, in_values: Optional[Sequence] = None) -> List[Dict[str, Any]]:
+    key, date_column, _ = WORKBOOK_TABLES[table]
+    if in_column is None:
+        return list(iter_select(lambda: apply_filters(
+            db.table(table).select(columns), filters or {}, date_column, date_from, date_to), key))
+    rows = []
+    for batch in batched(in_values):
+        rows.extend(iter_select(lambda: apply_filters(
+            db.table(table).select(columns), filters or {}, date_column, date_from, date_to
+        ).in_(in_column, batch), key))
+    return rows
+
+def _assignment_codes(db: Client, client_code: str) -> List[str]:
+    return [r["assignment_code"] for r in _select(db, "assignments", columns="assignment_code", filters={"client_code": client_code})]
+
+def _invoice_nos(db: Client, client_code: str) -> List[str]:
+    codes = _assignment_codes(db, client_code)
+    return [r["invoice_no"] for r in _select(db, "invoices", columns="invoice_no", in_column="assignment_code", in_values=codes)]
+
+def fetch_clients(db: Client, client_code=None, date_from=None, date_to=None):
+    return _select(db, "clients", filters={"client_code": client_code})
+
+def fetch_proposals(db: Client, client_code=None, date_from=None, date_to=None):
+    return _select(db, "proposals", date_from, date_to, filters={"client_code": client_code})
+
+def fetch_assignments(db: Client, client_code=None, date_from=None, date_to=None):
+    return _select(db, "assignments", filters={"client_code": client_code})
+
+def fetch_invoices(db: Client, client_code=None, date_from=None, date_to=None):
+    # Invoices and receipts carry no client_code; a client filter resolves to their keys first
+    if client_code is None:
+        return _select(db, "invoices", date_from, date_to)
+    codes = _assignment_codes(db, client_code)
+    return _select(db, "invoices", date_from, date_to, in_column="assignment_code", in_values=codes)
+
+def fetch_receipts(db: Client, client_code=None, date_from=None, date_to=None):
+    if client_code is None:
+        return _select(db, "receipts", date_from, date_to)
+    return _select(db, "receipts", date_from, date_to, in_column="invoice_no", in_values=_invoice_nos(db, client_code))
+
+FETCHERS = {
+    "clients": fetch_clients,
+    "proposals": fetch_proposals,
+    "assignments": fetch_assignments,
+    "invoices": fetch_invoices,
+    "receipts": fetch_receipts,
+}
+
+async def fetch_tables(db: Client, client_code: Optional[str] = None, date_from: Optional[date] = None,
+                       date_to: Optional[date] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """All five tables, fetched concurrently with the filters pushed into each query."""
+    with stage("export.workbook.fetch"):
+        results = await asyncio.gather(*(
+            run_db(fetch, db, client_code, date_from, date_to) for fetch in FETCHERS.values()
+        ))
+        tables = dict(zip(FETCHERS, results))
+
+        # A receipt dated in range can settle an invoice dated before it; look up just
+        # the assignment of those invoices so the receipt still joins to its engagement
+        invoice_nos = {r["invoice_no"] for r in tables["invoices"]}
+        missing = sorted({r["invoice_no"] for r in tables["receipts"]} - invoice_nos)
+        tables["invoice_refs"] = await run_db(
+            _select, db, "invoices", columns="invoice_no, assignment_code", in_column="invoice_no", in_values=missing
+        ) if missing else []
+    return tables
+
+def _columns(table: str, *extra: str) -> List[str]:
+    key, _, model = WORKBOOK_TABLES[table]
+    return [key] + [f for f in model.model_fields if f != key] + list(extra)
+
+def _amount(value) -> float:
+    return float(value or 0)
+
+def build_sheets(tables: Dict[str, List[Dict[str, Any]]]) -> List[Sheet]:
+    """
+    Join the raw tables in memory (hash joins on client_code, assignment_code and
+    invoice_no) into denormalized sheets plus the per-assignment rollup.
+    Rows are produced lazily as each sheet is written.
+    """
+    clients = {r["client_code"]: r for r in tables["clients"]}
+    assignments = {r["assignment_code"]: r for r in tables["assignments"]}
+    invoice_assignment = {r["invoice_no"]: r["assignment_code"] for r in tables["invoice_refs"]}
+    invoice_assignment.update((r["invoice_no"], r["assignment_code"]) for r in tables["invoices"])
+
+    def client_name(client_code):
+        client = clients.get(client_code)
+        return client["client_name"] if client else None
+
+    def client_of(assignment_code):
+        assignment = assignments.get(assignment_code)
+        return assignment["client_code"] if assignment else None
+
+    def proposals():
+        for r in tables["proposals"]:
+            yield {**r, "client_name": client_name(r["client_code"])}
+
+    def assignment_rows():
+        for r in tables["assignments"]:
+            yield {**r, "client_name": client_name(r["client_code"])}
+
+    def invoices():
+        for r in tables["invoices"]:
+            client_code = client_of(r["assignment_code"])
+            yield {**r, "client_code": client_code, "client_name": client_name(client_code)}
+
+    def receipts():
+        for r in tables["receipts"]:
+            assignment_code = invoice_assignment.get(r["invoice_no"])
+            client_code = client_of(assignment_code)
+            yield {**r, "assignment_code": assignment_code, "client_code": client_code,
+                   "client_name": client_name(client_code)}
+
+    return [
+        ("Assignment Rollup", ROLLUP_COLUMNS, rollup(tables, invoice_assignment, client_name)),
+        ("Clients", _columns("clients"), iter(tables["clients"])),
+        ("Proposals", _columns("proposals", "client_name"), proposals()),
+        ("Assignments", _columns("assignments", "client_name"), assignment_rows()),
+        ("Invoices", _columns("invoices", "client_code", "client_name"), invoices()),
+        ("Receipts", _columns("receipts", "assignment_code", "client_code", "client_name"), receipts()),
+    ]
+
+ROLLUP_COLUMNS = ["client_code", "client_name", "assignment_code", "title", "status", "contracted_fee",
+                  "invoices", "billed", "collected", "tds", "outstanding"]
+
+def rollup(tables: Dict[str, List[Dict[str, Any]]], invoice_assignment: Dict[str, str], client_name) -> Iterator[Dict[str, Any]]:
+    """
+    Billed / collected / outstanding per assignment, on the ledger's definitions:
+    cancelled invoices bill nothing, collected counts TDS, outstanding = billed - collected.
+    With a date range the figures are the period's activity (invoices and receipts dated in it).
+    """
+    totals = {code: {"invoices": 0, "billed": 0.0, "collected": 0.0, "tds": 0.0} for code in
+              (r["assignment_code"] for r in tables["assignments"])}
+    for r in tables["invoices"]:
+        entry = totals.get(r["assignment_code"])
+        if entry is None:
+            continue
+        entry["invoices"] += 1
+        if r.get("status") != "Cancelled":
+            entry["billed"] += _amount(r.get("amount_with_tax"))
+    for r in tables["receipts"]:
+        entry = totals.get(invoice_assignment.get(r["invoice_no"]))
+        if entry is None:
+            continue
+        entry["collected"] += _amount(r.get("amount_received")) + _amount(r.get("tds_amount"))
+        entry["tds"] += _amount(r.get("tds_amount"))
+
+    grand = {"invoices": 0, "billed": 0.0, "collected": 0.0, "tds": 0.0, "contracted_fee": 0.0}
+    for a in sorted(tables["assignments"], key=lambda r: (r["client_code"] or "", r["assignment_code"])):
+        entry = totals[a["assignment_code"]]
+        for name in ("invoices", "billed", "collected", "tds"):
+            grand[name] += entry[name]
+        grand["contracted_fee"] += _amount(a.get("contracted_fee"))
+        yield {
+            "client_code": a["client_code"],
+            "client_name": client_name(a["client_code"]),
+            "assignment_code": a["assignment_code"],
+            "title": a.get("title"),
+            "status": a.get("status"),
+            "contracted_fee": _amount(a.get("contracted_fee")),
+            "invoices": entry["invoices"],
+            "billed": round(entry["billed"], 2),
+            "collected": round(entry["collected"], 2),
+            "tds": round(entry["tds"], 2),
+            "outstanding": round(entry["billed"] - entry["collected"], 2),
+        }
+    yield {
+        "client_code": "Total",
+        "contracted_fee": round(grand["contracted_fee"], 2),
+        "invoices": grand["invoices"],
+        "billed": round(grand["billed"], 2),
+        "collected": round(grand["collected"], 2),
+        "tds": round(grand["tds"], 2),
+        "outstanding": round(grand["billed"] - grand["collected"], 2),
+    }
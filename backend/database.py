@@ -1,16 +1,134 @@
-from supabase import create_client, Client
+from supabase import create_client, ClientOptions
+from anyio import CapacityLimiter, to_thread
+from functools import partial
 import os
+import threading
+import time
+from utils.metrics import record_db
+from utils.transport import ResilientTransport, build_http_client
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY") # Service role key for admin operations
 
-if not SUPABASE_URL or not SUPABASE_KEY:
+# Upper bound on PostgREST calls in flight per worker; each one occupies a pool thread
+DB_MAX_CONCURRENCY = int(os.getenv("DB_MAX_CONCURRENCY", "32"))
+# Keep-alive connections per worker process; one per DB thread so no call waits for a socket
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(DB_MAX_CONCURRENCY)))
+
+USE_MEMORY_DB = bool(SUPABASE_URL) and SUPABASE_URL.startswith("memory://")
+
+if not USE_MEMORY_DB and (not SUPABASE_URL or not SUPABASE_KEY):
     # We will need these for production, for now we log a warning
     print("Warning: SUPABASE_URL or SUPABASE_KEY not set in environment variables.")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_URL and SUPABASE_KEY else None
+_client = None
+_instrumented = None
+_client_lock = threading.Lock()
+db_transport = None
+
+WRITE_OPERATIONS = {"insert", "upsert", "update", "delete"}
+
+class _TimedQuery:
+    """Forwards to a PostgREST builder and times its execute() as one round trip."""
+
+    def __init__(self, builder, table: str, operation: str):
+        self._builder, self._table, self._operation = builder, table, operation
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            # e.g. the not_ modifier, which is itself a builder
+            return _TimedQuery(attr, self._table, self._operation) if hasattr(attr, "execute") else attr
+        operation = name if name in WRITE_OPERATIONS else self._operation
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return _TimedQuery(result, self._table, operation) if hasattr(result, "execute") else result
+        return call
+
+    def execute(self):
+        # postgrest-py's own retry sleeps 1-4s without jitter on 503s; the transport retries instead
+        request = getattr(self._builder, "request", None)
+        if getattr(request, "retry_enabled", False):
+            request.retry_enabled = False
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = self._builder.execute()
+            failed = False
+            return result
+        finally:
+            record_db(self._table, self._operation, time.perf_counter() - start, failed)
+
+class InstrumentedClient:
+    """
+    The Supabase client with every PostgREST round trip counted and timed, per
+    table and operation and against the current request (utils/metrics.py).
+    Everything other than table()/rpc() passes straight through.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name: str):
+        return _TimedQuery(self._client.table(name), name, "select")
+
+    def from_(self, name: str):
+        return self.table(name)
+
+    def rpc(self, name: str, params=None, *args, **kwargs):
+        return _TimedQuery(self._client.rpc(name, params if params is not None else {}, *args, **kwargs), name, "rpc")
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+_db_limiter = None
+
+def get_client():
+    """
+    The raw Supabase client, built on first use rather than at import so a
+    preloaded app (gunicorn --preload) creates it in each worker, not the master.
+    """
+    global _client, _instrumented, db_transport
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if USE_MEMORY_DB:
+                    # In-process stand-in for benchmarks and local runs; see utils/memory_db.py
+                    from utils.memory_db import MemoryClient
+                    client = MemoryClient()
+                elif SUPABASE_URL and SUPABASE_KEY:
+                    # One pooled client shared by every thread; timeouts, retries and the breaker live in utils/transport.py
+                    db_transport = ResilientTransport(DB_POOL_SIZE)
+                    client = create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(httpx_client=build_http_client(db_transport)))
+                else:
+                    raise Exception("Supabase client not initialized. Check environment variables.")
+                _instrumented = InstrumentedClient(client)
+                _client = client
+    return _client
+
+def get_transport_stats():
+    if USE_MEMORY_DB:
+        return {"backend": "memory"}
+    if db_transport is None:
+        # No database call has been made in this process yet
+        return {"backend": "postgrest" if SUPABASE_URL and SUPABASE_KEY else None}
+    return {"backend": "postgrest", **db_transport.get_stats()}
 
 def get_supabase():
-    if not supabase:
-        raise Exception("Supabase client not initialized. Check environment variables.")
-    return supabase
+    get_client()
+    return _instrumented
+
+def _get_limiter() -> CapacityLimiter:
+    # Created lazily because anyio binds the limiter to the running event loop's backend
+    global _db_limiter
+    if _db_limiter is None:
+        _db_limiter = CapacityLimiter(DB_MAX_CONCURRENCY)
+    return _db_limiter
+
+async def run_db(fn, *args, **kwargs):
+    """
+    Run a synchronous CRUD function on the bounded DB thread pool so the
+    blocking PostgREST round trips never stall the event loop.
+    """
+    return await to_thread.run_sync(partial(fn, *args, **kwargs), limiter=_get_limiter())
@@ -0,0 +1,29 @@
+import glob
+import os
+import tempfile
+
+# gunicorn reads this file from the working directory; flags on the command line
+# (the Procfile's -w / -k) still take precedence over anything set here.
+
+# GUNICORN_PRELOAD=true imports the app once in the master, warms the heavy
+# dependencies there too, and forks workers that share those pages copy-on-write
+# instead of each importing them. Code reloads then need a full restart, not HUP.
+preload_app = os.getenv("GUNICORN_PRELOAD", "false").lower() == "true"
+
+# Workers snapshot their metrics here so /api/metrics serves the sum over all of them
+# (utils/metrics.py). Set before the app is imported, preloaded or not; two servers on
+# one host need different directories.
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "kpca-metrics"))
+
+def on_starting(server):
+    # Workers inherit it: process-local caches check it to tell one worker from several
+    os.environ["WEB_CONCURRENCY"] = str(server.cfg.workers)
+    # Counters restart with the server: drop the previous run's snapshots
+    for path in glob.glob(os.path.join(os.environ["METRICS_DIR"], "*.json")):
+        os.remove(path)
+
+def when_ready(server):
+    if preload_app:
+        from utils.lazy import preload_heavy_modules
+        preload_heavy_modules()
+        server.log.info("Preloaded heavy modules in the master")
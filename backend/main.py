@@ -1,22 +1,44 @@
-from fastapi import FastAPI, Depends, HTTPException, Security, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, Security, UploadFile, File, Query, Request, Response, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from fastapi.responses import JSONResponse, PlainTextResponse
+from typing import List, Optional
+from datetime import date
+import hmac
 import os
-from database import get_supabase
+import httpx
+from database import get_supabase, get_transport_stats, run_db
 from auth import get_current_user, RoleChecker, UserRole
 from schemas.client import Client, ClientCreate, ClientUpdate
 from schemas.proposal import Proposal, ProposalCreate, ProposalUpdate
 from schemas.assignment import Assignment, AssignmentCreate, AssignmentUpdate
 from schemas.transaction import Invoice, InvoiceCreate, Receipt, ReceiptCreate
+from schemas.pagination import Page
+from schemas.audit import AuditLog
 from crud import client as client_crud
 from crud import proposal as proposal_crud
 from crud import assignment as assignment_crud
 from crud import transaction as transaction_crud
+from crud import ledger as ledger_crud
 from crud import reports as reports_crud
 from crud import audit as audit_crud
 from crud import user as user_crud
+from crud import search as search_crud
+from crud import dashboard as dashboard_crud
+from crud import workbook as workbook_crud
 from utils import io as io_utils
 from utils import upload as upload_utils
+from utils import jobs as job_utils
+from utils.compression import COMPRESSION_MIN_SIZE, EXCLUDED_CONTENT_TYPES, GZIP_LEVEL, CompressionMiddleware
+from utils import metrics
+from utils.metrics import MetricsMiddleware, StageTimer
+from utils.serialization import trusted_json
+from utils.fields import parse_fields, project_page, response_model
+from utils.cache import compute_etag, etag_matches, report_cache, warn_if_process_local
+from utils.aging import parse_edges
+from utils.search import search_index
+from utils.audit_archive import audit_archive
+from utils.transport import CircuitOpenError
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidQueryError, iter_rows
 
 app = FastAPI(title="KPCA Portal API")
 
@@ -28,15 +50,125 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MIN_SIZE,
+    compresslevel=GZIP_LEVEL,
+    exclude_content_types=EXCLUDED_CONTENT_TYPES,
+)
+# Outermost, so request timings include compression
+app.add_middleware(MetricsMiddleware)
+
+# Bearer token for /api/metrics; when unset the endpoint does not exist (404), so metrics are never public by default
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+metrics.registry.gauge_callback("kpca_report_cache", "Report cache counters.", lambda: {
+    key: value for key, value in report_cache.get_stats().items() if isinstance(value, (int, float))
+}, label="stat")
+metrics.registry.gauge_callback("kpca_audit_queue", "Buffered audit entries.", lambda: {
+    key: audit_crud.audit_queue.get_stats()[key] for key in ("queue_depth", "spool_depth")
+}, label="stat")
+metrics.registry.gauge_callback("kpca_search_index_documents", "Documents in the search index.",
+                                lambda: {"": search_index.get_stats()["documents"]})
+metrics.registry.gauge_callback("kpca_db_transport", "PostgREST connection pool, retry and circuit breaker counters.", lambda: {
+    key: {"closed": 0, "half_open": 1, "open": 2}.get(value, value) for key, value in get_transport_stats().items()
+    if key == "breaker_state" or isinstance(value, (int, float))
+}, label="stat")
+metrics.registry.gauge_callback("kpca_process", "Process start time and resident memory.", metrics.process_stats, label="stat")
+
+@app.on_event("startup")
+def warm_search_index():
+    # Built off the request path; a query arriving before it finishes waits for the build
+    try:
+        db = get_supabase()
+    except Exception:
+        return
+    search_index.build_in_background(db)
+
+@app.on_event("startup")
+def check_report_cache():
+    warn_if_process_local()
+
+@app.on_event("shutdown")
+def drain_audit_queue():
+    # Write out buffered audit entries before the worker exits
+    audit_crud.audit_queue.close()
+
+@app.exception_handler(InvalidQueryError)
+async def invalid_query_handler(request: Request, exc: InvalidQueryError):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    return JSONResponse(status_code=503, content={"detail": "Database temporarily unavailable"},
+                        headers={"Retry-After": str(max(int(exc.retry_after), 1))})
+
+@app.exception_handler(httpx.TimeoutException)
+async def db_timeout_handler(request: Request, exc: httpx.TimeoutException):
+    return JSONResponse(status_code=504, content={"detail": "Database request timed out"})
+
+def list_params(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    sort: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    # Shared keyset pagination / sort / date range query parameters for list endpoints
+    return {"cursor": cursor, "limit": limit, "sort": sort, "date_from": date_from, "date_to": date_to}
+
+def sparse_fields(model):
+    # fields=a,b,c validated against the entity's response schema and pushed into select()
+    def parse(fields: Optional[str] = Query(None, description="Comma-separated columns to return")):
+        return parse_fields(fields, model)
+    return Depends(parse)
+
+def conditional(*tables: str):
+    """
+    ETag / If-None-Match for GET endpoints reading `tables`. A matching request gets
+    a 304 before the handler runs, so there is no DB query and no serialization.
+    Declare it after the endpoint's user/role dependency so 401/403 still win.
+    No ETag is sent when the table versions are not shared between workers (see compute_etag).
+    """
+    async def check(request: Request, response: Response, user=Depends(get_current_user)):
+        # Today's date is part of the key because as_of-less reports age daily
+        etag = await run_db(compute_etag, tables, [user["id"], user["role"]],
+                            [request.url.path, sorted(request.query_params.multi_items()), date.today()])
+        if etag is None:
+            return None
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        # Let browsers keep the body but revalidate every time
+        response.headers["Cache-Control"] = "private, no-cache"
+        return etag
+    return Depends(check)
 
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
 
+@app.get("/api/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Client Endpoints
-@app.get("/api/clients", response_model=List[Client])
-async def read_clients(user=Depends(get_current_user), db=Depends(get_supabase)):
-    return client_crud.get_clients(db, user["id"], user["role"])
+@app.get("/api/clients", response_model=Page[Client])
+async def read_clients(
+    response: Response,
+    status: Optional[str] = None,
+    params: dict = Depends(list_params),
+    user=Depends(get_current_user),
+    etag: Optional[str] = conditional("clients", "assignments"),
+    fields: Optional[List[str]] = sparse_fields(Client),
+    db=Depends(get_supabase)
+):
+    page = await run_db(client_crud.get_clients, db, user["id"], user["role"], status=status, fields=fields, **params)
+    return trusted_json(project_page(page, fields), response, Page[response_model(Client, fields)])
 
 @app.post("/api/clients", response_model=Client, status_code=201)
 async def create_new_client(
@@ -44,12 +176,22 @@ async def create_new_client(
     user=Depends(RoleChecker([UserRole.PARTNER, UserRole.DIRECTOR, UserRole.MANAGER])),
     db=Depends(get_supabase)
 ):
-    return client_crud.create_client(db, client, user["id"])
+    return await run_db(client_crud.create_client, db, client, user["id"])
 
 # Proposal Endpoints
-@app.get("/api/proposals", response_model=List[Proposal])
-async def read_proposals(user=Depends(get_current_user), db=Depends(get_supabase)):
-    return proposal_crud.get_proposals(db)
+@app.get("/api/proposals", response_model=Page[Proposal])
+async def read_proposals(
+    response: Response,
+    status: Optional[str] = None,
+    client_code: Optional[str] = None,
+    params: dict = Depends(list_params),
+    user=Depends(get_current_user),
+    etag: Optional[str] = conditional("proposals"),
+    fields: Optional[List[str]] = sparse_fields(Proposal),
+    db=Depends(get_supabase)
+):
+    page = await run_db(proposal_crud.get_proposals, db, status=status, client_code=client_code, fields=fields, **params)
+    return trusted_json(project_page(page, fields), response, Page[response_model(Proposal, fields)])
 
 @app.post("/api/proposals", response_model=Proposal, status_code=201)
 async def create_new_proposal(
@@ -57,12 +199,22 @@ async def create_new_proposal(
     user=Depends(RoleChecker([UserRole.PARTNER, UserRole.DIRECTOR, UserRole.MANAGER])),
     db=Depends(get_supabase)
 ):
-    return proposal_crud.create_proposal(db, proposal, user["id"])
+    return await run_db(proposal_crud.create_proposal, db, proposal, user["id"])
 
 # Assignment Endpoints
-@app.get("/api/assignments", response_model=List[Assignment])
-async def read_assignments(user=Depends(get_current_user), db=Depends(get_supabase)):
-    return assignment_crud.get_assignments(db)
+@app.get("/api/assignments", response_model=Page[Assignment])
+async def read_assignments(
+    response: Response,
+    status: Optional[str] = None,
+    client_code: Optional[str] = None,
+    params: dict = Depends(list_params),
+    user=Depends(get_current_user),
+    etag: Optional[str] = conditional("assignments"),
+    fields: Optional[List[str]] = sparse_fields(Assignment),
+    db=Depends(get_supabase)
+):
+    page = await run_db(assignment_crud.get_assignments, db, status=status, client_code=client_code, fields=fields, **params)
+    return trusted_json(project_page(page, fields), response, Page[response_model(Assignment, fields)])
 
 @app.post("/api/assignments", response_model=Assignment, status_code=201)
 async def create_new_assignment(
@@ -70,15 +222,22 @@ async def create_new_assignment(
     user=Depends(RoleChecker([UserRole.PARTNER, UserRole.DIRECTOR])),
     db=Depends(get_supabase)
 ):
-    return assignment_crud.create_assignment(db, assignment, user["id"])
+    return await run_db(assignment_crud.create_assignment, db, assignment, user["id"])
 
 # Billing & Collections
-@app.get("/api/invoices", response_model=List[Invoice])
+@app.get("/api/invoices", response_model=Page[Invoice])
 async def read_invoices(
+    response: Response,
+    status: Optional[str] = None,
+    assignment_code: Optional[str] = None,
+    params: dict = Depends(list_params),
     user=Depends(RoleChecker([UserRole.PARTNER, UserRole.DIRECTOR, UserRole.MANAGER])),
+    etag: Optional[str] = conditional("invoices"),
+    fields: Optional[List[str]] = sparse_fields(Invoice),
     db=Depends(get_supabase)
 ):
-    return transaction_crud.get_invoices(db)
+    page = await run_db(transaction_crud.get_invoices, db, status=status, assignment_code=assignment_code, fields=fields, **params)
+    return trusted_json(project_page(page, fields), response, Page[response_model(Invoice, fields)])
 
 @app.post("/api/invoices", response_model=Invoice, status_code=201)
 async def create_new_invoice(
@@ -86,11 +245,20 @@ async def create_new_invoice(
     user=Depends(RoleChecker([UserRole.DIRECTOR, UserRole.PARTNER])),
     db=Depends(get_supabase)
 ):
-    return transaction_crud.create_invoice(db, invoice, user["id"])
+    return await run_db(transaction_crud.create_invoice, db, invoice, user["id"])
 
-@app.get("/api/receipts", response_model=List[Receipt])
-async def read_receipts(user=Depends(get_current_user), db=Depends(get_supabase)):
-    return transaction_crud.get_receipts(db)
+@app.get("/api/receipts", response_model=Page[Receipt])
+async def read_receipts(
+    response: Response,
+    invoice_no: Optional[str] = None,
+    params: dict = Depends(list_params),
+    user=Depends(get_current_user),
+    etag: Optional[str] = conditional("receipts"),
+    fields: Optional[List[str]] = sparse_fields(Receipt),
+    db=Depends(get_supabase)
+):
+    page = await run_db(transaction_crud.get_receipts, db, invoice_no=invoice_no, fields=fields, **params)
+    return trusted_json(project_page(page, fields), response, Page[response_model(Receipt, fields)])
 
 @app.post("/api/receipts", response_model=Receipt, status_code=201)
 async def create_new_receipt(
@@ -98,13 +266,95 @@ async def create_new_receipt(
     user=Depends(RoleChecker([UserRole.DIRECTOR, UserRole.PARTNER])),
     db=Depends(get_supabase)
 ):
-    return transaction_crud.create_receipt(db, receipt, user["id"])
+    return await run_db(transaction_crud.create_receipt, db, receipt, user["id"])
+
+# Receivables ledger
+@app.get("/api/clients/{client_code}/statement")
+async def client_statement(
+    response: Response,
+    client_code: str,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    user=Depends(RoleChecker([UserRole.PARTNER, UserRole.DIRECTOR, UserRole.MANAGER])),
+    etag: Optional[str] = conditional("invoice_ledger", "client_ledger", "receipts"),
+    db=Depends(get_supabase)
+):
+    result = await run_db(ledger_crud.get_client_statement, db, client_code, date_from, date_to)
+    return trusted_json(result, response)
+
+@app.get("/api/receivables/open")
+async def open_receivables(
+    response: Response,
+    client_code: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    sort: Optional[str] = None,
+    user=Depends(RoleChecker([UserRole.PARTNER, UserRole.DIRECTOR, UserRole.MANAGER])),
+    etag: Optional[str] = conditional("invoice_ledger"),
+    db=Depends(get_supabase)
+):
+    result = await run_db(ledger_crud.get_open_items, db, client_code, cursor, limit, sort)
+    return trusted_json(result, response)
+
+@app.post("/api/ledger/reconcile")
+async def reconcile_ledger(
+    dry_run: bool = False,
+    user=Depends(RoleChecker([UserRole.PARTNER])),
+    db=Depends(get_supabase)
+):
+    return await run_db(ledger_crud.reconcile, db, not dry_run)
+
+# Search
+@app.get("/api/search")
+async def search(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    entities: Optional[str] = Query(None, description="Comma-separated subset of client, assignment, proposal"),
+    user=Depends(get_current_user),
+    etag: Optional[str] = conditional("clients", "assignments", "proposals"),
+    db=Depends(get_supabase)
+):
+    result = await run_db(search_crud.search, db, q, user["id"], user["role"], limit, entities)
+    return trusted_json(result, response)
 
 # Export Endpoint
+EXPORT_MODELS = {
+    "clients": Client,
+    "proposals": Proposal,
+    "assignments": Assignment,
+    "invoices": Invoice,
+    "receipts": Receipt,
+}
+EXPORT_FORMATS = ("xlsx", "csv", "parquet", "arrow")
+
+# Declared before /api/export/{entity} so "workbook" isn't taken as an entity
+@app.get("/api/export/workbook")
+async def export_workbook(
+    client_code: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    user=Depends(RoleChecker([UserRole.PARTNER, UserRole.DIRECTOR])),
+    db=Depends(get_supabase)
+):
+    # Same roles as /api/reports/billing, since the rollup sheet is a billing summary
+    tables = await workbook_crud.fetch_tables(db, client_code, date_from, date_to)
+    if client_code and not tables["clients"]:
+        raise HTTPException(status_code=404, detail="Client not found")
+    meta = [
+        ("Generated By", user.get("email", "System User")),
+        ("Client", client_code or "All"),
+        ("Date From", date_from),
+        ("Date To", date_to),
+    ]
+    serialize = StageTimer("export.workbook.serialize")
+    return io_utils.export_workbook(workbook_crud.build_sheets(tables), "engagement_workbook", meta, timer=serialize)
+
 @app.get("/api/export/{entity}")
 async def export_data(
     entity: str,
     format: str = "xlsx",
+    fields: Optional[str] = Query(None, description="Comma-separated columns to export"),
     user=Depends(get_current_user),
     db=Depends(get_supabase)
 ):
@@ -119,38 +369,128 @@ async def export_data(
     
     if entity not in data_map:
         raise HTTPException(status_code=400, detail="Invalid entity")
+    columns = parse_fields(fields, EXPORT_MODELS[entity])
+    # Unrecognised formats have always fallen back to CSV
+    kind = format if format in EXPORT_FORMATS else "csv"
+    if kind in ("parquet", "arrow") and io_utils.pa is None:
+        raise HTTPException(status_code=400, detail=f"{kind} export needs pyarrow installed on the server")
     
-    # Fetch data - simplified (role logic should be in CRUD or handled here)
+    # Rows are fetched page by page as the response streams, so memory stays bounded
     if entity == "clients":
-        data = data_map[entity](db, user["id"], user["role"])
+        rows = iter_rows(data_map[entity], db, user["id"], user["role"], fields=columns)
     else:
-        data = data_map[entity](db)
+        rows = iter_rows(data_map[entity], db, fields=columns)
+    if columns:
+        # Drop the key column pagination needed unless it was asked for, and keep the requested order
+        rows = ({column: row.get(column) for column in columns} for row in rows)
+
+    # Fetch (PostgREST pages) and serialize (CSV/xlsx writing) are timed separately as the body streams
+    fetch = StageTimer(f"export.{kind}.fetch")
+    rows = fetch.wrap(rows)
+    serialize = StageTimer(f"export.{kind}.serialize", exclude=fetch)
         
-    if format == "xlsx":
-        return io_utils.export_to_excel(data, entity, user.get("email", "System User"))
+    if kind == "xlsx":
+        return io_utils.export_to_excel(rows, entity, user.get("email", "System User"),
+                                        io_utils.export_columns(EXPORT_MODELS[entity], columns), timer=serialize)
+    elif kind == "parquet":
+        return io_utils.export_to_parquet(rows, entity, io_utils.arrow_schema(EXPORT_MODELS[entity], columns), timer=serialize)
+    elif kind == "arrow":
+        return io_utils.export_to_arrow(rows, entity, io_utils.arrow_schema(EXPORT_MODELS[entity], columns), timer=serialize)
     else:
-        return io_utils.export_to_csv(data, entity)
+        return io_utils.export_to_csv(rows, entity, io_utils.export_columns(EXPORT_MODELS[entity], columns), timer=serialize)
+
+# Dashboard
+@app.get("/api/dashboard")
+async def dashboard(
+    response: Response,
+    user=Depends(get_current_user),
+    etag: Optional[str] = conditional("clients", "proposals", "assignments", "invoices", "receipts"),
+    db=Depends(get_supabase)
+):
+    # One auth check, then every section runs concurrently on the DB pool
+    result = await dashboard_crud.get_dashboard(db, user)
+    response.headers["Server-Timing"] = ", ".join(
+        f"{name};dur={ms}" for name, ms in result["timings_ms"].items()
+    )
+    return trusted_json(result, response)
 
 # Reporting Endpoints
 @app.get("/api/reports/billing")
-async def billing_summary(user=Depends(RoleChecker([UserRole.PARTNER, UserRole.DIRECTOR])), db=Depends(get_supabase)):
-    return reports_crud.get_billing_summary(db)
+async def billing_summary(
+    response: Response,
+    user=Depends(RoleChecker([UserRole.PARTNER, UserRole.DIRECTOR])),
+    etag: Optional[str] = conditional("invoices", "receipts"),
+    db=Depends(get_supabase)
+):
+    result = await run_db(reports_crud.get_billing_summary, db)
+    return trusted_json(result, response)
 
 @app.get("/api/reports/aging")
-async def ar_aging(user=Depends(RoleChecker([UserRole.PARTNER, UserRole.DIRECTOR])), db=Depends(get_supabase)):
-    return reports_crud.get_ar_aging(db)
+async def ar_aging(
+    response: Response,
+    as_of: Optional[date] = None,
+    basis: str = "invoice_date",
+    edges: Optional[str] = Query(None, description="Comma-separated bucket edges in days, e.g. 30,60,90"),
+    group_by: Optional[str] = Query(None, description="client, assignment or partner"),
+    user=Depends(RoleChecker([UserRole.PARTNER, UserRole.DIRECTOR])),
+    etag: Optional[str] = conditional("invoices", "receipts", "assignments"),
+    db=Depends(get_supabase)
+):
+    result = await run_db(reports_crud.get_ar_aging, db, as_of, basis, parse_edges(edges), group_by)
+    return trusted_json(result, response)
 
 @app.get("/api/reports/proposals")
-async def proposal_stats(user=Depends(get_current_user), db=Depends(get_supabase)):
-    return reports_crud.get_proposal_stats(db)
+async def proposal_stats(
+    response: Response,
+    user=Depends(get_current_user),
+    etag: Optional[str] = conditional("proposals"),
+    db=Depends(get_supabase)
+):
+    result = await run_db(reports_crud.get_proposal_stats, db)
+    return trusted_json(result, response)
+
+@app.get("/api/reports/cache-stats")
+async def report_cache_stats(user=Depends(RoleChecker([UserRole.PARTNER, UserRole.DIRECTOR]))):
+    return report_cache.get_stats()
+
+@app.get("/api/db/stats")
+async def db_transport_stats(user=Depends(RoleChecker([UserRole.PARTNER, UserRole.DIRECTOR]))):
+    return get_transport_stats()
+
+@app.get("/api/audit-logs", response_model=Page[AuditLog])
+async def audit_logs(
+    user_id: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[str] = None,
+    action: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    user=Depends(RoleChecker([UserRole.PARTNER, UserRole.DIRECTOR])),
+    db=Depends(get_supabase)
+):
+    # No ETag: audit rows are written through the queue without bumping table versions
+    page = await run_db(audit_crud.get_audit_logs, db, cursor, limit, user_id, entity_type, entity_id,
+                        action, date_from, date_to)
+    return trusted_json(page, model=Page[AuditLog])
+
+@app.get("/api/audit-logs/stats")
+async def audit_queue_stats(user=Depends(RoleChecker([UserRole.PARTNER, UserRole.DIRECTOR]))):
+    return {**audit_crud.audit_queue.get_stats(), "archive": audit_archive.get_stats()}
 
-@app.get("/api/audit-logs")
-async def audit_logs(user=Depends(RoleChecker([UserRole.PARTNER, UserRole.DIRECTOR])), db=Depends(get_supabase)):
-    return audit_crud.get_audit_logs(db)
+@app.post("/api/audit-logs/archive")
+async def archive_audit_logs(
+    dry_run: bool = False,
+    retention_days: int = Query(audit_crud.AUDIT_RETENTION_DAYS, ge=1),
+    user=Depends(RoleChecker([UserRole.PARTNER])),
+    db=Depends(get_supabase)
+):
+    return await run_db(audit_crud.archive_logs, db, retention_days, dry_run)
 
 @app.get("/api/users")
 async def get_users(user=Depends(RoleChecker([UserRole.PARTNER])), db=Depends(get_supabase)):
-    return user_crud.get_users(db)
+    return await run_db(user_crud.get_users, db)
 
 @app.put("/api/users/{user_id}/role")
 async def update_user_role(
@@ -162,31 +502,50 @@ async def update_user_role(
     role = role_update.get("role")
     if role not in [r.value for r in UserRole]:
         raise HTTPException(status_code=400, detail="Invalid role")
-    return user_crud.update_user_role(db, user_id, role)
+    return await run_db(user_crud.update_user_role, db, user_id, role, user["id"])
+
+UPLOAD_READ_CHUNK = 1024 * 1024
+
+# Same roles as the corresponding create endpoints
+UPLOAD_ROLES = {
+    "clients": [UserRole.PARTNER, UserRole.DIRECTOR, UserRole.MANAGER],
+    "proposals": [UserRole.PARTNER, UserRole.DIRECTOR, UserRole.MANAGER],
+    "assignments": [UserRole.PARTNER, UserRole.DIRECTOR],
+    "invoices": [UserRole.DIRECTOR, UserRole.PARTNER],
+    "receipts": [UserRole.DIRECTOR, UserRole.PARTNER],
+}
 
-@app.post("/api/upload/{entity}")
+@app.post("/api/upload/{entity}", status_code=202)
 async def upload_data(
     entity: str,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     user=Depends(get_current_user),
     db=Depends(get_supabase)
 ):
-    try:
-        content = await file.read()
-        data = upload_utils.parse_upload_file(content, file.filename)
-        
-        if entity == "clients":
-            validated_data = upload_utils.validate_clients(data)
-            created_count = 0
-            for client_create in validated_data:
-                client_crud.create_client(db, client_create, user["id"])
-                created_count += 1
-            return {"message": f"Successfully uploaded {created_count} clients"}
-        else:
-            raise HTTPException(status_code=400, detail="Bulk upload for this entity is not yet implemented")
-            
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    if entity not in upload_utils.IMPORTERS:
+        raise HTTPException(status_code=400, detail="Invalid entity")
+    RoleChecker(UPLOAD_ROLES[entity])(user)
+    if not file.filename or not file.filename.lower().endswith(('.csv', '.xls', '.xlsx')):
+        raise HTTPException(status_code=400, detail="Unsupported file format. Please upload a CSV or Excel file.")
+
+    job = job_utils.create_job(entity, file.filename, user["id"])
+    path = job_utils.spool_path(job["job_id"], file.filename)
+
+    # Spool to disk in fixed-size chunks; the import itself runs after the response is sent
+    with open(path, "wb") as out:
+        while chunk := await file.read(UPLOAD_READ_CHUNK):
+            out.write(chunk)
+
+    background_tasks.add_task(upload_utils.run_import, db, job["job_id"], path, user["id"])
+    return job
+
+@app.get("/api/upload/jobs/{job_id}")
+async def upload_job_status(job_id: str, user=Depends(get_current_user)):
+    job = job_utils.get_job(job_id)
+    if not job or (job["user_id"] != str(user["id"]) and user["role"] != UserRole.PARTNER.value):
+        raise HTTPException(status_code=404, detail="Upload job not found")
+    return job
 
 if __name__ == "__main__":
     import uvicorn
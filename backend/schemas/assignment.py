@@ -3,6 +3,8 @@ from typing import Optional
 from datetime import datetime, date
 from uuid import UUID
 
+ASSIGNMENT_STATUSES = ("Planned", "Ongoing", "On Hold", "Completed")
+
 class AssignmentBase(BaseModel):
     assignment_code: str
     client_code: str
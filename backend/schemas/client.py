@@ -3,6 +3,8 @@ from typing import Optional
 from datetime import datetime
 from uuid import UUID
 
+CLIENT_STATUSES = ("Active", "Inactive")
+
 class ClientBase(BaseModel):
     client_code: Optional[str] = None
     client_name: str
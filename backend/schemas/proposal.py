@@ -3,6 +3,8 @@ from typing import Optional
 from datetime import datetime, date
 from uuid import UUID
 
+PROPOSAL_STATUSES = ("Draft", "Issued", "Accepted", "Rejected")
+
 class ProposalBase(BaseModel):
     client_code: str
     service_line: Optional[str] = None
@@ -3,6 +3,9 @@ from typing import Optional
 from datetime import datetime, date
 from uuid import UUID
 
+INVOICE_STATUSES = ("Issued", "Part-Paid", "Paid", "Overdue", "Cancelled")
+RECEIPT_MODES = ("NEFT", "Cheque", "UPI", "Cash")
+
 # INVOICE
 class InvoiceBase(BaseModel):
     invoice_no: str
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# Tests never talk to a real project: the in-process stand-in (utils/memory_db.py) replaces Supabase
+os.environ["SUPABASE_URL"] = "memory://tests"
+os.environ["SUPABASE_JWT_SECRET"] = "test-secret"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PARTNER = "00000000-0000-0000-0000-00000000000a"
+
+@pytest.fixture(scope="session")
+def partner_token():
+    """Bearer token for a PARTNER; the role comes from the seeded profile, not the token."""
+    from jose import jwt
+    from database import get_client
+    get_client().seed("profiles", [{"id": PARTNER, "role": "PARTNER", "email": "partner@example.com", "full_name": "Partner"}])
+    return "Bearer " + jwt.encode({"sub": PARTNER}, os.environ["SUPABASE_JWT_SECRET"], algorithm="HS256")
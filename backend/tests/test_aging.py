@@ -0,0 +1,19 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+from utils.aging import bucket_labels, compute_aging
+
+def test_bucket_labels_do_not_overlap():
+    assert bucket_labels((30, 60)) == ["0-30", "31-60", "61+"]
+    assert bucket_labels((30, 60, 90)) == ["0-30", "31-60", "61-90", "91+"]
+
+def test_edge_days_fall_in_the_lower_bucket():
+    as_of = date(2024, 6, 30)
+    open_items = pd.DataFrame({
+        "invoice_date": [(as_of - timedelta(days=d)).isoformat() for d in (0, 30, 31, 60, 61)],
+        "due_date": [None] * 5,
+        "outstanding": [1.0, 2.0, 4.0, 8.0, 16.0],
+    })
+    buckets = compute_aging(open_items, as_of, edges=(30, 60))["buckets"]
+    assert buckets == {"0-30": 3.0, "31-60": 12.0, "61+": 16.0}
@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from crud import audit, user
+from utils.audit_archive import AuditArchive, sort_key
+from utils.memory_db import MemoryClient
+
+PARTNER = "00000000-0000-0000-0000-00000000000a"
+MANAGER = "00000000-0000-0000-0000-00000000000b"
+
+class FlakyInserts:
+    """Fails audit_logs inserts while `down` is set; everything else goes to the memory client."""
+
+    def __init__(self, db: MemoryClient):
+        self.db, self.down = db, True
+
+    def table(self, name: str):
+        query = self.db.table(name)
+        if self.down:
+            def insert(*args, **kwargs):
+                raise ConnectionError("database unavailable")
+            query.insert = insert
+        return query
+
+@pytest.fixture
+def queue(tmp_path):
+    # Batches never fill up, so the background thread stays idle and only the test flushes
+    return audit.AuditQueue(batch_size=10, flush_interval=60, spool_dir=str(tmp_path))
+
+def test_role_change_is_audited_synchronously(monkeypatch):
+    monkeypatch.setattr(audit, "AUDIT_WRITE_MODE", "async")
+    db = MemoryClient()
+    db.seed("profiles", [{"id": MANAGER, "role": "MANAGER", "email": "m@example.com"}])
+    user.update_user_role(db, MANAGER, "DIRECTOR", PARTNER)
+    # Stored before returning, not left in the write-behind queue
+    [entry] = db.rows("audit_logs")
+    assert (entry["user_id"], entry["entity_type"], entry["entity_id"]) == (PARTNER, "profile", MANAGER)
+    assert entry["details"] == "Role changed to DIRECTOR"
+
+def test_spool_counters_track_what_reached_disk(queue):
+    db = FlakyInserts(MemoryClient())
+    rows = [{"user_id": PARTNER, "action": "CREATE", "entity_type": "client", "entity_id": f"C{i}",
+             "details": None, "created_at": "2024-01-01T00:00:00"} for i in range(3)]
+    queue.put(db, rows)
+    queue.flush()
+    assert queue.stats["spooled"] == 3 and queue.get_stats()["spool_depth"] == 3
+
+    # Replay fails too: the rows are written back and counted separately
+    queue.flush()
+    assert (queue.stats["spooled"], queue.stats["respooled"], queue.stats["replayed"]) == (3, 3, 0)
+
+    db.down = False
+    queue.flush()
+    assert (queue.stats["spooled"], queue.stats["respooled"], queue.stats["replayed"]) == (3, 3, 3)
+    assert queue.get_stats()["spool_depth"] == 0
+    assert sorted(r["entity_id"] for r in db.db.rows("audit_logs")) == ["C0", "C1", "C2"]
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    archive = AuditArchive(str(tmp_path / "archive"))
+    monkeypatch.setattr(audit, "audit_archive", archive)
+    return archive
+
+def history(days: int = 120) -> MemoryClient:
+    """One entry every three days, alternating client and invoice entries."""
+    db = MemoryClient()
+    now = datetime.now(timezone.utc)
+    db.seed("audit_logs", [
+        {"user_id": PARTNER, "action": "CREATE", "entity_type": ("client", "invoice")[i % 2], "entity_id": f"E{i}",
+         "details": None, "created_at": (now - timedelta(days=3 * i, hours=1)).isoformat()}
+        for i in range(days // 3)
+    ])
+    return db
+
+def walk(db, limit: int, **filters):
+    ids, cursor = [], None
+    while True:
+        page = audit.get_audit_logs(db, cursor=cursor, limit=limit, **filters)
+        ids.extend(row["id"] for row in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return ids
+
+def test_archived_rows_page_on_after_the_table(archive):
+    db = history()
+    newest_first = sorted(db.rows("audit_logs"), key=sort_key, reverse=True)
+    since = (datetime.now(timezone.utc) - timedelta(days=60)).date()
+
+    report = audit.archive_logs(db, retention_days=30, batch_size=7)
+    assert report["deleted"] == report["archived"] == 30
+    assert len(db.rows("audit_logs")) == 10
+    # Segments are per month and per batch
+    assert len(archive.segments()) >= 4
+
+    for limit in (1, 7, 50):
+        assert walk(db, limit) == [row["id"] for row in newest_first], limit
+    assert walk(db, 4, entity_type="invoice") == [row["id"] for row in newest_first if row["entity_type"] == "invoice"]
+    assert walk(db, 5, date_from=since) == [row["id"] for row in newest_first if sort_key(row)[0].date() >= since]
+
+def test_interrupted_archive_run_is_not_read_twice(archive):
+    db = history(30)
+    rows = db.rows("audit_logs")
+    audit.archive_logs(db, retention_days=0)
+    assert db.rows("audit_logs") == []
+    # As if the run had died after writing its segment but before the delete
+    db.seed("audit_logs", rows)
+    assert walk(db, 3) == [row["id"] for row in sorted(rows, key=sort_key, reverse=True)]
+    audit.archive_logs(db, retention_days=0)
+    assert archive.get_stats()["rows"] == len(rows)
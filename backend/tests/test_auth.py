@@ -0,0 +1,55 @@
+import asyncio
+import os
+import time
+
+import pytest
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import JWTError, jwt
+
+import auth
+from auth import TokenCache, UserRole, get_current_user
+from utils.memory_db import MemoryClient
+
+def current_role(db, claims) -> str:
+    token = jwt.encode(claims, os.environ["SUPABASE_JWT_SECRET"], algorithm="HS256")
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    return asyncio.run(get_current_user(credentials, db))["role"]
+
+def test_role_claim_is_ignored_without_a_profile():
+    user = "00000000-0000-0000-0000-0000000000b1"
+    assert current_role(MemoryClient(), {"sub": user, "role": "PARTNER"}) == UserRole.MANAGER.value
+
+def test_profile_role_wins_over_the_claim():
+    user = "00000000-0000-0000-0000-0000000000b2"
+    db = MemoryClient()
+    db.seed("profiles", [{"id": user, "role": "PARTNER", "email": "b2@example.com", "full_name": "B2"}])
+    assert current_role(db, {"sub": user, "role": "MANAGER"}) == UserRole.PARTNER.value
+
+def test_cached_claims_expire_with_the_token(monkeypatch):
+    cache = TokenCache(max_entries=2, ttl=300)
+    now = time.time()
+    cache.set("short", {"sub": "a", "exp": now + 5})
+    cache.set("no-exp", {"sub": "b"})
+    assert cache.get("short")["sub"] == "a"
+    monkeypatch.setattr(time, "time", lambda: now + 10)
+    assert cache.get("short") is None
+    assert cache.get("no-exp")["sub"] == "b"
+    monkeypatch.setattr(time, "time", lambda: now + 301)
+    assert cache.get("no-exp") is None
+
+def test_cache_evicts_least_recently_used():
+    cache = TokenCache(max_entries=2, ttl=300)
+    cache.set("t1", {"sub": "1"})
+    cache.set("t2", {"sub": "2"})
+    cache.get("t1")
+    cache.set("t3", {"sub": "3"})
+    assert cache.get("t2") is None and cache.get("t1") and cache.get("t3")
+
+def test_invalid_tokens_are_not_cached(monkeypatch):
+    cache = TokenCache()
+    monkeypatch.setattr(auth, "token_cache", cache)
+    forged = jwt.encode({"sub": "x"}, "wrong-secret", algorithm="HS256")
+    for _ in range(2):
+        with pytest.raises(JWTError):
+            auth.verify_token(forged)
+    assert cache.get_stats()["entries"] == 0
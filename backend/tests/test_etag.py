@@ -0,0 +1,23 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+
+@pytest.fixture
+def client(partner_token):
+    with TestClient(app) as client:
+        client.headers["Authorization"] = partner_token
+        yield client
+
+def test_matching_etag_gets_304(client, monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    first = client.get("/api/clients")
+    etag = first.headers["etag"]
+    assert client.get("/api/clients", headers={"If-None-Match": etag}).status_code == 304
+
+def test_no_etag_when_versions_are_per_worker(client, monkeypatch):
+    # Another worker's write would not change this worker's table versions
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    response = client.get("/api/clients", headers={"If-None-Match": "*"})
+    assert response.status_code == 200
+    assert "etag" not in response.headers
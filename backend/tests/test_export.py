@@ -0,0 +1,79 @@
+import io
+
+import openpyxl
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from fastapi.testclient import TestClient
+
+from database import get_client
+from main import app
+
+CREATOR = "00000000-0000-0000-0000-00000000000a"
+
+@pytest.fixture(scope="module")
+def client(partner_token):
+    db = get_client()
+    db.seed("clients", [{"client_code": "X1", "client_name": "Export Co", "created_by": CREATOR}])
+    db.seed("assignments", [{"assignment_code": "XA1", "client_code": "X1", "title": "Audit", "contracted_fee": 2000,
+                             "created_by": CREATOR}])
+    db.seed("invoices", [{"invoice_no": "XI1", "assignment_code": "XA1", "invoice_date": "2024-02-01",
+                          "amount_before_tax": 1000.255, "created_by": CREATOR,
+                          # Naive timestamp, as rows written before timestamptz was used
+                          "created_at": "2024-02-01T10:00:00"}])
+    db.seed("receipts", [{"invoice_no": "XI1", "amount_received": 500, "tds_amount": 80,
+                          "receipt_date": "2024-02-20", "mode": "NEFT", "created_by": CREATOR}])
+    with TestClient(app) as client:
+        client.headers["Authorization"] = partner_token
+        yield client
+
+def read_table(response, fmt: str) -> pa.Table:
+    if fmt == "parquet":
+        return pq.read_table(io.BytesIO(response.content))
+    return pa.ipc.open_stream(response.content).read_all()
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_columnar_export_is_typed_from_the_model(client, fmt):
+    response = client.get("/api/export/invoices", params={"format": fmt})
+    assert response.status_code == 200
+    table = read_table(response, fmt)
+    schema = table.schema
+    assert pa.types.is_date32(schema.field("invoice_date").type)
+    assert pa.types.is_decimal(schema.field("amount_with_tax").type)
+    assert schema.field("created_at").type == pa.timestamp("us", tz="UTC")
+
+    row = next(r for r in table.to_pylist() if r["invoice_no"] == "XI1")
+    assert str(row["invoice_date"]) == "2024-02-01"
+    assert float(row["amount_with_tax"]) == pytest.approx(1180.3, abs=0.01)
+    assert row["created_at"].isoformat() == "2024-02-01T10:00:00+00:00"
+
+def test_columnar_export_keeps_requested_columns(client):
+    response = client.get("/api/export/invoices", params={"format": "parquet", "fields": "due_date,invoice_no"})
+    assert read_table(response, "parquet").column_names == ["due_date", "invoice_no"]
+
+def sheet_rows(response, title: str):
+    sheet = openpyxl.load_workbook(io.BytesIO(response.content), read_only=True)[title]
+    header, *rows = sheet.iter_rows(values_only=True)
+    return [dict(zip(header, row)) for row in rows]
+
+def test_workbook_joins_and_rolls_up_one_client(client):
+    response = client.get("/api/export/workbook", params={"client_code": "X1"})
+    assert response.status_code == 200
+    rollup = sheet_rows(response, "Assignment Rollup")
+    assert [r["assignment_code"] for r in rollup] == ["XA1", None]
+    row, total = rollup
+    # Collected counts TDS, as in the ledger
+    assert (row["invoices"], row["billed"], row["collected"], row["tds"]) == (1, 1180.3, 580, 80)
+    assert row["outstanding"] == total["outstanding"] == 600.3
+    [receipt] = sheet_rows(response, "Receipts")
+    assert (receipt["assignment_code"], receipt["client_code"], receipt["client_name"]) == ("XA1", "X1", "Export Co")
+
+def test_workbook_date_range_keeps_receipts_joined(client):
+    # The receipt is in range, the invoice it settles is not
+    response = client.get("/api/export/workbook", params={"client_code": "X1", "date_from": "2024-02-10"})
+    assert sheet_rows(response, "Invoices") == []
+    [receipt] = sheet_rows(response, "Receipts")
+    assert (receipt["assignment_code"], receipt["client_code"]) == ("XA1", "X1")
+
+def test_workbook_unknown_client_is_404(client):
+    assert client.get("/api/export/workbook", params={"client_code": "NOPE"}).status_code == 404
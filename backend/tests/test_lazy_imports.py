@@ -0,0 +1,14 @@
+import os
+import subprocess
+import sys
+
+from utils.lazy import HEAVY_MODULES
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_app_import_leaves_heavy_modules_unloaded():
+    # A fresh interpreter: this test process has long since imported them
+    script = f"import main, sys; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", script], cwd=BACKEND, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
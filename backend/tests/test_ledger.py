@@ -0,0 +1,57 @@
+from datetime import date
+
+import pytest
+
+from crud import ledger, transaction
+from schemas.transaction import ReceiptCreate
+from utils.memory_db import MemoryClient
+
+USER = "00000000-0000-0000-0000-00000000000a"
+
+@pytest.fixture
+def db():
+    db = MemoryClient()
+    db.seed("clients", [{"client_code": "C1", "client_name": "Acme"}])
+    db.seed("assignments", [{"assignment_code": "A1", "client_code": "C1", "title": "Audit"}])
+    # 1000 + 18% GST
+    db.seed("invoices", [{"invoice_no": "I1", "assignment_code": "A1", "invoice_date": "2024-02-01", "amount_before_tax": 1000}])
+    ledger.refresh(db, ["I1"])
+    return db
+
+def receive(db, amount: float, tds: float = 0):
+    receipt = ReceiptCreate(invoice_no="I1", amount_received=amount, tds_amount=tds,
+                            receipt_date=date(2024, 2, 20), mode="NEFT")
+    return transaction.create_receipt(db, receipt, USER)
+
+def invoice_status(db) -> str:
+    return next(r["status"] for r in db.rows("invoices") if r["invoice_no"] == "I1")
+
+def test_receipts_move_invoice_through_part_paid(db):
+    assert invoice_status(db) == "Issued"
+    assert ledger.get_client_ledger(db, "C1")["outstanding"] == pytest.approx(1180)
+
+    first = receive(db, 500)
+    assert invoice_status(db) == "Part-Paid"
+    summary = ledger.get_client_ledger(db, "C1")
+    assert (summary["paid"], summary["outstanding"], summary["open_invoices"]) == (500, pytest.approx(680), 1)
+
+    # TDS withheld by the client settles the balance like cash does
+    receive(db, 580, tds=100)
+    assert invoice_status(db) == "Paid"
+    assert ledger.get_client_ledger(db, "C1")["open_invoices"] == 0
+    assert ledger.get_open_items(db)["items"] == []
+
+    transaction.delete_receipts(db, [first["receipt_id"]])
+    assert invoice_status(db) == "Part-Paid"
+    assert ledger.get_client_ledger(db, "C1")["outstanding"] == pytest.approx(500)
+
+def test_reconcile_repairs_drift(db):
+    receive(db, 500)
+    assert ledger.reconcile(db, fix=False)["drifted"] == 0
+    # A receipt written behind the application's back, so no refresh ran
+    db.seed("receipts", [{"invoice_no": "I1", "amount_received": 680, "receipt_date": "2024-03-01", "mode": "NEFT"}])
+
+    report = ledger.reconcile(db)
+    assert (report["drifted"], report["sample"], report["fixed"]) == (1, ["I1"], True)
+    assert report["after_fix"]["drifted"] == 0
+    assert invoice_status(db) == "Paid"
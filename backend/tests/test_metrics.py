@@ -0,0 +1,55 @@
+import json
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from utils import metrics
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+def test_metrics_closed_without_token(client, monkeypatch):
+    monkeypatch.setattr(main, "METRICS_TOKEN", None)
+    assert client.get("/api/metrics").status_code == 404
+
+def test_metrics_require_the_token(client, monkeypatch):
+    monkeypatch.setattr(main, "METRICS_TOKEN", "scrape-secret")
+    assert client.get("/api/metrics").status_code == 401
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/api/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+def test_metrics_merge_worker_snapshots(tmp_path, monkeypatch):
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path))
+    registry = metrics.Registry()
+    requests = registry.register(metrics.Counter("t_requests_total", "Requests.", ("route",)))
+    in_flight = registry.register(metrics.Gauge("t_in_flight", "In flight."))
+    duration = registry.register(metrics.Histogram("t_duration_seconds", "Duration.", buckets=(0.1, 1)))
+    registry.gauge_callback("t_queue", "Queue depth.", lambda: {"": 3})
+    requests.inc(route="/a")
+    in_flight.inc()
+    duration.observe(0.05)
+
+    # Another live worker, and one that has exited; 2**22 + 1 is above Linux's pid_max
+    other, exited = os.getppid(), 2 ** 22 + 1
+    for pid, count in ((other, 2), (exited, 4)):
+        (tmp_path / f"{pid}.json").write_text(json.dumps({
+            "metrics": {"t_requests_total": [[["/a"], count]], "t_in_flight": [[[], 5]],
+                        "t_duration_seconds": [[[], [0, count, 2.0 * count, count]]]},
+            "collected": {"t_queue": {"": 7}},
+        }))
+
+    text = registry.render()
+    assert 't_requests_total{route="/a"} 7' in text
+    # Gauges only count live workers
+    assert "t_in_flight 6" in text
+    assert 't_duration_seconds_bucket{le="0.1"} 1' in text
+    assert 't_duration_seconds_bucket{le="1"} 7' in text
+    assert "t_duration_seconds_count 7" in text
+    assert f't_queue{{pid="{os.getpid()}"}} 3' in text and f't_queue{{pid="{other}"}} 7' in text
+    assert f'pid="{exited}"' not in text
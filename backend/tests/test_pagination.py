@@ -0,0 +1,53 @@
+import pytest
+
+from utils.memory_db import MemoryClient
+from utils.pagination import IN_BATCH_SIZE, InvalidQueryError, paginate, paginate_in
+
+SORT_FIELDS = {"client_name", "created_at"}
+
+def clients_db(count: int) -> MemoryClient:
+    client = MemoryClient(latency_ms=0, jitter_ms=0)
+    # Few distinct names so pages split inside runs of equal sort values
+    client.seed("clients", [
+        {"client_code": f"C{i:05d}", "client_name": f"Client {i % 7}", "status": "Active",
+         "created_at": f"2024-01-{i % 28 + 1:02d}T00:00:00"}
+        for i in range(count)
+    ])
+    return client
+
+def walk(fetch_page):
+    codes, cursor = [], None
+    while True:
+        page = fetch_page(cursor)
+        codes.extend(row["client_code"] for row in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return codes
+
+def test_paginate_in_matches_a_single_query_across_batches():
+    db = clients_db(4 * IN_BATCH_SIZE)
+    # Every other client plus a run at the start: three batches of values
+    visible = [f"C{i:05d}" for i in range(0, 4 * IN_BATCH_SIZE, 2)] + [f"C{i:05d}" for i in range(1, 400, 2)]
+    assert len(visible) > 2 * IN_BATCH_SIZE
+    wanted = set(visible)
+
+    for sort in (None, "-client_code", "created_at", "-created_at"):
+        full = walk(lambda cursor: paginate(db.table("clients").select("*"), "client_code", sort, SORT_FIELDS, cursor, 500))
+        expected = [code for code in full if code in wanted]
+        batched = walk(lambda cursor: paginate_in(lambda: db.table("clients").select("*"), "client_code", visible,
+                                                  "client_code", sort, SORT_FIELDS, cursor, 73, {"created_at"}))
+        assert batched == expected, sort
+
+def test_paginate_in_refuses_text_sorts_across_batches():
+    db = clients_db(2 * IN_BATCH_SIZE)
+    codes = [f"C{i:05d}" for i in range(2 * IN_BATCH_SIZE)]
+
+    def page(values):
+        return paginate_in(lambda: db.table("clients").select("*"), "client_code", values, "client_code",
+                           "client_name", SORT_FIELDS, None, 50, {"created_at"})
+
+    # One batch is a single query, ordered by the database alone
+    assert len(page(codes[:IN_BATCH_SIZE])["items"]) == 50
+    # Merging would compare names by code point rather than by the column's collation
+    with pytest.raises(InvalidQueryError):
+        page(codes)
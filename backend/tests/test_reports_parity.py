@@ -0,0 +1,161 @@
+"""
+The report_* SQL functions (schema.sql, section 11) against the Python fallbacks
+in crud/reports.py. Each function body is taken verbatim from schema.sql and run
+in SQLite over the same rows the memory client holds, then registered as that
+client's RPC, so both paths go through the real crud code on one dataset.
+"""
+import re
+import sqlite3
+from datetime import date
+from pathlib import Path
+
+import httpx
+import pytest
+
+from crud import reports
+from utils.memory_db import MemoryClient
+
+SCHEMA_SQL = Path(__file__).resolve().parents[2] / "schema.sql"
+AS_OF = date(2024, 6, 30)
+REPORT_FUNCTIONS = ("report_billing_summary", "report_open_invoices", "report_proposal_stats")
+TABLES = ("clients", "assignments", "proposals", "invoices", "receipts")
+
+def sql_function(name: str):
+    """(returned column names, SELECT body) of a schema.sql function, rewritten for SQLite."""
+    match = re.search(rf"FUNCTION public\.{name}\(.*?\)\s*RETURNS TABLE \((.*?)\) AS \$\$(.*?)\$\$",
+                      SCHEMA_SQL.read_text(), re.S)
+    assert match, f"{name} not found in schema.sql"
+    columns = [c.split()[0] for c in match.group(1).split(",")]
+    body = re.sub(r"\bas_of\b", ":as_of", match.group(2).replace("public.", "")).strip().rstrip(";")
+    return columns, body
+
+def table_columns(table: str):
+    match = re.search(rf"CREATE TABLE IF NOT EXISTS public\.{table} \((.*?)\n\);", SCHEMA_SQL.read_text(), re.S)
+    return [line.split()[0] for line in match.group(1).strip().splitlines()]
+
+def run_in_sqlite(client: MemoryClient, name: str, params: dict):
+    columns, body = sql_function(name)
+    conn = sqlite3.connect(":memory:")
+    for table in TABLES:
+        rows = client.rows(table)
+        names = table_columns(table)
+        conn.execute(f"CREATE TABLE {table} ({', '.join(names)})")
+        conn.executemany(f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                         [[row.get(c) for c in names] for row in rows])
+    try:
+        return [dict(zip(columns, values)) for values in conn.execute(body, {"as_of": params.get("as_of")})]
+    finally:
+        conn.close()
+
+def with_sql_rpcs(client: MemoryClient) -> MemoryClient:
+    for name in REPORT_FUNCTIONS:
+        client.register_rpc(name, lambda c, params, name=name: run_in_sqlite(c, name, params))
+    return client
+
+@pytest.fixture(autouse=True)
+def rpc_enabled(monkeypatch):
+    monkeypatch.setattr(reports, "REPORTS_USE_RPC", True)
+    monkeypatch.setattr(reports, "_rpc_unavailable_until", {})
+
+@pytest.fixture
+def empty_db():
+    return with_sql_rpcs(MemoryClient())
+
+@pytest.fixture
+def db():
+    client = MemoryClient()
+    client.seed("clients", [{"client_code": "C1", "client_name": "Acme"}, {"client_code": "C2", "client_name": "Globex"}])
+    client.seed("assignments", [
+        {"assignment_code": "A1", "client_code": "C1", "title": "Audit",
+         "partner_lead": "00000000-0000-0000-0000-00000000000a"},
+        {"assignment_code": "A2", "client_code": "C2", "title": "Tax", "partner_lead": None},
+    ])
+    client.seed("proposals", [
+        {"proposal_id": 1, "client_code": "C1", "status": "Draft"},
+        {"proposal_id": 2, "client_code": "C1", "status": "Draft"},
+        {"proposal_id": 3, "client_code": "C2", "status": "Won"},
+        {"proposal_id": 4, "client_code": "C2", "status": None},
+    ])
+    client.seed("invoices", [
+        # part paid before AS_OF, the rest after it
+        {"invoice_no": "I1", "assignment_code": "A1", "invoice_date": "2024-01-10", "due_date": "2024-02-09",
+         "amount_before_tax": 1000, "gst_pct": 18},
+        # settled in full
+        {"invoice_no": "I2", "assignment_code": "A1", "invoice_date": "2024-03-01", "amount_before_tax": 500, "gst_pct": 18},
+        {"invoice_no": "I3", "assignment_code": "A2", "invoice_date": "2024-04-01", "amount_before_tax": 800,
+         "gst_pct": 18, "status": "Cancelled"},
+        # NULL amount: NULL amount_with_tax, never open
+        {"invoice_no": "I4", "assignment_code": "A2", "invoice_date": "2024-05-01", "amount_before_tax": None, "gst_pct": 18},
+        # issued after AS_OF
+        {"invoice_no": "I5", "assignment_code": "A2", "invoice_date": "2024-08-01", "amount_before_tax": 300, "gst_pct": 18},
+        {"invoice_no": "I6", "assignment_code": "A2", "invoice_date": "2024-02-15", "amount_before_tax": 250,
+         "gst_pct": 0, "status": None},
+        # overpaid
+        {"invoice_no": "I7", "assignment_code": "A1", "invoice_date": "2024-06-01", "amount_before_tax": 100, "gst_pct": 18},
+    ])
+    client.seed("receipts", [
+        {"receipt_id": 1, "invoice_no": "I1", "amount_received": 500, "tds_amount": 100, "receipt_date": "2024-02-01", "mode": "NEFT"},
+        {"receipt_id": 2, "invoice_no": "I1", "amount_received": 200, "tds_amount": None, "receipt_date": "2024-07-15", "mode": "NEFT"},
+        {"receipt_id": 3, "invoice_no": "I2", "amount_received": 540, "tds_amount": 50, "receipt_date": "2024-03-20", "mode": "Cheque"},
+        {"receipt_id": 4, "invoice_no": "I6", "amount_received": None, "tds_amount": 25, "receipt_date": "2024-03-01", "mode": "TDS"},
+        {"receipt_id": 5, "invoice_no": "I7", "amount_received": 200, "tds_amount": 0, "receipt_date": "2024-06-10", "mode": "NEFT"},
+    ])
+    return with_sql_rpcs(client)
+
+def open_item_rows(frame):
+    # The two paths type dates and missing values differently; compare the values
+    rows = []
+    for record in frame.to_dict("records"):
+        row = {}
+        for column in reports.OPEN_ITEM_COLUMNS:
+            value = record[column]
+            if value is None or value != value:  # NaN / NaT
+                value = None
+            elif column == "outstanding":
+                value = pytest.approx(float(value))
+            elif column in ("invoice_date", "due_date"):
+                value = str(value)[:10]
+            else:
+                value = str(value)
+            row[column] = value
+        rows.append(row)
+    return sorted(rows, key=lambda r: r["invoice_no"])
+
+def test_billing_summary_parity(db):
+    via_rpc = reports._billing_summary(db)
+    assert reports._rpc_unavailable_until == {}
+    assert via_rpc == pytest.approx(reports.get_billing_summary_python(db))
+    assert via_rpc["total_billed"] == pytest.approx(1180 + 590 + 944 + 354 + 250 + 118)
+
+def test_open_items_parity(db):
+    via_rpc = reports.get_open_items(db, AS_OF)
+    assert reports._rpc_unavailable_until == {}
+    python = reports.get_open_items_python(db, AS_OF)
+    assert open_item_rows(via_rpc) == open_item_rows(python)
+    assert [r["invoice_no"] for r in open_item_rows(via_rpc)] == ["I1", "I6"]
+
+def test_proposal_stats_parity(db):
+    via_rpc = reports._proposal_stats(db)
+    assert reports._rpc_unavailable_until == {}
+    assert via_rpc == reports.get_proposal_stats_python(db) == {"Draft": 2, "Won": 1, None: 1}
+
+def test_empty_database_parity(empty_db):
+    assert reports._billing_summary(empty_db) == pytest.approx(reports.get_billing_summary_python(empty_db))
+    assert open_item_rows(reports.get_open_items(empty_db, AS_OF)) == open_item_rows(reports.get_open_items_python(empty_db, AS_OF)) == []
+    assert reports._proposal_stats(empty_db) == reports.get_proposal_stats_python(empty_db) == {}
+    assert reports._rpc_unavailable_until == {}
+
+def test_missing_function_falls_back():
+    fallback = MemoryClient()
+    fallback.seed("proposals", [{"proposal_id": 1, "client_code": "C1", "status": "Won"}])
+    assert reports._proposal_stats(fallback) == {"Won": 1}
+    assert "report_proposal_stats" in reports._rpc_unavailable_until
+
+def test_transient_rpc_error_is_raised(db):
+    def timeout(client, params):
+        raise httpx.ReadTimeout("database busy")
+    db.register_rpc("report_open_invoices", timeout)
+    with pytest.raises(httpx.ReadTimeout):
+        reports.get_open_items(db, AS_OF)
+    # Not treated as a missing function, so the next call tries the RPC again
+    assert reports._rpc_unavailable_until == {}
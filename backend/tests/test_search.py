@@ -0,0 +1,36 @@
+from utils.memory_db import MemoryClient
+from utils.search import SearchIndex
+
+def build() -> SearchIndex:
+    db = MemoryClient()
+    db.seed("clients", [{"client_code": "C1", "client_name": "Acme Industries"},
+                        {"client_code": "C2", "client_name": "Globex Corporation"}])
+    db.seed("assignments", [{"assignment_code": "A1", "client_code": "C1", "title": "Statutory audit"},
+                            {"assignment_code": "A2", "client_code": "C2", "title": "Tax audit"}])
+    index = SearchIndex()
+    index.build(db)
+    return index
+
+def found(results):
+    return [(r["entity"], r["id"]) for r in results]
+
+def test_prefix_and_typo_matches():
+    index = build()
+    assert found(index.search("glob")) == [("client", "C2")]
+    assert found(index.search("industreis")) == [("client", "C1")]
+    # Documents matching every term rank above those matching one
+    assert found(index.search("tax audit"))[0] == ("assignment", "A2")
+
+def test_scoping_and_filters():
+    index = build()
+    assert set(found(index.search("audit"))) == {("assignment", "A1"), ("assignment", "A2")}
+    assert found(index.search("audit", client_codes=["C1"])) == [("assignment", "A1")]
+    assert found(index.search("audit", entities=["client"])) == []
+
+def test_writes_update_the_index():
+    index = build()
+    index.upsert("client", [{"client_code": "C1", "client_name": "Initech"}])
+    assert found(index.search("acme")) == []
+    assert found(index.search("initech")) == [("client", "C1")]
+    index.remove_clients(["C1"])
+    assert found(index.search("initech statutory")) == []
@@ -0,0 +1,95 @@
+"""
+The list endpoints return trusted rows through orjson without FastAPI's
+response_model pass; these tests hold that output to the declared models.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+import pytest
+from fastapi.testclient import TestClient
+
+from database import get_client
+from main import app
+from schemas.audit import AuditLog
+from schemas.client import Client
+from schemas.pagination import Page
+from schemas.proposal import Proposal
+from schemas.assignment import Assignment
+from schemas.transaction import Invoice, Receipt
+from utils.fields import response_model
+from utils.serialization import _adapter, trusted_json
+
+PARTNER = "00000000-0000-0000-0000-00000000000a"
+CREATED = {"created_at": "2024-01-02T09:30:00+00:00", "created_by": PARTNER}
+
+LIST_ENDPOINTS = [
+    ("/api/clients", Client, ["client_name", "status"]),
+    ("/api/proposals", Proposal, ["estimated_fees", "issued_date"]),
+    ("/api/assignments", Assignment, ["start_date", "end_date"]),
+    ("/api/invoices", Invoice, ["amount_with_tax", "due_date"]),
+    ("/api/receipts", Receipt, ["amount_received", "receipt_date"]),
+]
+
+@pytest.fixture(scope="module")
+def client(partner_token):
+    db = get_client()
+    db.seed("clients", [{"client_code": "S1", "client_name": "Acme", "status": "Active", **CREATED},
+                        {"client_code": "S2", "client_name": "Globex", "primary_contact_email": None, **CREATED}])
+    db.seed("proposals", [{"client_code": "S1", "scope_summary": "Audit", "estimated_fees": 1250.5, "issued_date": "2024-01-05", **CREATED},
+                          {"client_code": "S2", "scope_summary": None, "issued_date": None, **CREATED}])
+    db.seed("assignments", [{"assignment_code": "SA1", "client_code": "S1", "title": "Audit", "partner_lead": PARTNER,
+                             "start_date": "2024-01-10", "end_date": None, **CREATED}])
+    db.seed("invoices", [{"invoice_no": "SI1", "assignment_code": "SA1", "invoice_date": "2024-02-01",
+                          "amount_before_tax": 1000.25, "gst_pct": 18, "due_date": None, **CREATED},
+                         {"invoice_no": "SI2", "assignment_code": "SA1", "invoice_date": "2024-02-15",
+                          "amount_before_tax": 0, "due_date": "2024-03-15", **CREATED}])
+    db.seed("receipts", [{"invoice_no": "SI1", "amount_received": 500.5, "tds_amount": 0, "receipt_date": "2024-02-20",
+                          "mode": "NEFT", **CREATED}])
+    db.seed("audit_logs", [{"user_id": PARTNER, "action": "CREATE", "entity_type": "client", "entity_id": "S1",
+                            "details": None, "created_at": "2024-01-02T09:30:00+00:00"}])
+    with TestClient(app) as client:
+        client.headers["Authorization"] = partner_token
+        yield client
+
+@pytest.mark.parametrize("path, model, fields", LIST_ENDPOINTS)
+def test_list_matches_response_model(client, path, model, fields):
+    response = client.get(path)
+    assert response.status_code == 200
+    page = _adapter(Page[model]).validate_json(response.content)
+    assert page.items
+    for item in response.json()["items"]:
+        assert set(item) <= set(model.model_fields)
+
+@pytest.mark.parametrize("path, model, fields", LIST_ENDPOINTS)
+def test_sparse_list_matches_partial_model(client, path, model, fields):
+    response = client.get(path, params={"fields": ",".join(fields)})
+    assert response.status_code == 200
+    declared = Page[response_model(model, fields)]
+    page = _adapter(declared).validate_json(response.content)
+    assert page.items
+    for item in response.json()["items"]:
+        # Key and sort columns fetched for the cursor are not returned unless requested
+        assert list(item) == fields
+
+def test_audit_logs_match_response_model(client):
+    response = client.get("/api/audit-logs")
+    assert response.status_code == 200
+    page = _adapter(Page[AuditLog]).validate_json(response.content)
+    assert page.items[0].details is None
+
+def test_python_values_encode_like_the_model():
+    # Rows built in Python rather than read from PostgREST
+    content = {"items": [{"invoice_no": "I1", "assignment_code": "A1", "invoice_date": date(2024, 2, 1),
+                          "amount_before_tax": Decimal("1000.25"), "gst_pct": Decimal("18"), "due_date": None,
+                          "status": "Issued", "amount_with_tax": Decimal("1180.30"),
+                          "created_at": datetime(2024, 1, 2, 9, 30), "created_by": UUID(PARTNER)}],
+               "next_cursor": None, "limit": 50}
+    adapter = _adapter(Page[Invoice])
+    body = trusted_json(content, model=Page[Invoice]).body
+    assert adapter.validate_json(body) == adapter.validate_python(content)
+    # Numbers, as FastAPI's response_model pass would send for float fields
+    item = json.loads(body)["items"][0]
+    assert item["amount_with_tax"] == 1180.30 and item["gst_pct"] == 18
+    assert item["invoice_date"] == "2024-02-01" and item["due_date"] is None
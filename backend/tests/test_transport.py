@@ -0,0 +1,55 @@
+import httpx
+import pytest
+
+from utils.transport import CircuitBreaker, CircuitOpenError, ResilientTransport
+
+def make_client(handler, threshold: int = 5):
+    transport = ResilientTransport(2, retries=2, backoff=0, backoff_max=0,
+                                   breaker=CircuitBreaker(threshold=threshold, reset_after=60))
+    # Every attempt goes to the handler instead of a real connection pool
+    transport._transport = lambda: httpx.MockTransport(handler)
+    return httpx.Client(transport=transport, base_url="http://postgrest"), transport
+
+def test_failed_call_counts_once_after_its_retries():
+    attempts = []
+
+    def timeout(request):
+        attempts.append(request)
+        raise httpx.ReadTimeout("slow", request=request)
+
+    client, transport = make_client(timeout)
+    with pytest.raises(httpx.ReadTimeout):
+        client.get("/rest/v1/clients")
+    assert len(attempts) == 3
+    assert transport.breaker.failures == 1
+    assert transport.breaker.state == "closed"
+
+def test_unavailable_status_counts_once():
+    client, transport = make_client(lambda request: httpx.Response(503))
+    assert client.get("/rest/v1/clients").status_code == 503
+    assert transport.stats["retries"] == 2
+    assert transport.breaker.failures == 1
+
+def test_recovered_call_is_a_success():
+    statuses = iter([503, 503, 200])
+    client, transport = make_client(lambda request: httpx.Response(next(statuses)))
+    assert client.get("/rest/v1/clients").status_code == 200
+    assert transport.breaker.failures == 0
+
+def test_breaker_opens_after_threshold_calls():
+    client, transport = make_client(lambda request: httpx.Response(503), threshold=2)
+    client.get("/rest/v1/clients")
+    assert transport.breaker.state == "closed"
+    client.get("/rest/v1/clients")
+    assert transport.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.get("/rest/v1/clients")
+
+def test_half_open_probe_retries_and_closes():
+    statuses = iter([503, 200])
+    client, transport = make_client(lambda request: httpx.Response(next(statuses)), threshold=1)
+    transport.breaker.record_failure()
+    transport.breaker.opened_at -= transport.breaker.reset_after
+    # The probe's retry is part of the same call, not a second call the half-open breaker rejects
+    assert client.get("/rest/v1/clients").status_code == 200
+    assert transport.breaker.state == "closed"
@@ -0,0 +1,89 @@
+import functools
+
+import pandas as pd
+import pytest
+
+from utils import jobs, upload
+from utils.memory_db import MemoryClient
+from utils.validation import validate_frame
+
+USER = "00000000-0000-0000-0000-00000000000a"
+
+@pytest.fixture(autouse=True)
+def job_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_DIR", str(tmp_path))
+
+def import_csv(db, tmp_path, entity: str, text: str):
+    job = jobs.create_job(entity, f"{entity}.csv", USER)
+    path = tmp_path / f"{job['job_id']}.upload.csv"
+    path.write_text(text)
+    upload.run_import(db, job["job_id"], str(path), USER)
+    return jobs.get_job(job["job_id"])
+
+def test_csv_import_keeps_leading_zeros(tmp_path):
+    db = MemoryClient()
+    job = import_csv(db, tmp_path, "clients", "client_code,client_name\n007,Bond Ltd\n0010,Ten Ltd\n")
+    assert job["status"] == "completed", job
+    assert sorted(r["client_code"] for r in db.rows("clients")) == ["0010", "007"]
+
+def test_errors_report_spreadsheet_line_numbers(tmp_path):
+    db = MemoryClient()
+    job = import_csv(db, tmp_path, "clients", "client_code,client_name\nC1,One\nC2,\n")
+    assert job["status"] == "failed"
+    # Header on line 1, C1 on line 2, the bad row on line 3
+    assert [(e["row"], e["column"]) for e in job["errors"]] == [(3, "client_name")]
+    assert db.rows("clients") == []
+
+def test_model_validators_apply_to_imports():
+    db = MemoryClient()
+    db.seed("clients", [{"client_code": "C1", "client_name": "One"}])
+    frame = pd.DataFrame({
+        "assignment_code": ["A1", "A2"], "client_code": ["C1", "C1"], "title": ["Audit", "Tax"],
+        "start_date": ["2024-04-01", "2024-04-01"], "end_date": ["2024-03-31", "2024-05-01"],
+    })
+    valid, errors = validate_frame(db, "assignments", frame, start_row=2)
+    assert [m.assignment_code for m in valid] == ["A2"]
+    assert [(e["row"], e["column"], e["error"]) for e in errors] == [(2, "end_date", "end_date must be >= start_date")]
+
+def test_unknown_foreign_key_is_reported():
+    db = MemoryClient()
+    db.seed("clients", [{"client_code": "007", "client_name": "Bond"}])
+    frame = pd.DataFrame({"assignment_code": ["A1", "A2"], "client_code": ["007", "7"], "title": ["Audit", "Tax"]})
+    valid, errors = validate_frame(db, "assignments", frame, start_row=2)
+    assert [m.client_code for m in valid] == ["007"]
+    assert [(e["row"], e["column"]) for e in errors] == [(3, "client_code")]
+
+def failing_second_batch(monkeypatch, bulk_delete=None):
+    """One-row batches of clients where the second bulk insert fails."""
+    create, delete, key, entity_type = upload.IMPORTERS["clients"]
+    calls = []
+
+    def create_once(db, rows, user_id):
+        calls.append(rows)
+        if len(calls) > 1:
+            raise RuntimeError("connection reset")
+        return create(db, rows, user_id)
+
+    monkeypatch.setattr(upload, "iter_upload_chunks", functools.partial(upload.iter_upload_chunks, chunksize=1))
+    monkeypatch.setitem(upload.IMPORTERS, "clients", (create_once, bulk_delete or delete, key, entity_type))
+
+def test_failed_import_rollback_is_audited(tmp_path, monkeypatch):
+    db = MemoryClient()
+    failing_second_batch(monkeypatch)
+    job = import_csv(db, tmp_path, "clients", "client_code,client_name\nC1,One\nC2,Two\n")
+    assert job["status"] == "failed" and job["rows_inserted"] == 0
+    assert db.rows("clients") == []
+    deletes = [r for r in db.rows("audit_logs") if r["action"] == "DELETE"]
+    assert [r["entity_id"] for r in deletes] == ["C1"]
+    assert {r["entity_type"] for r in deletes} == {"client"}
+
+def test_failed_rollback_is_reported(tmp_path, monkeypatch, caplog):
+    def delete_fails(db, keys):
+        raise RuntimeError("still down")
+
+    db = MemoryClient()
+    failing_second_batch(monkeypatch, delete_fails)
+    job = import_csv(db, tmp_path, "clients", "client_code,client_name\nC1,One\nC2,Two\n")
+    assert job["status"] == "failed" and job["rows_inserted"] == 1
+    assert "Rollback failed: 1 inserted rows remain" in [e["error"] for e in job["errors"]]
+    assert "rollback failed" in caplog.text
@@ -0,0 +1,192 @@
+import fcntl
+import gzip
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+# Not under /tmp: once rows are archived this directory is the only copy. Every
+# worker on the host must see the same directory (like IMPORT_JOB_DIR).
+AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR", "audit-archive")
+AUDIT_ARCHIVE_GZIP_LEVEL = int(os.getenv("AUDIT_ARCHIVE_GZIP_LEVEL", "6"))
+
+INDEX_FILE = "index.json"
+# Distinct values of these columns are kept per segment so a filtered query can skip whole files
+INDEXED_COLUMNS = ("user_id", "entity_type", "action")
+
+Key = Tuple[datetime, int]
+
+def parse_ts(value: Any) -> datetime:
+    # PostgREST returns offsets; rows written before timestamps were zoned are naive UTC
+    ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+def sort_key(row: Dict[str, Any]) -> Key:
+    """Audit rows are listed newest first on (created_at, id), in the table and the archive alike."""
+    return parse_ts(row["created_at"]), int(row["id"])
+
+def row_matches(row: Dict[str, Any], filters: Dict[str, Any], before: Optional[Key],
+                start: Optional[datetime], end: Optional[datetime]) -> bool:
+    for column, value in filters.items():
+        if value is not None and row.get(column) != value:
+            return False
+    key = sort_key(row)
+    if before is not None and key >= before:
+        return False
+    if start is not None and key[0] < start:
+        return False
+    return end is None or key[0] < end
+
+class AuditArchive:
+    """
+    Audit rows moved out of audit_logs: gzipped JSONL segments partitioned by UTC
+    month (<dir>/YYYY-MM/audit-YYYY-MM-<run>.jsonl.gz), newest row first in each
+    file. index.json lists every segment with its time and id range and the distinct
+    users, entity types and actions in it, so a query only opens files that can match.
+    """
+
+    def __init__(self, root: str = AUDIT_ARCHIVE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._segments: List[Dict[str, Any]] = []
+        self._index_mtime = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def segments(self) -> List[Dict[str, Any]]:
+        # Re-read only when the archive job has replaced the index, possibly from another process
+        try:
+            mtime = os.stat(self._path(INDEX_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        with self._lock:
+            if mtime != self._index_mtime:
+                with open(self._path(INDEX_FILE)) as f:
+                    self._segments = json.load(f)["segments"]
+                self._index_mtime = mtime
+            return self._segments
+
+    def _write_index(self, segments: List[Dict[str, Any]]):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"segments": segments}, f, indent=1)
+        os.replace(tmp_path, self._path(INDEX_FILE))
+
+    @contextmanager
+    def writer_lock(self):
+        """One archive run at a time per directory; the OS drops the lock if the run dies."""
+        os.makedirs(self.root, exist_ok=True)
+        with open(self._path(".lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def read_segment(self, segment: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        with gzip.open(self._path(segment["file"]), "rt") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def archived_ids(self, month: str, ids: Set[int]) -> Set[int]:
+        lo, hi = min(ids), max(ids)
+        found = set()
+        for segment in self.segments():
+            if segment["month"] == month and segment["min_id"] <= hi and segment["max_id"] >= lo:
+                found.update(row["id"] for row in self.read_segment(segment) if row["id"] in ids)
+        return found
+
+    def append(self, rows: List[Dict[str, Any]], run: str) -> List[Dict[str, Any]]:
+        """Write rows as one new segment per month and publish them in the index. Call under writer_lock()."""
+        by_month: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            by_month.setdefault(parse_ts(row["created_at"]).strftime("%Y-%m"), []).append(row)
+
+        added = []
+        for month, month_rows in sorted(by_month.items()):
+            # A run that died between writing its segment and deleting the rows selects them again
+            done = self.archived_ids(month, {row["id"] for row in month_rows})
+            month_rows = sorted((row for row in month_rows if row["id"] not in done), key=sort_key, reverse=True)
+            if not month_rows:
+                continue
+            name = f"{month}/audit-{month}-{run}.jsonl.gz"
+            os.makedirs(os.path.dirname(self._path(name)), exist_ok=True)
+            tmp_path = self._path(name) + ".tmp"
+            with gzip.open(tmp_path, "wt", compresslevel=AUDIT_ARCHIVE_GZIP_LEVEL) as f:
+                for row in month_rows:
+                    f.write(json.dumps(row, separators=(",", ":"), default=str) + "\n")
+            os.replace(tmp_path, self._path(name))
+            ids = [row["id"] for row in month_rows]
+            added.append({
+                "file": name,
+                "month": month,
+                "rows": len(month_rows),
+                "bytes": os.path.getsize(self._path(name)),
+                "min_created_at": month_rows[-1]["created_at"],
+                "max_created_at": month_rows[0]["created_at"],
+                "min_id": min(ids),
+                "max_id": max(ids),
+                "values": {c: sorted({row[c] for row in month_rows if row.get(c) is not None}) for c in INDEXED_COLUMNS},
+            })
+        if added:
+            self._write_index(self.segments() + added)
+        return added
+
+    def _candidates(self, filters: Dict[str, Any], before: Optional[Key],
+                    start: Optional[datetime], end: Optional[datetime]) -> List[Dict[str, Any]]:
+        matching = []
+        for segment in self.segments():
+            if any(filters.get(c) is not None and filters[c] not in segment["values"].get(c, ()) for c in INDEXED_COLUMNS):
+                continue
+            newest, oldest = parse_ts(segment["max_created_at"]), parse_ts(segment["min_created_at"])
+            if (before is not None and oldest > before[0]) or (start is not None and newest < start) \
+                    or (end is not None and oldest >= end):
+                continue
+            matching.append(segment)
+        matching.sort(key=lambda s: parse_ts(s["max_created_at"]), reverse=True)
+        return matching
+
+    def newest(self, filters: Dict[str, Any], start: Optional[datetime] = None,
+               end: Optional[datetime] = None) -> Optional[datetime]:
+        """Upper bound on created_at of any archived row matching the filters; None if none can match."""
+        segments = self._candidates(filters, None, start, end)
+        return parse_ts(segments[0]["max_created_at"]) if segments else None
+
+    def query(self, filters: Dict[str, Any], before: Optional[Key], start: Optional[datetime],
+              end: Optional[datetime], limit: int) -> List[Dict[str, Any]]:
+        """Up to `limit` matching rows sorting after `before`, newest first."""
+        rows: List[Dict[str, Any]] = []
+        for segment in self._candidates(filters, before, start, end):
+            # Segments are visited newest first; once a full page is newer than everything left, stop
+            if len(rows) >= limit and parse_ts(segment["max_created_at"]) < sort_key(rows[limit - 1])[0]:
+                break
+            taken = 0
+            for row in self.read_segment(segment):
+                if start is not None and parse_ts(row["created_at"]) < start:
+                    break
+                if row_matches(row, filters, before, start, end):
+                    rows.append(row)
+                    taken += 1
+                    # Rows within a segment are already in order, so its first `limit` matches are its best
+                    if taken >= limit:
+                        break
+            rows.sort(key=sort_key, reverse=True)
+            del rows[limit:]
+        return rows
+
+    def get_stats(self) -> Dict[str, Any]:
+        segments = self.segments()
+        return {
+            "segments": len(segments),
+            "rows": sum(s["rows"] for s in segments),
+            "bytes": sum(s.get("bytes", 0) for s in segments),
+            "oldest": min((s["min_created_at"] for s in segments), key=parse_ts, default=None),
+            "newest": max((s["max_created_at"] for s in segments), key=parse_ts, default=None),
+        }
+
+audit_archive = AuditArchive()
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Set REPORT_CACHE_URL=redis://... (needs the redis package) to share entries and table versions
+# across gunicorn workers. Without it each worker keeps its own in-memory cache, and a write only
+# invalidates the cache of the worker that served it: the other workers keep returning the old
+# report for up to REPORT_CACHE_TTL. Any deployment with more than one worker should set it.
+REPORT_CACHE_URL = os.getenv("REPORT_CACHE_URL")
+REPORT_CACHE_TTL = int(os.getenv("REPORT_CACHE_TTL", "300"))
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "256"))
+
+class LocalCacheBackend:
+    """In-process LRU with per-entry expiry; the stand-in for a shared backend."""
+
+    def __init__(self, max_entries: int = REPORT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def set(self, key: str, value: str, ttl: int):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def get_counters(self, keys: Iterable[str]) -> Dict[str, int]:
+        with self._lock:
+            return {k: self._counters.get(k, 0) for k in keys}
+
+    def size(self) -> int:
+        return len(self._entries)
+
+class RedisCacheBackend:
+    """Shared backend; Redis handles expiry and evicts with its own LRU policy (maxmemory-policy)."""
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("REPORT_CACHE_URL is set but the 'redis' package is not installed (pip install redis)")
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._redis.get(key)
+        return value.decode() if value is not None else None
+
+    def set(self, key: str, value: str, ttl: int):
+        self._redis.set(key, value, ex=ttl)
+
+    def delete(self, key: str):
+        self._redis.delete(key)
+
+    def incr(self, key: str) -> int:
+        return int(self._redis.incr(key))
+
+    def get_counters(self, keys: Iterable[str]) -> Dict[str, int]:
+        keys = list(keys)
+        values = self._redis.mget(keys) if keys else []
+        return {k: int(v) if v is not None else 0 for k, v in zip(keys, values)}
+
+    def size(self) -> int:
+        return int(self._redis.dbsize())
+
+class ReportCache:
+    """
+    Caches report results keyed by report name, parameters and the current
+    version of every table the report reads. Writes bump the table version,
+    so stale entries are simply never looked up again and age out via TTL/LRU.
+    """
+
+    def __init__(self, backend, ttl: int = REPORT_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def table_versions(self, tables: Iterable[str]) -> Dict[str, int]:
+        return self.backend.get_counters([f"table_version:{t}" for t in tables])
+
+    def invalidate(self, *tables: str):
+        for table in tables:
+            self.backend.incr(f"table_version:{table}")
+        self.stats["invalidations"] += 1
+
+    def get_or_compute(self, name: str, tables: Iterable[str], params: Dict[str, Any], compute: Callable[[], Any]):
+        versions = self.table_versions(sorted(tables))
+        key = "report:" + json.dumps([name, params, versions], sort_keys=True, default=str)
+        cached = self.backend.get(key)
+        if cached is not None:
+            self.stats["hits"] += 1
+            return json.loads(cached)
+        self.stats["misses"] += 1
+        value = compute()
+        self.backend.set(key, json.dumps(value, default=str), self.ttl)
+        return value
+
+    def get_stats(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else None,
+            "entries": self.backend.size(),
+            "backend": type(self.backend).__name__,
+        }
+
+report_cache = ReportCache(RedisCacheBackend(REPORT_CACHE_URL) if REPORT_CACHE_URL else LocalCacheBackend())
+
+def worker_count() -> int:
+    # Exported by gunicorn.conf.py; gunicorn and uvicorn also read it for their default worker count
+    return int(os.getenv("WEB_CONCURRENCY", "1"))
+
+def process_local() -> bool:
+    """True when cache state lives in this worker only while other workers serve the same clients."""
+    return isinstance(report_cache.backend, LocalCacheBackend) and worker_count() > 1
+
+def warn_if_process_local():
+    if process_local():
+        logger.warning("REPORT_CACHE_URL is not set with %d workers: a write only invalidates the cached reports "
+                       "of the worker that made it; the others serve stale reports for up to %ds, "
+                       "and ETags are disabled", worker_count(), REPORT_CACHE_TTL)
+
+def invalidate_tables(*tables: str):
+    """Called by CRUD write paths after they change a table."""
+    report_cache.invalidate(*tables)
+
+# Distinguishes this process's counters from a previous run's, which restart at zero
+_PROCESS_NONCE = os.urandom(4).hex()
+
+def compute_etag(tables: Iterable[str], scope: Any, params: Any) -> Optional[str]:
+    """
+    Weak ETag over the current versions of the tables a response reads, the caller's scope and the query.
+    None when the table versions are process-local with several workers: a worker never sees the
+    others' writes, so its ETags could answer 304 for data another worker has changed.
+    Blocking with the Redis backend, so call it through run_db.
+    """
+    if process_local():
+        return None
+    versions = report_cache.table_versions(sorted(tables))
+    parts = [versions, scope, params]
+    if isinstance(report_cache.backend, LocalCacheBackend):
+        parts.append(_PROCESS_NONCE)
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # Weak comparison: W/ prefixes are ignored on both sides
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in {tag.removeprefix("W/") for tag in candidates}
@@ -0,0 +1,69 @@
+import os
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES, GZipMiddleware, GZipResponder, IdentityResponder
+from starlette.types import Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Level 6 / quality 4 keep most of the size win on JSON at a fraction of the CPU of the maximums
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+# XLSX is already a zip archive and Parquet pages are compressed by the writer
+EXCLUDED_CONTENT_TYPES = DEFAULT_EXCLUDED_CONTENT_TYPES + (
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.apache.parquet",
+)
+
+def _accepted(accept_encoding: str):
+    """Codings the client accepts, ignoring those explicitly refused with q=0."""
+    codings = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        codings.add(coding.strip())
+    return codings
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size: int, quality: int = BROTLI_QUALITY, **kwargs):
+        super().__init__(app, minimum_size, **kwargs)
+        self.quality = quality
+        self.compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if self.compressor is None:
+            self.compressor = brotli.Compressor(quality=self.quality)
+        out = self.compressor.process(body)
+        # Flush per chunk so streamed exports reach the client as they are produced
+        return out + (self.compressor.flush() if more_body else self.compressor.finish())
+
+class CompressionMiddleware(GZipMiddleware):
+    """Negotiates br (when the brotli package is installed) or gzip for responses above minimum_size."""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        codings = _accepted(Headers(scope=scope).get("accept-encoding", ""))
+        kwargs = {"exclude_content_types": self.exclude_content_types}
+        if brotli is not None and "br" in codings:
+            responder = BrotliResponder(self.app, self.minimum_size, **kwargs)
+        elif "gzip" in codings:
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel,
+                                      thread_minimum_size=self.thread_minimum_size, **kwargs)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size, **kwargs)
+        await responder(scope, receive, send)
@@ -0,0 +1,45 @@
+from functools import lru_cache
+from typing import List, Optional, Sequence
+from pydantic import create_model
+from utils.pagination import InvalidQueryError, parse_sort
+
+def parse_fields(fields: Optional[str], model) -> Optional[List[str]]:
+    """
+    Validate a comma-separated `fields=` value against a response schema.
+    Returns None (all columns) when no fields were requested.
+    """
+    if not fields:
+        return None
+    requested = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in requested if f not in model.model_fields]
+    if unknown:
+        raise InvalidQueryError(f"Unknown field(s) for {model.__name__}: {', '.join(unknown)}")
+    return requested or None
+
+def select_columns(fields: Optional[Sequence[str]], key: str, sort: Optional[str] = None, allowed_sorts=()) -> str:
+    """
+    PostgREST select() list for a sparse fieldset. The primary key and sort column
+    are always fetched because keyset pagination builds the cursor from them;
+    project_page() drops them again when they were not requested.
+    """
+    if not fields:
+        return "*"
+    sort_field, _ = parse_sort(sort, key, allowed_sorts)
+    return ", ".join(dict.fromkeys([key, sort_field, *fields]))
+
+def project_page(page: dict, fields: Optional[Sequence[str]]) -> dict:
+    """Keep only the requested columns of each row, once the cursor has been built."""
+    if not fields:
+        return page
+    return {**page, "items": [{f: row[f] for f in fields if f in row} for row in page["items"]]}
+
+@lru_cache(maxsize=None)
+def partial_model(model):
+    """Same fields as `model`, all optional, for validating rows that carry only a subset of columns."""
+    return create_model(
+        f"Partial{model.__name__}",
+        **{name: (Optional[field.annotation], None) for name, field in model.model_fields.items()}
+    )
+
+def response_model(model, fields: Optional[Sequence[str]]):
+    return partial_model(model) if fields else model
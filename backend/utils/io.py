@@ -1,37 +1,266 @@
-import pandas as pd
-from io import BytesIO
+import csv
+import os
+import tempfile
+import uuid
+from io import StringIO
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union, get_args, get_origin
 from fastapi.responses import StreamingResponse
-from datetime import datetime
-
-def export_to_excel(data, entity_name, user_name):
-    df = pd.DataFrame(data)
-    
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Data')
-        
-        # Meta sheet
-        meta_data = {
-            "Field": ["Generated On", "Generated By", "Row Count"],
-            "Value": [datetime.now().strftime("%Y-%m-%d %H:%M:%S"), user_name, len(df)]
-        }
-        meta_df = pd.DataFrame(meta_data)
-        meta_df.to_excel(writer, index=False, sheet_name='Meta')
-
-    output.seek(0)
-    
+from datetime import date, datetime
+from utils.metrics import StageTimer
+from utils.lazy import lazy_module
+
+openpyxl = lazy_module("openpyxl")
+# None when pyarrow is not installed: parquet/arrow export formats unavailable
+pa = lazy_module("pyarrow", optional=True)
+pc = lazy_module("pyarrow.compute", optional=True)
+pq = lazy_module("pyarrow.parquet", optional=True)
+
+CSV_FLUSH_ROWS = 500
+CHUNK_SIZE = 64 * 1024
+# Rows per Parquet row group / Arrow record batch; each is converted and flushed as soon as it fills
+ARROW_BATCH_ROWS = int(os.getenv("ARROW_BATCH_ROWS", "10000"))
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+# DECIMAL columns arrive as JSON numbers (floats in the schemas); 4 places covers amount * GST%
+DECIMAL_SCALE = 4
+
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+def export_columns(model, columns: Optional[Sequence[str]] = None) -> List[str]:
+    """Columns of an export, in order: the requested fieldset, else every field of the response model."""
+    return list(columns) if columns else list(model.model_fields)
+
+def _csv_chunks(rows: Iterable[Dict[str, Any]], columns: Sequence[str]) -> Iterator[str]:
+    buffer = StringIO()
+    # Header comes from the declared columns, so an export with no rows still has one
+    writer = csv.DictWriter(buffer, fieldnames=list(columns), extrasaction="ignore")
+    writer.writeheader()
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= CSV_FLUSH_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def _excel_chunks(rows: Iterable[Dict[str, Any]], user_name: str, columns: Sequence[str]) -> Iterator[bytes]:
+    # Write-only workbooks stream rows to temp files instead of building the sheet in memory
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Data")
+    ws.append(list(columns))
+    row_count = 0
+    for row in rows:
+        ws.append([_excel_value(row.get(c)) for c in columns])
+        row_count += 1
+
+    # Meta is created after the data pass so the row count is known
+    meta = wb.create_sheet("Meta")
+    meta.append(["Field", "Value"])
+    meta.append(["Generated On", datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
+    meta.append(["Generated By", user_name])
+    meta.append(["Row Count", row_count])
+    yield from _saved_chunks(wb)
+
+def _workbook_chunks(sheets: Iterable[Tuple[str, List[str], Iterable[Dict[str, Any]]]],
+                     meta_rows: Iterable[Tuple[str, Any]]) -> Iterator[bytes]:
+    # Several sheets with fixed columns, so empty sheets still get a header
+    wb = openpyxl.Workbook(write_only=True)
+    counts = []
+    for title, columns, rows in sheets:
+        ws = wb.create_sheet(title)
+        ws.append(columns)
+        row_count = 0
+        for row in rows:
+            ws.append([_excel_value(row.get(c)) for c in columns])
+            row_count += 1
+        counts.append((f"{title} Rows", row_count))
+
+    meta = wb.create_sheet("Meta")
+    meta.append(["Field", "Value"])
+    meta.append(["Generated On", datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
+    for field, value in list(meta_rows) + counts:
+        meta.append([field, _excel_value(value)])
+    yield from _saved_chunks(wb)
+
+def _saved_chunks(wb: "openpyxl.Workbook") -> Iterator[bytes]:
+    with tempfile.TemporaryFile() as output:
+        wb.save(output)
+        output.seek(0)
+        while True:
+            chunk = output.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+def _excel_value(value: Any) -> Any:
+    # openpyxl only accepts scalar cell values
+    if isinstance(value, (dict, list)):
+        return str(value)
+    return value
+
+def _timed(chunks: Iterator, timer: Optional[StageTimer]) -> Iterator:
+    return timer.wrap(chunks) if timer else chunks
+
+def export_to_excel(rows: Iterable[Dict[str, Any]], entity_name, user_name, columns: Sequence[str],
+                    timer: Optional[StageTimer] = None):
     headers = {
         'Content-Disposition': f'attachment; filename="{entity_name}_{datetime.now().strftime("%Y%m%d")}.xlsx"'
     }
-    return StreamingResponse(output, headers=headers, media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-
-def export_to_csv(data, entity_name):
-    df = pd.DataFrame(data)
-    stream = BytesIO()
-    df.to_csv(stream, index=False)
-    stream.seek(0)
-    
+    return StreamingResponse(
+        _timed(_excel_chunks(rows, user_name, columns), timer),
+        headers=headers,
+        media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
+def export_workbook(sheets, file_name, meta_rows, timer: Optional[StageTimer] = None):
+    headers = {
+        'Content-Disposition': f'attachment; filename="{file_name}_{datetime.now().strftime("%Y%m%d")}.xlsx"'
+    }
+    return StreamingResponse(
+        _timed(_workbook_chunks(sheets, meta_rows), timer),
+        headers=headers,
+        media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
+def export_to_csv(rows: Iterable[Dict[str, Any]], entity_name, columns: Sequence[str], timer: Optional[StageTimer] = None):
     headers = {
         'Content-Disposition': f'attachment; filename="{entity_name}_{datetime.now().strftime("%Y%m%d")}.csv"'
     }
-    return StreamingResponse(stream, headers=headers, media_type='text/csv')
+    return StreamingResponse(_timed(_csv_chunks(rows, columns), timer), headers=headers, media_type='text/csv')
+
+def _base_type(annotation):
+    # Optional[X] -> X
+    if get_origin(annotation) is Union:
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        return args[0] if len(args) == 1 else str
+    return annotation
+
+def _arrow_type(annotation):
+    base = _base_type(annotation)
+    if base is float:
+        return pa.decimal128(38, DECIMAL_SCALE)
+    if base is int:
+        return pa.int64()
+    if base is bool:
+        return pa.bool_()
+    if base is datetime:
+        return pa.timestamp("us", tz="UTC")
+    if base is date:
+        return pa.date32()
+    if base is uuid.UUID:
+        return pa.uuid()
+    return pa.string()
+
+def arrow_schema(model, columns: Optional[Sequence[str]] = None):
+    """Arrow schema for an export, typed from the entity's pydantic response model."""
+    fields = model.model_fields
+    return pa.schema([pa.field(name, _arrow_type(fields[name].annotation), nullable=True)
+                      for name in export_columns(model, columns)])
+
+def _timestamps(values: List[Optional[str]], type_) -> "pa.Array":
+    strings = pa.array(values, pa.string())
+    try:
+        return strings.cast(type_)
+    except pa.ArrowInvalid:
+        # Naive timestamps (no offset) are UTC, which is what timestamptz columns hold
+        return pa.array([v if v is None or v.endswith("Z") or "+" in v[10:] or "-" in v[10:] else v + "+00:00"
+                         for v in values], pa.string()).cast(type_)
+
+def _arrow_column(values: List[Any], type_) -> "pa.Array":
+    if pa.types.is_decimal(type_):
+        return pc.round(pa.array(values, pa.float64()), DECIMAL_SCALE).cast(type_)
+    if pa.types.is_timestamp(type_):
+        return _timestamps(values, type_)
+    if pa.types.is_date(type_):
+        return pa.array(values, pa.string()).cast(type_)
+    if type_ == pa.uuid():
+        storage = pa.array([uuid.UUID(str(v)).bytes if v else None for v in values], pa.binary(16))
+        return pa.ExtensionArray.from_storage(type_, storage)
+    if pa.types.is_string(type_):
+        return pa.array([v if v is None or isinstance(v, str) else str(v) for v in values], type_)
+    return pa.array(values, type_)
+
+def _record_batches(rows: Iterable[Dict[str, Any]], schema) -> Iterator["pa.RecordBatch"]:
+    names = schema.names
+    batch: List[Dict[str, Any]] = []
+
+    def convert():
+        return pa.RecordBatch.from_arrays(
+            [_arrow_column([row.get(name) for row in batch], field.type) for name, field in zip(names, schema)],
+            schema=schema,
+        )
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= ARROW_BATCH_ROWS:
+            yield convert()
+            batch = []
+    if batch:
+        yield convert()
+
+class _ChunkSink:
+    """Write-only file object that hands what has been written so far back to the streaming response."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def _columnar_chunks(rows: Iterable[Dict[str, Any]], schema, fmt: str) -> Iterator[bytes]:
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression=PARQUET_COMPRESSION)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    try:
+        for batch in _record_batches(rows, schema):
+            # One row group / IPC message per batch, sent before the next pages are fetched
+            if fmt == "parquet":
+                writer.write_batch(batch, row_group_size=len(batch))
+            else:
+                writer.write_batch(batch)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        # Parquet footer / IPC end-of-stream marker
+        writer.close()
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
+
+def _export_columnar(rows, entity_name, schema, fmt: str, media_type: str, timer: Optional[StageTimer]):
+    headers = {
+        'Content-Disposition': f'attachment; filename="{entity_name}_{datetime.now().strftime("%Y%m%d")}.{fmt}"'
+    }
+    return StreamingResponse(_timed(_columnar_chunks(rows, schema, fmt), timer), headers=headers, media_type=media_type)
+
+def export_to_parquet(rows: Iterable[Dict[str, Any]], entity_name, schema, timer: Optional[StageTimer] = None):
+    return _export_columnar(rows, entity_name, schema, "parquet", PARQUET_MEDIA_TYPE, timer)
+
+def export_to_arrow(rows: Iterable[Dict[str, Any]], entity_name, schema, timer: Optional[StageTimer] = None):
+    return _export_columnar(rows, entity_name, schema, "arrow", ARROW_STREAM_MEDIA_TYPE, timer)
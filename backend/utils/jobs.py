@@ -0,0 +1,63 @@
+import json
+import os
+import tempfile
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+# Job state lives on local disk so every gunicorn worker on the host can answer status polls
+JOB_DIR = os.getenv("IMPORT_JOB_DIR", os.path.join(tempfile.gettempdir(), "kpca-imports"))
+MAX_JOB_ERRORS = 200
+
+def _job_path(job_id: str) -> str:
+    return os.path.join(JOB_DIR, f"{job_id}.json")
+
+def _write(job: Dict[str, Any]):
+    os.makedirs(JOB_DIR, exist_ok=True)
+    # Write-then-rename so a concurrent poll never sees a half-written file
+    fd, tmp_path = tempfile.mkstemp(dir=JOB_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(job, f, default=str)
+    os.replace(tmp_path, _job_path(job["job_id"]))
+
+def spool_path(job_id: str, filename: str) -> str:
+    os.makedirs(JOB_DIR, exist_ok=True)
+    _, ext = os.path.splitext(filename or "")
+    return os.path.join(JOB_DIR, f"{job_id}.upload{ext.lower()}")
+
+def create_job(entity: str, filename: str, user_id: str) -> Dict[str, Any]:
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "entity": entity,
+        "filename": filename,
+        "user_id": str(user_id),
+        "status": "queued",
+        "rows_processed": 0,
+        "rows_inserted": 0,
+        "rows_failed": 0,
+        "errors": [],
+        "summary": None,
+        "created_at": datetime.now().isoformat(),
+        "finished_at": None,
+    }
+    _write(job)
+    return job
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    # job_id is used in a path, so only accept the hex ids create_job hands out
+    if not job_id.isalnum():
+        return None
+    try:
+        with open(_job_path(job_id)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def update_job(job: Dict[str, Any], **changes) -> Dict[str, Any]:
+    job.update(changes)
+    if len(job["errors"]) > MAX_JOB_ERRORS:
+        job["errors"] = job["errors"][:MAX_JOB_ERRORS]
+    if job["status"] in ("completed", "failed") and not job["finished_at"]:
+        job["finished_at"] = datetime.now().isoformat()
+    _write(job)
+    return job
@@ -0,0 +1,43 @@
+import importlib
+import importlib.util
+import logging
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Only the export, upload, ledger, report and search paths use these. A worker imports them
+# the first time it serves one of those routes, unless preload_heavy_modules() ran first.
+HEAVY_MODULES = ("numpy", "pandas", "openpyxl", "pyarrow", "pyarrow.compute", "pyarrow.parquet")
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr: str) -> Any:
+        # importlib serializes concurrent first imports; every thread gets the same module back
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self._name!r}{' (loaded)' if self._module is not None else ''}>"
+
+def lazy_module(name: str, optional: bool = False) -> Optional[LazyModule]:
+    """
+    Deferred `import name`. With optional=True, returns None when the package is
+    not installed, the way a try/except ImportError would, without importing it.
+    """
+    if optional and importlib.util.find_spec(name.partition(".")[0]) is None:
+        return None
+    return LazyModule(name)
+
+def preload_heavy_modules():
+    """Import HEAVY_MODULES now, e.g. in the gunicorn master so forked workers share them."""
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            logger.info("Skipping preload of %s: not installed", name)
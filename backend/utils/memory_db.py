@@ -0,0 +1,500 @@
+"""
+In-process stand-in for the Supabase client, for benchmarks and local runs
+without a project (SUPABASE_URL=memory://).
+
+Implements the PostgREST builder surface the crud/ modules use: table()
+select/insert/upsert/update/delete, eq/neq/gt/gte/lt/lte/in_/or_, order,
+limit/range, count="exact" and rpc(). Payloads go through a JSON round trip
+like they would on the wire, schema defaults, identity keys and ON DELETE
+CASCADE follow schema.sql, and errors are raised as postgrest APIError.
+ledger_refresh is ported; other RPCs are unknown unless registered, so
+reports take their Python fallbacks.
+
+Every execute() sleeps MEMORY_DB_LATENCY_MS (+ up to MEMORY_DB_JITTER_MS) to
+stand in for the network round trip. Only primary-key lookups and key-ordered
+range scans are indexed; any other filter or sort is a full scan, much like a
+table without a matching index.
+"""
+import bisect
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from postgrest.exceptions import APIError
+
+MEMORY_DB_LATENCY_MS = float(os.getenv("MEMORY_DB_LATENCY_MS", "0"))
+MEMORY_DB_JITTER_MS = float(os.getenv("MEMORY_DB_JITTER_MS", "0"))
+
+# table -> (primary key, identity?)
+PRIMARY_KEYS = {
+    "profiles": ("id", False),
+    "clients": ("client_code", False),
+    "proposals": ("proposal_id", True),
+    "assignments": ("assignment_code", False),
+    "invoices": ("invoice_no", False),
+    "receipts": ("receipt_id", True),
+    "audit_logs": ("id", True),
+    "invoice_ledger": ("invoice_no", False),
+    "client_ledger": ("client_code", False),
+}
+
+COLUMN_DEFAULTS = {
+    "profiles": {"role": "MANAGER"},
+    "clients": {"status": "Active"},
+    "proposals": {"estimated_fees": 0, "status": "Draft"},
+    "assignments": {"contracted_fee": 0, "status": "Planned"},
+    "invoices": {"amount_before_tax": 0, "gst_pct": 18.0, "status": "Issued"},
+    "receipts": {"amount_received": 0, "tds_amount": 0},
+}
+
+# parent table -> [(child table, foreign key column, parent column)]
+CASCADES = {
+    "clients": [("proposals", "client_code", "client_code"), ("assignments", "client_code", "client_code"),
+                ("client_ledger", "client_code", "client_code")],
+    "assignments": [("invoices", "assignment_code", "assignment_code")],
+    "invoices": [("receipts", "invoice_no", "invoice_no"), ("invoice_ledger", "invoice_no", "invoice_no")],
+}
+
+def _generated_columns(table: str, row: Dict):
+    if table == "invoices":
+        # NULL in, NULL out, like the GENERATED column in schema.sql
+        before_tax, gst_pct = row.get("amount_before_tax"), row.get("gst_pct")
+        row["amount_with_tax"] = None if before_tax is None or gst_pct is None \
+            else float(before_tax) * (1 + float(gst_pct) / 100)
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def _compare(value, op: str, target) -> bool:
+    # SQL semantics: NULL never matches a comparison
+    if value is None or target is None:
+        return False
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            target = float(target)
+        except (TypeError, ValueError):
+            value, target = str(value), str(target)
+    else:
+        value, target = str(value), str(target)
+    if op == "eq":
+        return value == target
+    if op == "neq":
+        return value != target
+    if op == "gt":
+        return value > target
+    if op == "gte":
+        return value >= target
+    if op == "lt":
+        return value < target
+    if op == "lte":
+        return value <= target
+    raise APIError({"code": "PGRST100", "message": f"Unsupported operator: {op}"})
+
+def _split(expr: str) -> List[str]:
+    """Split a PostgREST logic expression on top-level commas, respecting quotes and parens."""
+    parts, depth, quoted, current = [], 0, False, []
+    for ch in expr:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0 and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+    if current:
+        parts.append("".join(current))
+    return parts
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return value
+
+def _parse_logic(expr: str, combine=any) -> Callable[[Dict], bool]:
+    predicates = []
+    for part in _split(expr):
+        if part.startswith("and(") or part.startswith("or("):
+            name, _, inner = part.partition("(")
+            predicates.append(_parse_logic(inner[:-1], all if name == "and" else any))
+            continue
+        column, op, value = part.split(".", 2)
+        if op == "in":
+            values = {_unquote(v) for v in _split(value[1:-1])}
+            predicates.append(lambda row, c=column, vs=values: row.get(c) is not None and str(row.get(c)) in vs)
+        elif op == "is":
+            predicates.append(lambda row, c=column, v=value: (row.get(c) is None) == (v == "null"))
+        else:
+            predicates.append(lambda row, c=column, o=op, v=_unquote(value): _compare(row.get(c), o, v))
+    return lambda row: combine(p(row) for p in predicates)
+
+def _ledger_refresh(client: "MemoryClient", params: Dict) -> int:
+    """Port of public.ledger_refresh in schema.sql."""
+    invoice_nos = params.get("p_invoice_nos")
+    wanted = None if invoice_nos is None else set(invoice_nos)
+    invoices, assignments = client._table("invoices").rows, client._table("assignments").rows
+    selected = list(invoices.values()) if wanted is None else [invoices[no] for no in wanted if no in invoices]
+
+    settled: Dict[str, List[float]] = {}
+    for receipt in client._table("receipts").rows.values():
+        if wanted is None or receipt.get("invoice_no") in wanted:
+            totals = settled.setdefault(receipt.get("invoice_no"), [0.0, 0.0])
+            totals[0] += float(receipt.get("amount_received") or 0)
+            totals[1] += float(receipt.get("tds_amount") or 0)
+
+    ledger = client._table("invoice_ledger")
+    affected = set(params.get("p_client_codes") or ())
+    for invoice in selected:
+        assignment = assignments.get(invoice.get("assignment_code")) or {}
+        billed = 0.0 if invoice.get("status") == "Cancelled" else float(invoice.get("amount_with_tax") or 0)
+        paid, tds = settled.get(invoice["invoice_no"], (0.0, 0.0))
+        row = {
+            "invoice_no": invoice["invoice_no"], "client_code": assignment.get("client_code"),
+            "assignment_code": invoice.get("assignment_code"), "invoice_date": invoice.get("invoice_date"),
+            "due_date": invoice.get("due_date"), "billed": billed, "paid": paid, "tds": tds,
+            "outstanding": billed - paid - tds, "updated_at": _now(),
+        }
+        ledger.add(row)
+        if row["client_code"]:
+            affected.add(row["client_code"])
+        if invoice.get("status") != "Cancelled":
+            if paid + tds > 0:
+                invoice["status"] = "Paid" if row["outstanding"] <= 0.005 else "Part-Paid"
+            elif invoice.get("status") in ("Paid", "Part-Paid"):
+                invoice["status"] = "Issued"
+
+    clients, client_ledger = client._table("clients").rows, client._table("client_ledger")
+    for code in list(client_ledger.rows):
+        if wanted is None or code in affected:
+            client_ledger.remove(code)
+    rollup: Dict[str, Dict] = {}
+    for row in ledger.rows.values():
+        code = row.get("client_code")
+        if code in clients and (wanted is None or code in affected):
+            totals = rollup.setdefault(code, {"client_code": code, "billed": 0.0, "paid": 0.0, "tds": 0.0,
+                                              "outstanding": 0.0, "open_invoices": 0, "updated_at": _now()})
+            for column in ("billed", "paid", "tds", "outstanding"):
+                totals[column] += row[column]
+            totals["open_invoices"] += row["outstanding"] > 0
+    for totals in rollup.values():
+        client_ledger.add(totals)
+    return len(selected)
+
+# SQL functions from schema.sql that have a Python port; the report_* ones are left
+# out on purpose so crud/reports.py exercises its Python fallbacks
+BUILTIN_RPCS = {"ledger_refresh": _ledger_refresh}
+
+class _Response:
+    def __init__(self, data: List[Dict], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+class _Table:
+    """Rows by primary key plus the sorted key list, so key-ordered range scans are a bisect."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.key, self.identity = PRIMARY_KEYS.get(name, ("id", True))
+        self.rows: Dict[Any, Dict] = {}
+        self.keys: List[Any] = []
+        self.sequence = itertools.count(1)
+
+    def check_keys(self, rows: List[Dict], replace: bool):
+        """Constraint checks up front, so a failing multi-row insert stores nothing."""
+        seen = set()
+        for row in rows:
+            key = row.get(self.key)
+            if key is None:
+                if self.identity:
+                    continue
+                raise APIError({"code": "23502", "message": f'null value in column "{self.key}" of relation "{self.name}"'})
+            if key in seen or (key in self.rows and not replace):
+                raise APIError({"code": "23505", "message": f'duplicate key value violates unique constraint "{self.name}_pkey"',
+                                "details": f"Key ({self.key})=({key}) already exists."})
+            seen.add(key)
+
+    def add(self, row: Dict) -> Dict:
+        if self.identity and row.get(self.key) is None:
+            row[self.key] = next(self.sequence)
+        key = row[self.key]
+        if key in self.rows:
+            self.rows[key].update(row)
+            return self.rows[key]
+        if self.identity and isinstance(key, int):
+            # Keep the identity ahead of explicitly supplied ids
+            self.sequence = itertools.count(max(key + 1, next(self.sequence)))
+        self.rows[key] = row
+        if not self.keys or key > self.keys[-1]:
+            self.keys.append(key)
+        else:
+            bisect.insort(self.keys, key)
+        return row
+
+    def remove(self, key):
+        self.rows.pop(key)
+        del self.keys[bisect.bisect_left(self.keys, key)]
+
+class _Query:
+    def __init__(self, client: "MemoryClient", table: str, rpc: Optional[Callable[[], Any]] = None):
+        self.client, self.table = client, table
+        self._rpc = rpc
+        self._rpc_rows: Optional[List[Dict]] = None
+        self._mode, self._payload, self._columns, self._count = "select", None, "*", None
+        self._filters: List[Callable[[Dict], bool]] = []
+        self._key_bounds: List[tuple] = []
+        self._orders: List[tuple] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self._upsert = False
+
+    def select(self, columns: str = "*", count: Optional[str] = None):
+        if self._mode == "select":
+            self._columns, self._count = columns, count
+        return self
+
+    def insert(self, data, **_):
+        self._mode, self._payload = "insert", data
+        return self
+
+    def upsert(self, data, **_):
+        self._mode, self._payload, self._upsert = "insert", data, True
+        return self
+
+    def update(self, data):
+        self._mode, self._payload = "update", data
+        return self
+
+    def delete(self):
+        self._mode = "delete"
+        return self
+
+    def _filter(self, column: str, op: str, value):
+        self._filters.append(lambda row: _compare(row.get(column), op, value))
+        if self._rpc is None and column == self.client._table(self.table).key:
+            self._key_bounds.append((op, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", value)
+
+    def in_(self, column, values: Iterable):
+        values = {str(v) for v in values}
+        self._filters.append(lambda row: row.get(column) is not None and str(row.get(column)) in values)
+        return self
+
+    def or_(self, expr: str):
+        self._filters.append(_parse_logic(expr))
+        return self
+
+    def order(self, column: str, desc: bool = False, nullsfirst: Optional[bool] = None):
+        self._orders.append((column, desc))
+        return self
+
+    def limit(self, size: int):
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    def execute(self) -> _Response:
+        self.client._round_trip()
+        with self.client._lock:
+            self.client.round_trips += 1
+            if self._mode == "insert":
+                return _Response(self.client._insert(self.table, self._payload, self._upsert))
+            if self._mode == "update":
+                return _Response(self.client._update(self.table, self._matching(), self._payload))
+            if self._mode == "delete":
+                return _Response(self.client._delete(self.table, self._matching()))
+            if self._rpc is not None:
+                result = self._rpc()
+                if not isinstance(result, list):
+                    # Scalar-returning functions come back as a bare JSON value
+                    return _Response(result)
+                self._rpc_rows = result
+            return self._select()
+
+    def _matches(self, row: Dict) -> bool:
+        return all(f(row) for f in self._filters)
+
+    def _candidates(self, descending: bool = False) -> Iterable[Dict]:
+        """Rows in key order, narrowed to the primary-key range the filters allow."""
+        if self._rpc_rows is not None:
+            return self._rpc_rows
+        table = self.client._table(self.table)
+        lo, hi = 0, len(table.keys)
+        for op, value in self._key_bounds:
+            try:
+                if op == "eq":
+                    row = table.rows.get(type(table.keys[0])(value) if table.keys else value)
+                    return [row] if row is not None else []
+                if op in ("gt", "gte"):
+                    bound = type(table.keys[0])(value) if table.keys else value
+                    lo = max(lo, (bisect.bisect_right if op == "gt" else bisect.bisect_left)(table.keys, bound))
+                elif op in ("lt", "lte"):
+                    bound = type(table.keys[0])(value) if table.keys else value
+                    hi = min(hi, (bisect.bisect_left if op == "lt" else bisect.bisect_right)(table.keys, bound))
+            except (TypeError, ValueError):
+                # Mixed key types: the filter itself still applies during the scan
+                continue
+        keys = table.keys[lo:hi]
+        return (table.rows[k] for k in (reversed(keys) if descending else keys))
+
+    def _matching(self) -> List[Dict]:
+        return [row for row in self._candidates() if self._matches(row)]
+
+    def _select(self) -> _Response:
+        key = None if self._rpc is not None else self.client._table(self.table).key
+        wanted = None if self._limit is None else self._offset + self._limit
+
+        if not self._orders or (len(self._orders) == 1 and self._orders[0][0] == key):
+            # Already in key order: stop scanning as soon as the page is full
+            descending = bool(self._orders) and self._orders[0][1]
+            rows = (row for row in self._candidates(descending) if self._matches(row))
+            if self._count:
+                rows = list(rows)
+                count = len(rows)
+            else:
+                count = None
+                if wanted is not None:
+                    rows = itertools.islice(rows, wanted)
+            selected = list(rows)
+        else:
+            matched = self._matching()
+            count = len(matched) if self._count else None
+            selected = self._sort(matched, wanted)
+
+        page = selected[self._offset:wanted]
+        return _Response([self._project(row) for row in page], count)
+
+    def _sort(self, rows: List[Dict], wanted: Optional[int]) -> List[Dict]:
+        # Postgres puts NULLs last ascending and first descending, which (is None, value) gives both ways
+        directions = {desc for _, desc in self._orders}
+        if len(directions) == 1:
+            columns = [c for c, _ in self._orders]
+            sort_key = lambda row: tuple((row.get(c) is None, row.get(c)) for c in columns)
+            descending = directions.pop()
+            if wanted is not None and wanted < len(rows) // 4:
+                return (heapq.nlargest if descending else heapq.nsmallest)(wanted, rows, key=sort_key)
+            return sorted(rows, key=sort_key, reverse=descending)
+        for column, descending in reversed(self._orders):
+            rows = sorted(rows, key=lambda row: (row.get(column) is None, row.get(column)), reverse=descending)
+        return rows
+
+    def _project(self, row: Dict) -> Dict:
+        if self._columns.strip() == "*":
+            return dict(row)
+        return {c.strip(): row.get(c.strip()) for c in self._columns.split(",")}
+
+class MemoryClient:
+    """Thread-safe; latency is injected outside the lock so concurrent requests overlap like real round trips."""
+
+    def __init__(self, latency_ms: float = MEMORY_DB_LATENCY_MS, jitter_ms: float = MEMORY_DB_JITTER_MS):
+        self.latency_ms, self.jitter_ms = latency_ms, jitter_ms
+        self._lock = threading.RLock()
+        self._tables: Dict[str, _Table] = {}
+        self._rpcs: Dict[str, Callable[["MemoryClient", Dict], Any]] = dict(BUILTIN_RPCS)
+        self.round_trips = 0
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def from_(self, name: str) -> _Query:
+        return self.table(name)
+
+    def rpc(self, name: str, params: Optional[Dict] = None) -> _Query:
+        def call():
+            fn = self._rpcs.get(name)
+            if fn is None:
+                raise APIError({"code": "PGRST202", "message": f"Could not find the function public.{name} in the schema cache"})
+            return fn(self, json.loads(json.dumps(params or {})))
+        return _Query(self, name, rpc=call)
+
+    def register_rpc(self, name: str, fn: Callable[["MemoryClient", Dict], Any]):
+        self._rpcs[name] = fn
+
+    def seed(self, table: str, rows: Iterable[Dict]):
+        """Bulk load without latency or a JSON round trip; rows are stored as given."""
+        with self._lock:
+            target = self._table(table)
+            for row in rows:
+                row = {**COLUMN_DEFAULTS.get(table, {}), "created_at": _now(), **row}
+                _generated_columns(table, row)
+                target.check_keys([row], False)
+                target.add(row)
+
+    def rows(self, table: str) -> List[Dict]:
+        with self._lock:
+            return [dict(r) for r in self._table(table).rows.values()]
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+
+    def _table(self, name: str) -> _Table:
+        table = self._tables.get(name)
+        if table is None:
+            table = self._tables.setdefault(name, _Table(name))
+        return table
+
+    def _round_trip(self):
+        delay = self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def _insert(self, name: str, payload, replace: bool) -> List[Dict]:
+        # What the HTTP client would send; values that aren't JSON serialisable fail here as they would there
+        items = json.loads(json.dumps(payload if isinstance(payload, list) else [payload]))
+        table = self._table(name)
+        rows = []
+        for item in items:
+            row = {**COLUMN_DEFAULTS.get(name, {}), "created_at": _now(), **item}
+            _generated_columns(name, row)
+            rows.append(row)
+        table.check_keys(rows, replace)
+        return [dict(table.add(row)) for row in rows]
+
+    def _update(self, name: str, rows: List[Dict], payload: Dict) -> List[Dict]:
+        changes = json.loads(json.dumps(payload))
+        table = self._table(name)
+        if table.key in changes:
+            raise APIError({"code": "PGRST100", "message": "Updating the primary key is not supported by the memory client"})
+        for row in rows:
+            row.update(changes)
+            _generated_columns(name, row)
+        return [dict(row) for row in rows]
+
+    def _delete(self, name: str, rows: List[Dict]) -> List[Dict]:
+        table = self._table(name)
+        for row in rows:
+            table.remove(row[table.key])
+        for child, column, parent_column in CASCADES.get(name, ()):
+            if child in self._tables and rows:
+                values = {row.get(parent_column) for row in rows}
+                self._delete(child, [r for r in self._tables[child].rows.values() if r.get(column) in values])
+        return [dict(row) for row in rows]
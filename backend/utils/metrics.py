@@ -0,0 +1,439 @@
+import atexit
+import contextvars
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Log requests slower than this with their DB/stage breakdown; 0 disables the log
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+DB_CALL_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 1000)
+# Seconds between a worker's snapshots to METRICS_DIR; other workers' series lag the scraped one by up to this
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+def metrics_dir() -> Optional[str]:
+    # Set by gunicorn.conf.py: each worker keeps its own registry, and a scrape reaches one of them at random,
+    # so with several workers they share snapshots through this directory and any worker serves the total
+    return os.getenv("METRICS_DIR")
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, object] = {}
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def values(self) -> Dict[Tuple, object]:
+        with self._lock:
+            return {key: list(value) if isinstance(value, list) else value for key, value in self._values.items()}
+
+    def merge(self, total, value):
+        return value if total is None else total + value
+
+    def render(self, values: Optional[Dict[Tuple, object]] = None) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted((self.values() if values is None else values).items()):
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value) -> List[str]:
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = REQUEST_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # Per-bucket counts plus [sum, count]; made cumulative when rendered
+                counts = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            counts[-2] += value
+            counts[-1] += 1
+
+    def merge(self, total, value):
+        return list(value) if total is None else [a + b for a, b in zip(total, value)]
+
+    def _render_sample(self, key, counts) -> List[str]:
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            le = 'le="%s"' % _number(bound)
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+        le = 'le="+Inf"'
+        lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {counts[-1]}")
+        lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(round(counts[-2], 6))}")
+        lines.append(f"{self.name}_count{_labels(self.label_names, key)} {counts[-1]}")
+        return lines
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class Registry:
+    """
+    Without METRICS_DIR, renders this process's metrics. With it, every worker snapshots its
+    metrics there and a scrape renders them merged: counters and histograms summed over every
+    worker that ran since startup (so totals never go backwards when a worker exits), the
+    in-flight gauge over live workers, and the collector gauges per live worker with a pid label.
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        # Gauges read at scrape time from state that lives elsewhere (caches, queues)
+        self._collectors: List[Tuple[str, str, Callable[[], Dict[str, float]], str]] = []
+        self._flusher_pid: Optional[int] = None
+        self._flusher_lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def gauge_callback(self, name: str, help: str, fn: Callable[[], Dict[str, float]], label: str = ""):
+        """fn returns {label value: value}; with no label, use a single key."""
+        self._collectors.append((name, help, fn, label))
+
+    def _collect(self) -> Dict[str, Dict[str, float]]:
+        collected = {}
+        for name, help, fn, label in self._collectors:
+            try:
+                values = fn()
+            except Exception as e:
+                logger.warning("Metrics collector %s failed: %s", name, e)
+                continue
+            collected[name] = {str(key): value for key, value in values.items() if value is not None}
+        return collected
+
+    def snapshot(self) -> Dict:
+        return {
+            "metrics": {m.name: [[list(key), value] for key, value in m.values().items()] for m in self._metrics},
+            "collected": self._collect(),
+        }
+
+    def flush(self):
+        """Write this process's snapshot to METRICS_DIR (write-then-rename, so readers never see half a file)."""
+        directory = metrics_dir()
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, os.path.join(directory, f"{os.getpid()}.json"))
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("Metrics snapshot failed: %s", e)
+
+    def start_flusher(self):
+        """Snapshot this worker periodically and at exit; cheap to call per request, started once per process."""
+        if self._flusher_pid == os.getpid() or not metrics_dir():
+            return
+        with self._flusher_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True).start()
+            atexit.register(self.flush)
+
+    def _merged(self, directory: str):
+        self.flush()
+        kinds = {m.name: m for m in self._metrics}
+        totals: Dict[str, Dict[Tuple, object]] = {name: {} for name in kinds}
+        collected: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            pid = os.path.basename(path)[:-len(".json")]
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = pid.isdigit() and _alive(int(pid))
+            for name, samples in snapshot["metrics"].items():
+                metric = kinds.get(name)
+                if metric is None or (isinstance(metric, Gauge) and not alive):
+                    continue
+                for key, value in samples:
+                    key = tuple(key)
+                    totals[name][key] = metric.merge(totals[name].get(key), value)
+            if alive:
+                collected[pid] = snapshot["collected"]
+        return totals, collected
+
+    def render(self) -> str:
+        directory = metrics_dir()
+        if directory:
+            totals, collected = self._merged(directory)
+        else:
+            totals, collected = {m.name: m.values() for m in self._metrics}, {None: self._collect()}
+
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(totals[metric.name]))
+        for name, help, fn, label in self._collectors:
+            samples = []
+            for pid, values in collected.items():
+                for key, value in values.get(name, {}).items():
+                    parts = ([f'{label}="{_escape(key)}"'] if label else []) + ([f'pid="{pid}"'] if pid else [])
+                    samples.append(f"{name}{{{','.join(parts)}}} {_number(value)}" if parts else f"{name} {_number(value)}")
+            if samples:
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", *samples]
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "kpca_http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status")))
+http_duration = registry.register(Histogram(
+    "kpca_http_request_duration_seconds", "Time to the last response byte, by route.", ("route", "method")))
+http_in_flight = registry.register(Gauge(
+    "kpca_http_requests_in_flight", "Requests currently being handled."))
+request_db_calls = registry.register(Histogram(
+    "kpca_http_request_db_calls", "PostgREST round trips made while serving one request.", ("route",), DB_CALL_BUCKETS))
+db_requests = registry.register(Counter(
+    "kpca_db_requests_total", "PostgREST round trips by table (or function) and operation.", ("table", "operation", "outcome")))
+db_duration = registry.register(Histogram(
+    "kpca_db_request_duration_seconds", "PostgREST round trip time by operation.", ("operation",), DB_BUCKETS))
+stage_duration = registry.register(Histogram(
+    "kpca_stage_duration_seconds", "Time spent in named export/import/serialization stages.", ("stage",)))
+
+class RequestStats:
+    """Per-request accumulator; shared by every thread the request's DB work runs on."""
+
+    def __init__(self, method: str, path: str):
+        self.method, self.path = method, path
+        self.route = None
+        self.start = time.perf_counter()
+        self.db_calls = 0
+        self.db_seconds = 0.0
+        self.db_by_table: Dict[str, int] = {}
+        self.stages: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add_db(self, table: str, seconds: float):
+        with self._lock:
+            self.db_calls += 1
+            self.db_seconds += seconds
+            self.db_by_table[table] = self.db_by_table.get(table, 0) + 1
+
+    def add_stage(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+def current_request() -> Optional[RequestStats]:
+    # anyio copies the context into worker threads, so run_db calls see their request
+    return _current.get()
+
+def record_db(table: str, operation: str, seconds: float, error: bool = False):
+    db_requests.inc(table=table, operation=operation, outcome="error" if error else "ok")
+    db_duration.observe(seconds, operation=operation)
+    stats = _current.get()
+    if stats is not None:
+        stats.add_db(table, seconds)
+
+def record_stage(name: str, seconds: float):
+    stage_duration.observe(seconds, stage=name)
+    stats = _current.get()
+    if stats is not None:
+        stats.add_stage(name, seconds)
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+class StageTimer:
+    """
+    Accumulates a stage that runs in many short slices (e.g. once per page of a
+    streamed export) and records it once. `exclude` is a nested timer whose time
+    is subtracted, so serialize time doesn't include the fetches it drives.
+    """
+
+    def __init__(self, name: str, exclude: Optional["StageTimer"] = None):
+        self.name, self.exclude = name, exclude
+        self.seconds = 0.0
+        self._recorded = False
+
+    @contextmanager
+    def measure(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    def wrap(self, iterable: Iterable, record: bool = True) -> Iterator:
+        """
+        Time spent producing each item of `iterable`, recorded when it is exhausted
+        or closed. Pass record=False to wrap several iterables and record() once.
+        """
+        iterator = iter(iterable)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    self.seconds += time.perf_counter() - start
+                    return
+                self.seconds += time.perf_counter() - start
+                yield item
+        finally:
+            if record:
+                self.record()
+
+    def record(self):
+        if self._recorded:
+            return
+        self._recorded = True
+        if self.exclude is not None:
+            self.exclude.record()
+            self.seconds = max(self.seconds - self.exclude.seconds, 0.0)
+        record_stage(self.name, self.seconds)
+
+class MetricsMiddleware:
+    """
+    Per-route latency, status counts and in-flight requests, plus the per-request
+    DB/stage accounting behind the slow-request log. Routes are labelled by their
+    path template; unmatched paths share one label to keep cardinality bounded.
+    """
+
+    def __init__(self, app, slow_request_ms: float = SLOW_REQUEST_MS):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry.start_flusher()
+        stats = RequestStats(scope["method"], scope["path"])
+        token = _current.set(stats)
+        status = 500
+        responded_at = None
+        http_in_flight.inc()
+
+        async def send_wrapper(message):
+            nonlocal status, responded_at
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                responded_at = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec()
+            _current.reset(token)
+            finished = time.perf_counter()
+            route = scope.get("route")
+            stats.route = getattr(route, "path", None) or "unmatched"
+            duration = (responded_at or finished) - stats.start
+            http_requests.inc(route=stats.route, method=stats.method, status=status)
+            http_duration.observe(duration, route=stats.route, method=stats.method)
+            request_db_calls.observe(stats.db_calls, route=stats.route)
+            if self.slow_request_ms and duration * 1000 >= self.slow_request_ms:
+                log_slow_request(stats, status, duration, finished - stats.start)
+
+def log_slow_request(stats: RequestStats, status: int, duration: float, total: float):
+    stages = " ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in sorted(stats.stages.items()))
+    tables = " ".join(f"{table}:{count}" for table, count in sorted(stats.db_by_table.items()))
+    # Background work (upload imports) runs after the response inside the same request
+    background = f" background={(total - duration) * 1000:.1f}ms" if total - duration > 0.001 else ""
+    logger.warning(
+        "Slow request %s %s (%s) status=%s duration=%.1fms%s db_calls=%s db_time=%.1fms [%s] stages: %s",
+        stats.method, stats.path, stats.route, status, duration * 1000, background,
+        stats.db_calls, stats.db_seconds * 1000, tables or "-", stages or "-",
+    )
+
+def process_stats() -> Dict[str, float]:
+    stats = {"start_time_seconds": _PROCESS_START}
+    try:
+        with open("/proc/self/statm") as f:
+            stats["resident_memory_bytes"] = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    return stats
+
+_PROCESS_START = time.time()
+
+def _reset_process_start():
+    global _PROCESS_START
+    _PROCESS_START = time.time()
+
+# With a preloaded app this module is imported once in the gunicorn master; each worker starts its own clock
+os.register_at_fork(after_in_child=_reset_process_start)
@@ -0,0 +1,154 @@
+import base64
+import json
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Values per PostgREST in=() filter; keeps request URLs well under PostgREST/proxy length limits
+IN_BATCH_SIZE = 500
+
+class InvalidQueryError(ValueError):
+    """Raised for a malformed cursor, sort or filter; surfaced to the client as a 400."""
+    pass
+
+def encode_cursor(sort_value: Any, key_value: Any) -> str:
+    raw = json.dumps([sort_value, key_value], separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, key_value = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise InvalidQueryError("Invalid cursor")
+    return sort_value, key_value
+
+def parse_sort(sort: Optional[str], key: str, allowed: Iterable[str]) -> Tuple[str, bool]:
+    # "-field" means descending; the primary key is always an allowed sort
+    if not sort:
+        return key, False
+    desc = sort.startswith("-")
+    field = sort.lstrip("-")
+    if field != key and field not in allowed:
+        raise InvalidQueryError(f"Cannot sort by '{field}'")
+    return field, desc
+
+def _quote(value: Any) -> str:
+    # PostgREST reserves , . : ( ) inside or=() filters, so always double-quote values
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+def apply_filters(query, filters: Dict[str, Any], date_column: Optional[str] = None,
+                  date_from: Optional[date] = None, date_to: Optional[date] = None):
+    for column, value in filters.items():
+        if value is not None:
+            query = query.eq(column, value)
+    if date_column and date_from:
+        query = query.gte(date_column, date_from.isoformat())
+    if date_column and date_to:
+        # Exclusive upper bound on the next day keeps date_to inclusive for both DATE and TIMESTAMP columns
+        query = query.lt(date_column, (date_to + timedelta(days=1)).isoformat())
+    return query
+
+def batched(values: Sequence, size: int = IN_BATCH_SIZE) -> Iterator[Sequence]:
+    """Consecutive slices of `values`, one in=() filter each."""
+    for offset in range(0, len(values), size):
+        yield values[offset:offset + size]
+
+def _keyset_rows(query, key: str, field: str, desc: bool, cursor: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    op = "lt" if desc else "gt"
+
+    if cursor:
+        last_sort, last_key = decode_cursor(cursor)
+        if field == key:
+            query = getattr(query, op)(key, last_key)
+        else:
+            query = query.or_(
+                f"{field}.{op}.{_quote(last_sort)},"
+                f"and({field}.eq.{_quote(last_sort)},{key}.{op}.{_quote(last_key)})"
+            )
+
+    query = query.order(field, desc=desc)
+    if field != key:
+        query = query.order(key, desc=desc)
+
+    # Fetch one extra row to learn whether another page exists without a count query
+    return query.limit(limit + 1).execute().data
+
+def _page(rows: List[Dict[str, Any]], key: str, field: str, limit: int) -> Dict[str, Any]:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[field], last[key])
+
+    return {"items": rows, "next_cursor": next_cursor, "limit": limit}
+
+def paginate(query, key: str, sort: Optional[str], allowed_sorts: Iterable[str],
+             cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    Keyset pagination pushed down into the PostgREST query.
+    Rows are ordered by (sort field, primary key) so the cursor is stable across ties.
+    Sortable fields must be NOT NULL columns, otherwise the keyset comparison skips rows.
+    """
+    field, desc = parse_sort(sort, key, allowed_sorts)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    return _page(_keyset_rows(query, key, field, desc, cursor, limit), key, field, limit)
+
+def paginate_in(make_query: Callable[[], Any], column: str, values: Sequence, key: str, sort: Optional[str],
+                allowed_sorts: Iterable[str], cursor: Optional[str] = None,
+                limit: int = DEFAULT_PAGE_SIZE, merge_sorts: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    paginate() restricted to `column IN values`, for value lists too long for one URL.
+    Each batch of values is queried for its own next page and the pages are merged:
+    the first limit + 1 rows overall are always among the batches' first limit + 1.
+    make_query must return a fresh builder each call.
+    The merge compares in Python, by code point, while the database orders each batch and
+    applies the cursor under the column's collation. The two agree for timestamps, dates and
+    numbers but not for free text (case, accents), where a merged cursor would skip or repeat
+    rows, so past one batch only the key and the fields in merge_sorts can be sorted on.
+    The key is the tie-break, so its values must also sort the same way in both.
+    """
+    values = list(values)
+    if len(values) <= IN_BATCH_SIZE:
+        return paginate(make_query().in_(column, values), key, sort, allowed_sorts, cursor, limit)
+    field, desc = parse_sort(sort, key, allowed_sorts)
+    if field != key and field not in merge_sorts:
+        allowed = ", ".join([key, *sorted(merge_sorts)])
+        raise InvalidQueryError(f"Cannot sort by '{field}' across more than {IN_BATCH_SIZE} values; sort by {allowed}")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rows = []
+    for batch in batched(values):
+        rows.extend(_keyset_rows(make_query().in_(column, batch), key, field, desc, cursor, limit))
+    rows.sort(key=lambda row: (row[field], row[key]), reverse=desc)
+    return _page(rows[:limit + 1], key, field, limit)
+
+def iter_rows(fetch_page, *args, page_size: int = MAX_PAGE_SIZE, **kwargs):
+    """Walk every page of a paginated CRUD reader, yielding rows one at a time."""
+    cursor = None
+    while True:
+        page = fetch_page(*args, cursor=cursor, limit=page_size, **kwargs)
+        yield from page["items"]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+# Supabase's default PostgREST max-rows; larger pages would be truncated without an error
+SELECT_ALL_PAGE_SIZE = 1000
+
+def iter_select(make_query, key: str, page_size: int = SELECT_ALL_PAGE_SIZE):
+    """
+    Yield every row of a query (table select or RPC) in keyset pages on `key`.
+    make_query must return a fresh builder each call since builders are mutated by filters.
+    """
+    last = None
+    while True:
+        query = make_query()
+        if last is not None:
+            query = query.gt(key, last)
+        page = query.order(key).limit(page_size).execute().data
+        yield from page
+        if len(page) < page_size:
+            break
+        last = page[-1][key]
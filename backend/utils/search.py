@@ -0,0 +1,294 @@
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from utils.lazy import lazy_module
+from utils.pagination import iter_select
+
+np = lazy_module("numpy")
+
+logger = logging.getLogger(__name__)
+
+# Rebuilt in the background after this many seconds to pick up other workers' writes
+SEARCH_INDEX_TTL = int(os.getenv("SEARCH_INDEX_TTL", "600"))
+
+# entity -> (table, key column, {column: weight}, label column)
+SEARCH_ENTITIES = {
+    "client": ("clients", "client_code", {"client_code": 3.0, "client_name": 3.0, "group_name": 1.5}, "client_name"),
+    "assignment": ("assignments", "assignment_code", {"assignment_code": 3.0, "title": 2.5}, "title"),
+    "proposal": ("proposals", "proposal_id", {"scope_summary": 1.0}, "scope_summary"),
+}
+ENTITY_CODES = {entity: i for i, entity in enumerate(SEARCH_ENTITIES)}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Trigram (Dice) similarity a vocabulary token needs to count as a typo match
+FUZZY_THRESHOLD = float(os.getenv("SEARCH_FUZZY_THRESHOLD", "0.45"))
+# Caps on how many vocabulary tokens one query term may expand to
+MAX_PREFIX_EXPANSIONS = 64
+MAX_FUZZY_EXPANSIONS = 32
+MAX_QUERY_TERMS = 8
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_RE.findall(str(text).lower()) if text else []
+
+def trigrams(token: str):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class _Column:
+    """Append-only numpy column with amortised growth."""
+
+    def __init__(self, dtype: str, fill=0):
+        self.dtype, self.fill = dtype, fill
+        # Allocated on first append, so the empty module-level index does not import numpy
+        self.data = None
+        self.size = 0
+
+    def append(self, value):
+        if self.data is None:
+            self.data = np.full(1024, self.fill, dtype=self.dtype)
+        elif self.size == len(self.data):
+            grown = np.full(len(self.data) * 2, self.fill, dtype=self.dtype)
+            grown[:self.size] = self.data
+            self.data = grown
+        self.data[self.size] = value
+        self.size += 1
+
+    def view(self):
+        return self.data[:self.size] if self.data is not None else np.zeros(0, dtype=self.dtype)
+
+class SearchIndex:
+    """
+    Ranked, typo-tolerant search over clients, proposals and assignments.
+
+    Trigrams index the vocabulary of distinct tokens rather than documents, so a
+    query term first expands to a few similar or prefix-matching tokens (exact >
+    prefix > fuzzy) and only their postings are scored, scaled by field weight.
+    Postings are arrays of document slots scored with numpy. An updated document
+    gets a new slot and the old one is tombstoned until the next rebuild.
+    """
+
+    def __init__(self, ttl: int = SEARCH_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._building = threading.Lock()
+        self._built_at: Optional[float] = None
+        self._reset()
+
+    def _reset(self):
+        # Vocabulary
+        self._token_ids: Dict[str, int] = {}
+        self._token_trigrams = _Column("int16")
+        self._sorted_tokens: List[str] = []
+        self._trigram_tokens: Dict[str, List[int]] = defaultdict(list)
+        self._trigram_cache: Dict[str, "np.ndarray"] = {}
+        # Postings per token id, with numpy copies cached until the token's postings change
+        self._post_slots: List[List[int]] = []
+        self._post_weights: List[List[float]] = []
+        self._post_cache: Dict[int, Tuple["np.ndarray", "np.ndarray"]] = {}
+        # Documents by slot
+        self._slots: Dict[Tuple[str, str], int] = {}
+        self._docs: List[Optional[Dict]] = []
+        self._alive = _Column("bool", False)
+        self._entity = _Column("int8", -1)
+        self._client = _Column("int32", -1)
+        self._client_ids: Dict[str, int] = {}
+
+    def _token_id(self, token: str) -> int:
+        tid = self._token_ids.get(token)
+        if tid is None:
+            tid = self._token_trigrams.size
+            self._token_ids[token] = tid
+            grams = trigrams(token)
+            self._token_trigrams.append(len(grams))
+            for gram in grams:
+                self._trigram_tokens[gram].append(tid)
+                self._trigram_cache.pop(gram, None)
+            bisect.insort(self._sorted_tokens, token)
+            self._post_slots.append([])
+            self._post_weights.append([])
+        return tid
+
+    def _add(self, entity: str, row: Dict):
+        table, key, weights, label = SEARCH_ENTITIES[entity]
+        doc_key = (entity, str(row[key]))
+        self._remove(doc_key)
+
+        tokens: Dict[int, float] = {}
+        for column, weight in weights.items():
+            for token in tokenize(row.get(column)):
+                tid = self._token_id(token)
+                if weight > tokens.get(tid, 0):
+                    tokens[tid] = weight
+
+        slot = len(self._docs)
+        client_code = row.get("client_code")
+        self._slots[doc_key] = slot
+        self._docs.append({"entity": entity, "id": doc_key[1], "label": (row.get(label) or "")[:120], "client_code": client_code})
+        self._alive.append(True)
+        self._entity.append(ENTITY_CODES[entity])
+        self._client.append(self._client_ids.setdefault(client_code, len(self._client_ids)) if client_code else -1)
+        for tid, weight in tokens.items():
+            self._post_slots[tid].append(slot)
+            self._post_weights[tid].append(weight)
+            self._post_cache.pop(tid, None)
+
+    def _remove(self, doc_key):
+        slot = self._slots.pop(doc_key, None)
+        if slot is not None:
+            self._alive.data[slot] = False
+            self._docs[slot] = None
+
+    def _trigram_postings(self, gram: str) -> "np.ndarray":
+        cached = self._trigram_cache.get(gram)
+        if cached is None:
+            cached = np.asarray(self._trigram_tokens.get(gram, ()), dtype=np.int64)
+            self._trigram_cache[gram] = cached
+        return cached
+
+    def _postings(self, tid: int):
+        cached = self._post_cache.get(tid)
+        if cached is None:
+            cached = (np.asarray(self._post_slots[tid], dtype=np.int64), np.asarray(self._post_weights[tid]))
+            self._post_cache[tid] = cached
+        return cached
+
+    def build(self, db):
+        rows = {}
+        for entity, (table, key, weights, label) in SEARCH_ENTITIES.items():
+            columns = dict.fromkeys([key, "client_code", *weights])
+            rows[entity] = list(iter_select(lambda: db.table(table).select(", ".join(columns)), key))
+        # Index into a staging copy and swap, so queries keep running on the old state meanwhile
+        staging = SearchIndex.__new__(SearchIndex)
+        staging._reset()
+        for entity, entity_rows in rows.items():
+            for row in entity_rows:
+                staging._add(entity, row)
+        with self._lock:
+            self.__dict__.update(vars(staging))
+            self._built_at = time.monotonic()
+        logger.info("Search index built: %s documents, %s tokens", len(self._slots), len(self._token_ids))
+
+    def build_in_background(self, db):
+        def run():
+            if not self._building.acquire(blocking=False):
+                return
+            try:
+                self.build(db)
+            except Exception as e:
+                logger.warning("Search index build failed: %s", e)
+            finally:
+                self._building.release()
+        threading.Thread(target=run, name="search-index", daemon=True).start()
+
+    def ensure_built(self, db):
+        if self._built_at is None:
+            # First use blocks; later staleness is refreshed without holding up queries
+            with self._building:
+                if self._built_at is None:
+                    self.build(db)
+        elif time.monotonic() - self._built_at > self.ttl:
+            self.build_in_background(db)
+
+    # Incremental maintenance from the CRUD write paths; a no-op before the first build
+
+    def upsert(self, entity: str, rows: Iterable[Dict]):
+        if self._built_at is None:
+            return
+        with self._lock:
+            for row in rows:
+                self._add(entity, row)
+
+    def remove(self, entity: str, ids: Iterable):
+        if self._built_at is None:
+            return
+        with self._lock:
+            for id_ in ids:
+                self._remove((entity, str(id_)))
+
+    def remove_clients(self, client_codes: Iterable[str]):
+        """A deleted client takes its proposals and assignments with it (ON DELETE CASCADE)."""
+        if self._built_at is None:
+            return
+        with self._lock:
+            ids = [self._client_ids[c] for c in client_codes if c in self._client_ids]
+            for slot in np.flatnonzero(np.isin(self._client.view(), ids) & self._alive.view()):
+                doc = self._docs[slot]
+                self._remove((doc["entity"], doc["id"]))
+
+    def _expand(self, term: str) -> Dict[int, float]:
+        """Vocabulary tokens matching one query term, with a similarity in (0, 1]."""
+        matches: Dict[int, float] = {}
+        start = bisect.bisect_left(self._sorted_tokens, term)
+        for token in self._sorted_tokens[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not token.startswith(term):
+                break
+            # 1.0 for an exact match, slightly less the more of the token is left to type
+            matches[self._token_ids[token]] = 0.7 + 0.3 * len(term) / len(token)
+
+        if len(term) >= 3:
+            grams = trigrams(term)
+            # Leading trigrams like "  a" are shared by huge numbers of codes, so count with bincount
+            shared = np.bincount(np.concatenate([self._trigram_postings(g) for g in grams]),
+                                 minlength=self._token_trigrams.size)
+            dice = 2 * shared / (len(grams) + self._token_trigrams.view())
+            candidates = np.flatnonzero(dice >= FUZZY_THRESHOLD)
+            if len(candidates) > MAX_FUZZY_EXPANSIONS:
+                candidates = candidates[np.argpartition(-dice[candidates], MAX_FUZZY_EXPANSIONS)[:MAX_FUZZY_EXPANSIONS]]
+            for tid in candidates.tolist():
+                if tid not in matches:
+                    matches[tid] = 0.8 * float(dice[tid])
+        return matches
+
+    def search(self, q: str, limit: int = 20, entities: Optional[Iterable[str]] = None,
+               client_codes: Optional[Iterable[str]] = None) -> List[Dict]:
+        """
+        client_codes, when given, restricts results to those clients and their
+        proposals/assignments (manager scoping).
+        """
+        terms = list(dict.fromkeys(tokenize(q)))[:MAX_QUERY_TERMS]
+        if not terms:
+            return []
+
+        with self._lock:
+            n = len(self._docs)
+            scores = np.zeros(n)
+            matched = np.zeros(n, dtype=np.int16)
+            for term in terms:
+                best = np.zeros(n)
+                for tid, sim in self._expand(term).items():
+                    slots, weights = self._postings(tid)
+                    # A document appears at most once per token, so plain fancy indexing is safe
+                    best[slots] = np.maximum(best[slots], sim * weights)
+                scores += best
+                matched += best > 0
+
+            mask = (matched > 0) & self._alive.view()
+            if entities:
+                mask &= np.isin(self._entity.view(), [ENTITY_CODES[e] for e in entities])
+            if client_codes is not None:
+                mask &= np.isin(self._client.view(), [self._client_ids[c] for c in client_codes if c in self._client_ids])
+            candidates = np.flatnonzero(mask)
+
+            # Documents matching more of the query terms rank first, then by score
+            rank = matched[candidates] * 1000.0 + scores[candidates]
+            if len(candidates) > limit:
+                top = np.argpartition(-rank, limit)[:limit]
+                candidates, rank = candidates[top], rank[top]
+            order = candidates[np.argsort(-rank, kind="stable")]
+            return [{**self._docs[slot], "score": round(float(scores[slot]) / len(terms), 3)} for slot in order]
+
+    def get_stats(self):
+        return {
+            "built": self._built_at is not None,
+            "age_seconds": round(time.monotonic() - self._built_at, 1) if self._built_at is not None else None,
+            "documents": len(self._slots),
+            "slots": len(self._docs),
+            "tokens": len(self._token_ids),
+        }
+
+search_index = SearchIndex()
@@ -0,0 +1,48 @@
+import os
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Optional
+import orjson
+from fastapi import Response
+from pydantic import TypeAdapter
+from utils.metrics import stage
+
+# Rows straight from PostgREST are already JSON types, so list and report endpoints
+# skip per-row model validation; tests/test_serialization.py holds their output to the
+# response models. VALIDATE_RESPONSES=true re-validates every payload at runtime, as a
+# debugging aid only: it costs what skipping validation saves.
+VALIDATE_RESPONSES = os.getenv("VALIDATE_RESPONSES", "false").lower() == "true"
+
+def _default(value: Any):
+    # Decimal fills float fields, so send a number as the response model would; anything else orjson lacks as text
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+class TrustedJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        # orjson handles date/datetime/UUID itself; _default covers the odd value built in Python
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+@lru_cache(maxsize=None)
+def _adapter(model) -> TypeAdapter:
+    return TypeAdapter(model)
+
+def trusted_json(content: Any, response: Optional[Response] = None, model=None) -> TrustedJSONResponse:
+    """
+    Encode a payload of trusted DB rows with orjson. Returning a Response bypasses
+    FastAPI's response_model validation and drops headers set on the injected
+    Response, so those (ETag, Cache-Control) are copied over here.
+    """
+    if VALIDATE_RESPONSES and model is not None:
+        with stage("response.validate"):
+            _adapter(model).validate_python(content)
+    with stage("response.serialize"):
+        out = TrustedJSONResponse(content)
+    if response is not None:
+        out.headers.update(response.headers)
+        if response.status_code:
+            out.status_code = response.status_code
+    return out
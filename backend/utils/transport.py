@@ -0,0 +1,224 @@
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+import httpx
+
+try:
+    import h2  # noqa: F401  (httpx negotiates HTTP/2 over TLS only when h2 is installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DB_HTTP2 = os.getenv("DB_HTTP2", "true").lower() == "true"
+DB_KEEPALIVE_EXPIRY = float(os.getenv("DB_KEEPALIVE_EXPIRY", "60"))
+# Seconds; DB_TIMEOUT bounds each read/write so one stuck response can't hold a worker thread
+DB_CONNECT_TIMEOUT = float(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", "30"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Retries after the first attempt, with full-jitter exponential backoff between them
+DB_RETRIES = int(os.getenv("DB_RETRIES", "2"))
+DB_RETRY_BACKOFF = float(os.getenv("DB_RETRY_BACKOFF", "0.1"))
+DB_RETRY_BACKOFF_MAX = float(os.getenv("DB_RETRY_BACKOFF_MAX", "2"))
+# Consecutive failed calls (each counted once, after its retries) that open the breaker, and how long it stays open
+DB_BREAKER_THRESHOLD = int(os.getenv("DB_BREAKER_THRESHOLD", "5"))
+DB_BREAKER_RESET = float(os.getenv("DB_BREAKER_RESET", "30"))
+
+# PostgREST reads are GETs (and HEAD for count-only); writes and RPCs are POST/PATCH/DELETE
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Gateway / Cloudflare errors: the backend is unreachable or overloaded, not the query at fault
+RETRY_STATUSES = {502, 503, 504, 520}
+# The request never reached the server, so even a write is safe to send again
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+_call_timeout: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("db_call_timeout", default=None)
+
+@contextmanager
+def call_timeout(seconds: float):
+    """Override DB_TIMEOUT for the round trips made inside the block (e.g. a full ledger rebuild)."""
+    token = _call_timeout.set(seconds)
+    try:
+        yield
+    finally:
+        _call_timeout.reset(token)
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised without a round trip while the breaker is open; surfaced to clients as a 503."""
+
+    def __init__(self, message: str, retry_after: float, request: Optional[httpx.Request] = None):
+        super().__init__(message, request=request)
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    closed -> open after `threshold` consecutive failures; open rejects every call
+    for `reset_after` seconds, then half-open lets one probe through: success closes
+    the breaker, failure opens it again.
+    """
+
+    def __init__(self, threshold: int = DB_BREAKER_THRESHOLD, reset_after: float = DB_BREAKER_RESET):
+        self.threshold, self.reset_after = threshold, reset_after
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def allow(self) -> bool:
+        if self.threshold <= 0:
+            return True
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = "half_open"
+            if self.state == "closed" or (self.state == "half_open" and not self._probing):
+                self._probing = self.state == "half_open"
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def retry_after(self) -> float:
+        return max(self.reset_after - (time.monotonic() - self.opened_at), 0.0)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state != "closed":
+                logger.info("Database circuit closed")
+            self.state = "closed"
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.threshold):
+                if self.state == "closed":
+                    logger.warning("Database circuit opened after %d consecutive failures", self.failures)
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._probing = False
+                self.stats["opened"] += 1
+
+class ResilientTransport(httpx.BaseTransport):
+    """
+    Keep-alive connection pool with retries and a circuit breaker in front of it.
+    Only idempotent requests are retried after they may have reached the server;
+    connection failures are retried for any method. The pool is rebuilt in a
+    forked child so gunicorn workers never share sockets with the master.
+    """
+
+    def __init__(self, pool_size: int, http2: bool = DB_HTTP2, retries: int = DB_RETRIES,
+                 backoff: float = DB_RETRY_BACKOFF, backoff_max: float = DB_RETRY_BACKOFF_MAX,
+                 breaker: Optional[CircuitBreaker] = None, keepalive_expiry: float = DB_KEEPALIVE_EXPIRY):
+        self.pool_size = pool_size
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.retries, self.backoff, self.backoff_max = retries, backoff, backoff_max
+        self.keepalive_expiry = keepalive_expiry
+        self.breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._pool: Optional[httpx.HTTPTransport] = None
+        self._pid = None
+        self.stats = {"requests": 0, "retries": 0, "failures": 0, "timeouts": 0}
+
+    def _transport(self) -> httpx.HTTPTransport:
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                # Not closed in a child: the sockets belong to the parent's connections
+                self._pool = httpx.HTTPTransport(
+                    http2=self.http2,
+                    limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size,
+                                        keepalive_expiry=self.keepalive_expiry),
+                )
+                # Callers wait on these rather than in httpcore's pool queue, which drops
+                # connections when more threads than connections contend for them
+                self._slots = threading.BoundedSemaphore(self.pool_size)
+                self._pid = os.getpid()
+            return self._pool
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _sleep(self, attempt: int):
+        time.sleep(random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt)))
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        override = _call_timeout.get()
+        if override is not None:
+            request.extensions["timeout"] = httpx.Timeout(override, connect=DB_CONNECT_TIMEOUT, pool=DB_POOL_TIMEOUT).as_dict()
+        idempotent = request.method in IDEMPOTENT_METHODS
+        # Admitted once per call: its retries belong to the same call (and to the same half-open probe)
+        if not self.breaker.allow():
+            raise CircuitOpenError("Database circuit open; failing fast", self.breaker.retry_after(), request=request)
+        attempt = 0
+        while True:
+            self._count("requests")
+            try:
+                pool, slots = self._transport(), self._slots
+                if not slots.acquire(timeout=request.extensions.get("timeout", {}).get("pool") or DB_POOL_TIMEOUT):
+                    raise httpx.PoolTimeout("No database connection free within the pool timeout", request=request)
+                try:
+                    response = pool.handle_request(request)
+                    # Read here so a body that stalls counts (and retries) like any other failure
+                    response.read()
+                finally:
+                    slots.release()
+            except httpx.TransportError as e:
+                self._count("timeouts" if isinstance(e, httpx.TimeoutException) else "failures")
+                if attempt < self.retries and (idempotent or isinstance(e, UNSENT_ERRORS)):
+                    self._count("retries")
+                    self._sleep(attempt)
+                    attempt += 1
+                    continue
+                self.breaker.record_failure()
+                raise
+            if response.status_code in RETRY_STATUSES:
+                self._count("failures")
+                if attempt < self.retries and idempotent:
+                    response.close()
+                    self._count("retries")
+                    self._sleep(attempt)
+                    attempt += 1
+                    continue
+                self.breaker.record_failure()
+                return response
+            self.breaker.record_success()
+            return response
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.close()
+            self._pool = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pool = self._pool if self._pid == os.getpid() else None
+            stats = dict(self.stats)
+        connections = list(pool._pool.connections) if pool is not None else []
+        return {
+            **stats,
+            "pool_size": self.pool_size,
+            "http2_enabled": self.http2,
+            "connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+            "http2_connections": sum(1 for c in connections if "HTTP/2" in c.info()),
+            "breaker_state": self.breaker.state,
+            "breaker_consecutive_failures": self.breaker.failures,
+            **{f"breaker_{k}": v for k, v in self.breaker.stats.items()},
+        }
+
+def build_http_client(transport: ResilientTransport) -> httpx.Client:
+    """httpx client for the Supabase SDK; its timeout applies to every call unless call_timeout() overrides it."""
+    return httpx.Client(
+        transport=transport,
+        timeout=httpx.Timeout(DB_TIMEOUT, connect=DB_CONNECT_TIMEOUT, pool=DB_POOL_TIMEOUT),
+        follow_redirects=True,
+    )
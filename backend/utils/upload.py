@@ -1,35 +1,159 @@
-import pandas as pd
-from io import BytesIO
-from typing import List, Any, Dict
-from pydantic import ValidationError
-from schemas.client import ClientCreate
-from schemas.assignment import AssignmentCreate
-
-def parse_upload_file(file_content: bytes, filename: str) -> List[Dict[str, Any]]:
-    if filename.endswith('.csv'):
-        df = pd.read_csv(BytesIO(file_content))
-    elif filename.endswith(('.xls', '.xlsx')):
-        df = pd.read_excel(BytesIO(file_content))
+import logging
+import os
+from typing import Iterator, Tuple
+from crud import client as client_crud
+from crud import proposal as proposal_crud
+from crud import assignment as assignment_crud
+from crud import transaction as transaction_crud
+from crud.audit import log_actions
+from utils import jobs
+from utils.validation import validate_frame
+from utils.metrics import StageTimer
+from utils.lazy import lazy_module
+from schemas.audit import AuditLogCreate
+
+logger = logging.getLogger(__name__)
+
+pd = lazy_module("pandas")
+openpyxl = lazy_module("openpyxl")
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+
+def iter_upload_chunks(path: str, chunksize: int = IMPORT_BATCH_SIZE) -> Iterator[Tuple["pd.DataFrame", int]]:
+    """
+    Yield (frame, first_row_number) chunks without loading the whole file. Row numbers are
+    spreadsheet line numbers: the header is line 1, so the first data row is line 2.
+    CSV and .xls cells are read as text so codes keep their leading zeros; validation parses
+    the numeric and date fields.
+    """
+    start = 2
+    if path.endswith('.csv'):
+        for chunk in pd.read_csv(path, chunksize=chunksize, dtype=str, keep_default_na=False, na_values=[""]):
+            yield chunk, start
+            start += len(chunk)
+    elif path.endswith('.xlsx'):
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = wb.worksheets[0].iter_rows(values_only=True)
+            header = [str(h).strip() if h is not None else "" for h in next(rows, [])]
+            batch = []
+            for values in rows:
+                if all(v is None for v in values):
+                    continue
+                batch.append(dict(zip(header, values)))
+                if len(batch) >= chunksize:
+                    yield pd.DataFrame(batch, columns=header), start
+                    start += len(batch)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=header), start
+        finally:
+            wb.close()
+    elif path.endswith('.xls'):
+        # Legacy format has no streaming reader; slice the parsed frame instead
+        df = pd.read_excel(path, dtype=str)
+        for offset in range(0, len(df), chunksize):
+            yield df.iloc[offset:offset + chunksize], start + offset
     else:
         raise ValueError("Unsupported file format. Please upload a CSV or Excel file.")
-    
-    # Replace NaN with None for Pydantic validation
-    return df.where(pd.notnull(df), None).to_dict(orient='records')
-
-def validate_clients(data: List[Dict[str, Any]]) -> List[ClientCreate]:
-    validated_clients = []
-    errors = []
-    
-    for index, row in enumerate(data):
-        try:
-            # Map common variations if needed (e.g. 'Name' to 'client_name')
-            # For simplicity, we expect headers to match schema keys
-            client = ClientCreate(**row)
-            validated_clients.append(client)
-        except ValidationError as e:
-            errors.append(f"Row {index + 1}: {str(e)}")
-            
-    if errors:
-        raise ValueError("\n".join(errors))
-        
-    return validated_clients
+
+# entity -> (bulk insert, bulk delete for rollback, primary key, audit entity_type)
+IMPORTERS = {
+    "clients": (client_crud.create_clients, client_crud.delete_clients, "client_code", "client"),
+    "proposals": (proposal_crud.create_proposals, proposal_crud.delete_proposals, "proposal_id", "proposal"),
+    "assignments": (assignment_crud.create_assignments, assignment_crud.delete_assignments, "assignment_code", "assignment"),
+    "invoices": (transaction_crud.create_invoices, transaction_crud.delete_invoices, "invoice_no", "invoice"),
+    "receipts": (transaction_crud.create_receipts, transaction_crud.delete_receipts, "receipt_id", "receipt"),
+}
+
+def _rollback(db, job, inserted_keys, user_id: str) -> int:
+    """
+    Delete the rows a failed import wrote. Each bulk insert already logged a CREATE per row,
+    so the deletions are audited too, synchronously, or the trail would show records that
+    never stayed in the database. Returns how many rows were removed.
+    """
+    if not inserted_keys:
+        return 0
+    _, bulk_delete, _, entity_type = IMPORTERS[job["entity"]]
+    try:
+        bulk_delete(db, inserted_keys)
+    except Exception:
+        logger.exception("Import %s: rollback failed, %d %s remain in the database",
+                         job["job_id"], len(inserted_keys), job["entity"])
+        return 0
+    try:
+        log_actions(db, [
+            AuditLogCreate(
+                user_id=str(user_id),
+                action="DELETE",
+                entity_type=entity_type,
+                entity_id=str(key),
+                details=f"Import rolled back: {job['filename']}"
+            )
+            for key in inserted_keys
+        ], sync=True)
+    except Exception:
+        logger.exception("Import %s: rolled back %d %s but could not audit the rollback",
+                         job["job_id"], len(inserted_keys), job["entity"])
+    return len(inserted_keys)
+
+def run_import(db, job_id: str, path: str, user_id: str):
+    """
+    Background import: validate the whole file first, then batch-insert it.
+    Any insert failure deletes the rows this job already wrote so the import is all-or-nothing.
+    """
+    job = jobs.get_job(job_id)
+    entity = job["entity"]
+    bulk_create, _, key, _ = IMPORTERS[entity]
+    inserted_keys = []
+    # Reading/parsing the file, validating rows and the bulk inserts, each summed over both passes
+    parse, validate, insert = (StageTimer(f"upload.{name}") for name in ("parse", "validate", "insert"))
+    try:
+        jobs.update_job(job, status="validating")
+        total = 0
+        errors = []
+        seen_keys = set()
+        for frame, start in parse.wrap(iter_upload_chunks(path), record=False):
+            with validate.measure():
+                _, chunk_errors = validate_frame(db, entity, frame, start, seen_keys)
+            errors.extend(chunk_errors)
+            total += len(frame)
+
+        if errors:
+            failed_rows = len({e["row"] for e in errors})
+            jobs.update_job(
+                job, status="failed", rows_processed=total, rows_failed=failed_rows, errors=errors,
+                summary=f"Validation failed for {failed_rows} of {total} rows; nothing was imported"
+            )
+            return
+
+        jobs.update_job(job, status="importing", rows_total=total)
+        processed = 0
+        for frame, start in parse.wrap(iter_upload_chunks(path), record=False):
+            with validate.measure():
+                valid, chunk_errors = validate_frame(db, entity, frame, start)
+            if chunk_errors:
+                # Data changed underneath us since the validation pass (e.g. a concurrent insert)
+                raise ValueError(f"Row {chunk_errors[0]['row']}: {chunk_errors[0]['error']}")
+            with insert.measure():
+                created = bulk_create(db, valid, user_id)
+            inserted_keys.extend(row[key] for row in created)
+            processed += len(frame)
+            jobs.update_job(job, rows_processed=processed, rows_inserted=len(inserted_keys))
+
+        jobs.update_job(job, status="completed", summary=f"Successfully uploaded {len(inserted_keys)} {entity}")
+    except Exception as e:
+        rolled_back = _rollback(db, job, inserted_keys, user_id)
+        errors = job["errors"] + [{"row": None, "error": str(e)}]
+        if rolled_back < len(inserted_keys):
+            errors.append({"row": None, "error": f"Rollback failed: {len(inserted_keys)} inserted rows remain"})
+        jobs.update_job(
+            job, status="failed", rows_inserted=len(inserted_keys) - rolled_back, errors=errors,
+            summary=f"Import failed: {e}. Rolled back {rolled_back} inserted rows"
+        )
+    finally:
+        parse.record()
+        validate.record()
+        insert.record()
+        if os.path.exists(path):
+            os.remove(path)
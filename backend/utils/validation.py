@@ -0,0 +1,250 @@
+import re
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple, Union, get_args, get_origin
+from uuid import UUID
+from pydantic import EmailStr, ValidationError
+from schemas.client import ClientCreate, CLIENT_STATUSES
+from schemas.proposal import ProposalCreate, PROPOSAL_STATUSES
+from schemas.assignment import AssignmentCreate, ASSIGNMENT_STATUSES
+from schemas.transaction import InvoiceCreate, ReceiptCreate, INVOICE_STATUSES, RECEIPT_MODES
+from utils.lazy import lazy_module
+from utils.pagination import batched
+
+pd = lazy_module("pandas")
+
+EMAIL_RE = r"[^@\s]+@[^@\s]+\.[^@\s]+"
+UUID_RE = r"[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}"
+
+# Spreadsheet headers people actually use, after lower-casing and snake-casing
+COMMON_ALIASES = {
+    "client": "client_code",
+    "client_id": "client_code",
+    "service": "service_line",
+}
+
+ENTITY_SPECS = {
+    "clients": {
+        "model": ClientCreate,
+        "key": "client_code",
+        "enums": {"status": CLIENT_STATUSES},
+        "foreign_keys": {},
+        "aliases": {
+            "code": "client_code",
+            "name": "client_name",
+            "client": "client_name",
+            "group": "group_name",
+            "contact": "primary_contact_name",
+            "contact_name": "primary_contact_name",
+            "email": "primary_contact_email",
+            "contact_email": "primary_contact_email",
+            "partner": "relationship_partner",
+        },
+    },
+    "proposals": {
+        "model": ProposalCreate,
+        "key": None,
+        "enums": {"status": PROPOSAL_STATUSES},
+        "foreign_keys": {"client_code": ("clients", "client_code")},
+        "aliases": {
+            "scope": "scope_summary",
+            "fees": "estimated_fees",
+            "estimated_fee": "estimated_fees",
+            "issued_on": "issued_date",
+            "date": "issued_date",
+            "reason": "outcome_reason",
+        },
+    },
+    "assignments": {
+        "model": AssignmentCreate,
+        "key": "assignment_code",
+        "enums": {"status": ASSIGNMENT_STATUSES},
+        "foreign_keys": {
+            "client_code": ("clients", "client_code"),
+            "proposal_id": ("proposals", "proposal_id"),
+        },
+        "aliases": {
+            "code": "assignment_code",
+            "fee": "contracted_fee",
+            "fees": "contracted_fee",
+            "partner": "partner_lead",
+            "start": "start_date",
+            "end": "end_date",
+        },
+    },
+    "invoices": {
+        "model": InvoiceCreate,
+        "key": "invoice_no",
+        "enums": {"status": INVOICE_STATUSES},
+        "foreign_keys": {"assignment_code": ("assignments", "assignment_code")},
+        "aliases": {
+            "invoice_number": "invoice_no",
+            "assignment": "assignment_code",
+            "date": "invoice_date",
+            "amount": "amount_before_tax",
+            "gst": "gst_pct",
+            "due": "due_date",
+        },
+    },
+    "receipts": {
+        "model": ReceiptCreate,
+        "key": None,
+        "enums": {"mode": RECEIPT_MODES},
+        "foreign_keys": {"invoice_no": ("invoices", "invoice_no")},
+        "aliases": {
+            "invoice": "invoice_no",
+            "invoice_number": "invoice_no",
+            "amount": "amount_received",
+            "tds": "tds_amount",
+            "date": "receipt_date",
+        },
+    },
+}
+
+def _base_type(annotation):
+    # Optional[X] -> X
+    if get_origin(annotation) is Union:
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        return args[0] if args else annotation
+    return annotation
+
+def normalize_headers(df: "pd.DataFrame", entity: str) -> "pd.DataFrame":
+    spec = ENTITY_SPECS[entity]
+    fields = spec["model"].model_fields
+    aliases = {**COMMON_ALIASES, **spec["aliases"]}
+    renamed = {}
+    for column in df.columns:
+        name = re.sub(r"[\s\-\.]+", "_", str(column).strip().lower()).strip("_")
+        if name not in fields:
+            name = aliases.get(name) or name
+        renamed[column] = name
+    df = df.rename(columns=renamed)
+    # First occurrence wins if two headers collapse to the same field
+    return df.loc[:, ~df.columns.duplicated()]
+
+def _error(errors, rows: "pd.Series", column: str, values: "pd.Series", message: str):
+    for row, value in zip(rows, values):
+        errors.append({"row": int(row), "column": column, "value": None if pd.isna(value) else str(value), "error": message})
+
+def _coerce_str(series: "pd.Series") -> "pd.Series":
+    # Uploads are read as text, so "007" stays "007"; only numeric fields are parsed as numbers
+    return series.map(lambda v: str(v).strip(), na_action="ignore")
+
+def _coerce_dates(series: "pd.Series") -> "pd.Series":
+    parsed = pd.to_datetime(series, errors="coerce", format="ISO8601")
+    retry = parsed.isna() & series.notna()
+    if retry.any():
+        # Local spreadsheets use dd/mm/yyyy
+        parsed[retry] = pd.to_datetime(series[retry], errors="coerce", dayfirst=True, format="mixed")
+    return parsed
+
+def _fetch_existing(db, table: str, column: str, values: List[Any]) -> set:
+    found = set()
+    for batch in batched(values):
+        rows = db.table(table).select(column).in_(column, batch).execute().data
+        found.update(str(r[column]) for r in rows)
+    return found
+
+def validate_frame(db, entity: str, df: "pd.DataFrame", start_row: int = 1,
+                   seen_keys: Optional[set] = None) -> Tuple[List[Any], List[Dict[str, Any]]]:
+    """
+    Column-wise validation of an uploaded chunk.
+    Returns the models for rows without errors plus a per-row/per-column error report.
+    start_row is the number reported for the chunk's first row (iter_upload_chunks passes file line numbers).
+    Pass the same seen_keys set across chunks to catch duplicate keys between chunks.
+    """
+    spec = ENTITY_SPECS[entity]
+    model = spec["model"]
+    df = normalize_headers(df, entity).reset_index(drop=True)
+    df = df.astype(object).where(pd.notnull(df), None)
+    df = df.replace(r"^\s*$", None, regex=True)
+    rows = pd.Series(range(start_row, start_row + len(df)))
+    errors: List[Dict[str, Any]] = []
+    out = pd.DataFrame(index=df.index)
+
+    for name, field in model.model_fields.items():
+        if name not in df.columns:
+            if field.is_required():
+                _error(errors, rows, name, pd.Series([None] * len(df)), "Column is required")
+            continue
+
+        raw = df[name]
+        present = raw.notna()
+        if field.is_required():
+            missing = ~present
+            _error(errors, rows[missing], name, raw[missing], "Value is required")
+
+        base = _base_type(field.annotation)
+        if base in (float, int):
+            values = pd.to_numeric(raw, errors="coerce")
+            bad = present & values.isna()
+            if base is int:
+                bad |= present & values.notna() & (values % 1 != 0)
+                values = values.map(lambda v: int(v), na_action="ignore")
+            _error(errors, rows[bad], name, raw[bad], f"Expected a {'whole ' if base is int else ''}number")
+        elif base is date:
+            parsed = _coerce_dates(raw)
+            bad = present & parsed.isna()
+            _error(errors, rows[bad], name, raw[bad], "Expected a date (YYYY-MM-DD or DD/MM/YYYY)")
+            values = parsed.dt.date.where(parsed.notna(), None)
+        elif base is UUID:
+            values = _coerce_str(raw)
+            bad = present & ~values.fillna("").str.fullmatch(UUID_RE)
+            _error(errors, rows[bad], name, raw[bad], "Expected a user id (UUID)")
+        elif base is EmailStr:
+            values = _coerce_str(raw)
+            bad = present & ~values.fillna("").str.fullmatch(EMAIL_RE)
+            _error(errors, rows[bad], name, raw[bad], "Expected an email address")
+        else:
+            values = _coerce_str(raw)
+
+        allowed = spec["enums"].get(name)
+        if allowed:
+            bad = present & ~values.isin(allowed)
+            _error(errors, rows[bad], name, raw[bad], f"Must be one of: {', '.join(allowed)}")
+
+        out[name] = values
+
+    key = spec["key"]
+    if key and key in out.columns:
+        keys = out[key]
+        dup = keys.notna() & keys.duplicated(keep=False)
+        if seen_keys is not None:
+            dup |= keys.isin(seen_keys)
+            seen_keys.update(keys.dropna())
+        _error(errors, rows[dup], key, keys[dup], "Duplicate value in file")
+        existing = _fetch_existing(db, entity, key, keys.dropna().unique().tolist())
+        clash = keys.isin(existing)
+        _error(errors, rows[clash], key, keys[clash], "Already exists")
+
+    # One lookup per referenced table for the distinct values in this chunk
+    for column, (table, ref_column) in spec["foreign_keys"].items():
+        if column not in out.columns:
+            continue
+        refs = out[column]
+        distinct = [str(v) for v in refs.dropna().unique().tolist()]
+        if not distinct:
+            continue
+        existing = _fetch_existing(db, table, ref_column, distinct)
+        bad = refs.notna() & ~refs.astype(str).isin(existing)
+        _error(errors, rows[bad], column, refs[bad], f"Unknown {ref_column} (not found in {table})")
+
+    failed_rows = {e["row"] for e in errors}
+    valid = []
+    for row_number, record in zip(rows, out.to_dict(orient="records")):
+        if row_number in failed_rows:
+            continue
+        # Only pass the values present in the file so DB defaults apply to the rest
+        values = {k: v for k, v in record.items() if v is not None and not (isinstance(v, float) and pd.isna(v))}
+        # The column checks above give the friendlier messages; the model still has the final say,
+        # so validators on the Create schemas apply to imports as they do to single-row writes
+        try:
+            valid.append(model.model_validate(values))
+        except ValidationError as e:
+            for detail in e.errors():
+                column = str(detail["loc"][0]) if detail["loc"] else None
+                value = values.get(column)
+                errors.append({"row": int(row_number), "column": column, "value": None if value is None else str(value),
+                               "error": detail["msg"].removeprefix("Value error, ")})
+
+    errors.sort(key=lambda e: e["row"])
+    return valid, errors
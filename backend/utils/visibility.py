@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, Optional
+from utils.pagination import iter_select
+
+# Writes made through this worker update the index in place; a periodic rebuild
+# picks up writes made by other workers or directly in the database.
+VISIBILITY_INDEX_TTL = int(os.getenv("VISIBILITY_INDEX_TTL", "300"))
+
+ASSIGNMENT_ROLE_COLUMNS = ("partner_lead", "director", "manager")
+
+class VisibilityIndex:
+    """
+    user id -> client_codes the user may see: clients where they are the
+    relationship partner, plus clients of assignments where they are tagged
+    as partner lead, director or manager. Mirrors the clients RLS policy.
+    Each (user, client) pair is reference counted by the rows granting it,
+    so removing one assignment never hides a client another row still grants.
+    """
+
+    def __init__(self, ttl: int = VISIBILITY_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._built_at: Optional[float] = None
+        self._refs: Dict[str, Counter] = {}
+        # Last contribution of each row, so updates and deletes can be undone
+        self._client_partner: Dict[str, str] = {}
+        self._assignment_grants: Dict[str, tuple] = {}
+
+    def _grant(self, user_id: str, client_code: str, delta: int):
+        refs = self._refs.setdefault(user_id, Counter())
+        refs[client_code] += delta
+        if refs[client_code] <= 0:
+            del refs[client_code]
+            if not refs:
+                del self._refs[user_id]
+
+    def _set_client(self, client_code: str, partner: Optional[str]):
+        old = self._client_partner.pop(client_code, None)
+        if old:
+            self._grant(old, client_code, -1)
+        if partner:
+            self._client_partner[client_code] = str(partner)
+            self._grant(str(partner), client_code, 1)
+
+    def _set_assignment(self, assignment_code: str, client_code: Optional[str], users: Iterable[str]):
+        old = self._assignment_grants.pop(assignment_code, None)
+        if old:
+            old_client, old_users = old
+            for user_id in old_users:
+                self._grant(user_id, old_client, -1)
+        users = frozenset(str(u) for u in users if u)
+        if client_code and users:
+            self._assignment_grants[assignment_code] = (client_code, users)
+            for user_id in users:
+                self._grant(user_id, client_code, 1)
+
+    def build(self, db):
+        clients = list(iter_select(lambda: db.table("clients").select("client_code, relationship_partner"), "client_code"))
+        assignments = list(iter_select(
+            lambda: db.table("assignments").select("assignment_code, client_code, " + ", ".join(ASSIGNMENT_ROLE_COLUMNS)),
+            "assignment_code"
+        ))
+        with self._lock:
+            self._refs, self._client_partner, self._assignment_grants = {}, {}, {}
+            for row in clients:
+                self._set_client(row["client_code"], row.get("relationship_partner"))
+            for row in assignments:
+                self._set_assignment(row["assignment_code"], row.get("client_code"),
+                                     (row.get(c) for c in ASSIGNMENT_ROLE_COLUMNS))
+            self._built_at = time.monotonic()
+
+    def _is_fresh(self) -> bool:
+        return self._built_at is not None and time.monotonic() - self._built_at < self.ttl
+
+    def visible_clients(self, db, user_id: str) -> FrozenSet[str]:
+        if not self._is_fresh():
+            # One thread rebuilds; concurrent callers wait for it instead of each scanning the tables
+            with self._build_lock:
+                if not self._is_fresh():
+                    self.build(db)
+        with self._lock:
+            return frozenset(self._refs.get(str(user_id), ()))
+
+    # Incremental maintenance, called by the CRUD write paths with the rows PostgREST returned.
+    # Nothing to do before the first build, which loads everything anyway.
+
+    def client_changed(self, row: Dict):
+        if self._built_at is None or "relationship_partner" not in row:
+            return
+        with self._lock:
+            self._set_client(row["client_code"], row.get("relationship_partner"))
+
+    def assignment_changed(self, row: Dict):
+        if self._built_at is None:
+            return
+        with self._lock:
+            self._set_assignment(row["assignment_code"], row.get("client_code"),
+                                 (row.get(c) for c in ASSIGNMENT_ROLE_COLUMNS))
+
+    def clients_deleted(self, client_codes: Iterable[str]):
+        if self._built_at is None:
+            return
+        codes = set(client_codes)
+        with self._lock:
+            for code in codes:
+                self._set_client(code, None)
+            # Assignments of a deleted client go with it (ON DELETE CASCADE)
+            for assignment_code, (client_code, _) in list(self._assignment_grants.items()):
+                if client_code in codes:
+                    self._set_assignment(assignment_code, None, ())
+
+    def assignments_deleted(self, assignment_codes: Iterable[str]):
+        if self._built_at is None:
+            return
+        with self._lock:
+            for code in assignment_codes:
+                self._set_assignment(code, None, ())
+
+    def reset(self):
+        with self._lock:
+            self._built_at = None
+
+    def get_stats(self):
+        return {
+            "built": self._built_at is not None,
+            "age_seconds": round(time.monotonic() - self._built_at, 1) if self._built_at is not None else None,
+            "users": len(self._refs),
+            "clients": len(self._client_partner),
+            "assignments": len(self._assignment_grants),
+        }
+
+visibility_index = VisibilityIndex()
@@ -44,8 +44,8 @@ const NewAssignmentPage = () => {
         const fetchData = async () => {
             try {
                 const [clientsData, proposalsData] = await Promise.all([
-                    api.get('/clients'),
-                    api.get('/proposals')
+                    api.list('/clients'),
+                    api.list('/proposals')
                 ]);
                 setClients(clientsData);
                 setProposals(proposalsData.filter((p: Proposal) => p.status === 'Accepted'));
@@ -30,7 +30,7 @@ const AssignmentsPage = () => {
         const fetchAssignments = async () => {
             try {
                 setLoading(true);
-                const data = await api.get('/assignments');
+                const data = await api.list('/assignments');
                 setAssignments(data);
                 setError(null);
             } catch (err: any) {
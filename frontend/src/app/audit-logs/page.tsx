@@ -33,7 +33,7 @@ const AuditLogsPage = () => {
             try {
                 setLoading(true);
                 const data = await api.get('/audit-logs');
-                setLogs(data);
+                setLogs(data.items);
                 setError(null);
             } catch (err: any) {
                 console.error('Error fetching audit logs:', err);
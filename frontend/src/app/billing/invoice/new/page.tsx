@@ -35,7 +35,7 @@ const NewInvoicePage = () => {
     useEffect(() => {
         const fetchAssignments = async () => {
             try {
-                const data = await api.get('/assignments');
+                const data = await api.list('/assignments');
                 setAssignments(data);
             } catch (err) {
                 console.error('Error fetching assignments:', err);
@@ -34,8 +34,8 @@ const BillingPage = () => {
             try {
                 setLoading(true);
                 const [invoicesData, receiptsData] = await Promise.all([
-                    api.get('/invoices'),
-                    api.get('/receipts')
+                    api.list('/invoices'),
+                    api.list('/receipts')
                 ]);
                 setInvoices(invoicesData);
                 setReceipts(receiptsData);
@@ -70,6 +70,7 @@ const BillingPage = () => {
     const getInvoiceStatusStyle = (status: string) => {
         switch (status) {
             case 'Paid': return 'bg-emerald-100 text-emerald-700';
+            case 'Part-Paid': return 'bg-amber-100 text-amber-700';
             case 'Issued': return 'bg-blue-100 text-blue-700';
             case 'Overdue': return 'bg-rose-100 text-rose-700';
             case 'Cancelled': return 'bg-slate-100 text-slate-700';
@@ -33,7 +33,7 @@ const NewReceiptPage = () => {
     useEffect(() => {
         const fetchInvoices = async () => {
             try {
-                const data = await api.get('/invoices');
+                const data = await api.list('/invoices');
                 // Only show uncollected (simplified: just list all issued invoices)
                 setInvoices(data.filter((i: Invoice) => i.status !== 'Paid'));
             } catch (err) {
@@ -26,7 +26,7 @@ const ClientsPage = () => {
         const fetchClients = async () => {
             try {
                 setLoading(true);
-                const data = await api.get('/clients');
+                const data = await api.list('/clients');
                 setClients(data);
                 setError(null);
             } catch (err: any) {
@@ -58,8 +58,8 @@ const ClientsPage = () => {
 
         try {
             setLoadingExport(true); // Using same loading state for simplicity or add loadingUpload
-            await api.uploadFile('clients', file);
-            alert('Clients uploaded successfully!');
+            const job = await api.uploadFile('clients', file);
+            alert(job.summary || 'Clients uploaded successfully!');
             window.location.reload(); // Refresh to show new data
         } catch (err: any) {
             console.error('Upload failed:', err);
@@ -30,30 +30,20 @@ export default function Home() {
       try {
         setLoading(true);
 
-        // Fetch base counts
-        const [clients, proposals, assignments] = await Promise.all([
-          api.get('/clients'),
-          api.get('/proposals'),
-          api.get('/assignments')
-        ]);
-
-        let billingStats = { outstanding: 0 };
-        // Role-restricted reporting
-        if (role === 'PARTNER' || role === 'DIRECTOR') {
-          try {
-            billingStats = await api.get('/reports/billing');
-          } catch (e) {
-            console.warn('Could not fetch billing report:', e);
-          }
+        // One request; the backend fans out to every section concurrently
+        const { sections, errors } = await api.get('/dashboard');
+        if (errors && Object.keys(errors).length) {
+          console.warn('Some dashboard sections failed:', errors);
         }
+        const proposalStats = sections.proposal_stats || {};
 
         setData({
-          activeClients: clients.length,
-          openProposals: proposals.filter((p: any) => p.status === 'Issued' || p.status === 'Draft').length,
-          ongoingAssignments: assignments.filter((a: any) => a.status === 'Ongoing').length,
-          overdueInvoices: 0, // Simplified for now
-          recentProposals: proposals.slice(0, 5),
-          recentAssignments: assignments.slice(0, 5)
+          activeClients: sections.active_clients ?? 0,
+          openProposals: (proposalStats['Issued'] || 0) + (proposalStats['Draft'] || 0),
+          ongoingAssignments: sections.ongoing_assignments ?? 0,
+          overdueInvoices: sections.overdue_invoices ?? 0,
+          recentProposals: sections.recent_proposals || [],
+          recentAssignments: sections.recent_assignments || []
         });
       } catch (err) {
         console.error('Error fetching dashboard data:', err);
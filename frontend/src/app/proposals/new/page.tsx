@@ -33,7 +33,7 @@ const NewProposalPage = () => {
     useEffect(() => {
         const fetchClients = async () => {
             try {
-                const data = await api.get('/clients');
+                const data = await api.list('/clients');
                 setClients(data);
             } catch (err) {
                 console.error('Error fetching clients:', err);
@@ -29,7 +29,7 @@ const ProposalsPage = () => {
         const fetchProposals = async () => {
             try {
                 setLoading(true);
-                const data = await api.get('/proposals');
+                const data = await api.list('/proposals');
                 setProposals(data);
                 setError(null);
             } catch (err: any) {
@@ -26,6 +26,20 @@ export const api = {
         return response.json();
     },
 
+    // Follows next_cursor on paginated list endpoints and returns every item
+    async list(endpoint: string, params: Record<string, string> = {}) {
+        const items: any[] = [];
+        let cursor: string | null = null;
+        do {
+            const query = new URLSearchParams({ limit: '500', ...params });
+            if (cursor) query.set('cursor', cursor);
+            const page = await this.get(`${endpoint}?${query.toString()}`);
+            items.push(...page.items);
+            cursor = page.next_cursor;
+        } while (cursor);
+        return items;
+    },
+
     async post(endpoint: string, data: any) {
         const headers = await getAuthHeaders();
         const response = await fetch(`${API_BASE_URL}${endpoint}`, {
@@ -112,6 +126,16 @@ export const api = {
             throw new Error(errorData.detail || `Upload error: ${response.statusText}`);
         }
 
-        return response.json();
+        // Uploads run as background jobs; poll until the import finishes
+        let job = await response.json();
+        while (job.status !== 'completed' && job.status !== 'failed') {
+            await new Promise((resolve) => setTimeout(resolve, 1000));
+            job = await this.get(`/upload/jobs/${job.job_id}`);
+        }
+        if (job.status === 'failed') {
+            const details = job.errors.slice(0, 5).map((e: any) => e.row ? `Row ${e.row}${e.column ? ` (${e.column})` : ''}: ${e.error}` : e.error).join('\n');
+            throw new Error(`${job.summary}${details ? `\n${details}` : ''}`);
+        }
+        return job;
     },
 };
@@ -128,3 +128,158 @@ $$ LANGUAGE plpgsql SECURITY DEFINER;
 CREATE OR REPLACE TRIGGER on_auth_user_created
   AFTER INSERT ON auth.users
   FOR EACH ROW EXECUTE PROCEDURE public.handle_new_user();
+
+-- 11. Reporting Aggregates (called from the API via RPC so only aggregate rows cross the wire)
+CREATE OR REPLACE FUNCTION public.report_billing_summary()
+RETURNS TABLE (total_billed NUMERIC, total_collected NUMERIC, outstanding NUMERIC) AS $$
+  WITH billed AS (
+    SELECT COALESCE(SUM(amount_with_tax), 0) AS total FROM public.invoices
+  ), collected AS (
+    SELECT COALESCE(SUM(COALESCE(amount_received, 0) + COALESCE(tds_amount, 0)), 0) AS total FROM public.receipts
+  )
+  SELECT billed.total, collected.total, billed.total - collected.total
+  FROM billed, collected;
+$$ LANGUAGE sql STABLE;
+
+-- Open balance per invoice as of a date, net of receipts and TDS; the API buckets these by age
+DROP FUNCTION IF EXISTS public.report_ar_aging(DATE);
+CREATE OR REPLACE FUNCTION public.report_open_invoices(as_of DATE DEFAULT CURRENT_DATE)
+RETURNS TABLE (invoice_no TEXT, assignment_code TEXT, client_code TEXT, partner_lead UUID,
+               invoice_date DATE, due_date DATE, outstanding NUMERIC) AS $$
+  SELECT i.invoice_no, i.assignment_code, a.client_code, a.partner_lead, i.invoice_date, i.due_date,
+         i.amount_with_tax - COALESCE(r.settled, 0)
+  FROM public.invoices i
+  LEFT JOIN public.assignments a ON a.assignment_code = i.assignment_code
+  LEFT JOIN (
+    SELECT rc.invoice_no, SUM(COALESCE(rc.amount_received, 0) + COALESCE(rc.tds_amount, 0)) AS settled
+    FROM public.receipts rc
+    WHERE rc.receipt_date <= as_of
+    GROUP BY rc.invoice_no
+  ) r ON r.invoice_no = i.invoice_no
+  WHERE i.invoice_date <= as_of
+    AND COALESCE(i.status, '') <> 'Cancelled'
+    AND i.amount_with_tax - COALESCE(r.settled, 0) > 0;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION public.report_proposal_stats()
+RETURNS TABLE (status TEXT, count BIGINT) AS $$
+  SELECT status, COUNT(*) FROM public.proposals GROUP BY status;
+$$ LANGUAGE sql STABLE;
+
+CREATE INDEX IF NOT EXISTS idx_invoices_status_date ON public.invoices (status, invoice_date);
+CREATE INDEX IF NOT EXISTS idx_receipts_invoice_date ON public.receipts (invoice_no, receipt_date);
+
+-- 12. Receivables Ledger (maintained by ledger_refresh after every invoice/receipt write)
+CREATE TABLE IF NOT EXISTS public.invoice_ledger (
+    invoice_no TEXT PRIMARY KEY REFERENCES public.invoices(invoice_no) ON DELETE CASCADE,
+    client_code TEXT,
+    assignment_code TEXT,
+    invoice_date DATE,
+    due_date DATE,
+    billed DECIMAL NOT NULL DEFAULT 0,
+    paid DECIMAL NOT NULL DEFAULT 0,
+    tds DECIMAL NOT NULL DEFAULT 0,
+    outstanding DECIMAL NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS public.client_ledger (
+    client_code TEXT PRIMARY KEY REFERENCES public.clients(client_code) ON DELETE CASCADE,
+    billed DECIMAL NOT NULL DEFAULT 0,
+    paid DECIMAL NOT NULL DEFAULT 0,
+    tds DECIMAL NOT NULL DEFAULT 0,
+    outstanding DECIMAL NOT NULL DEFAULT 0,
+    open_invoices INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_invoice_ledger_client ON public.invoice_ledger (client_code, invoice_date);
+CREATE INDEX IF NOT EXISTS idx_invoice_ledger_open ON public.invoice_ledger (invoice_no) WHERE outstanding > 0;
+
+ALTER TABLE public.invoice_ledger ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.client_ledger ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Allow all actions for authenticated users" ON public.invoice_ledger FOR ALL USING (auth.role() = 'authenticated');
+CREATE POLICY "Allow all actions for authenticated users" ON public.client_ledger FOR ALL USING (auth.role() = 'authenticated');
+
+-- Recompute the given invoices (all when NULL) from their receipts, roll the affected
+-- clients up into client_ledger and move invoice status to Part-Paid/Paid.
+CREATE OR REPLACE FUNCTION public.ledger_refresh(p_invoice_nos TEXT[] DEFAULT NULL, p_client_codes TEXT[] DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+  affected_clients TEXT[];
+  refreshed INTEGER;
+BEGIN
+  SELECT ARRAY(
+    SELECT DISTINCT c FROM (
+      SELECT a.client_code AS c
+      FROM public.invoices i JOIN public.assignments a ON a.assignment_code = i.assignment_code
+      WHERE p_invoice_nos IS NULL OR i.invoice_no = ANY(p_invoice_nos)
+      UNION
+      SELECT unnest(p_client_codes)
+    ) s WHERE c IS NOT NULL ORDER BY c
+  ) INTO affected_clients;
+
+  -- Serialize concurrent refreshes per client so the roll-up never reads a half-applied state
+  PERFORM pg_advisory_xact_lock(hashtext('ledger:' || c)) FROM unnest(affected_clients) AS c;
+
+  INSERT INTO public.invoice_ledger AS l (invoice_no, client_code, assignment_code, invoice_date, due_date,
+                                          billed, paid, tds, outstanding, updated_at)
+  SELECT i.invoice_no, a.client_code, i.assignment_code, i.invoice_date, i.due_date,
+         billed.amount,
+         COALESCE(SUM(r.amount_received), 0),
+         COALESCE(SUM(r.tds_amount), 0),
+         billed.amount - COALESCE(SUM(r.amount_received), 0) - COALESCE(SUM(r.tds_amount), 0),
+         timezone('utc'::text, now())
+  FROM public.invoices i
+  LEFT JOIN public.assignments a ON a.assignment_code = i.assignment_code
+  LEFT JOIN public.receipts r ON r.invoice_no = i.invoice_no
+  -- Cancelled invoices stay in the ledger but carry nothing receivable
+  CROSS JOIN LATERAL (
+    SELECT CASE WHEN i.status = 'Cancelled' THEN 0 ELSE COALESCE(i.amount_with_tax, 0) END AS amount
+  ) billed
+  WHERE p_invoice_nos IS NULL OR i.invoice_no = ANY(p_invoice_nos)
+  GROUP BY i.invoice_no, a.client_code, billed.amount
+  ON CONFLICT (invoice_no) DO UPDATE SET
+    client_code = EXCLUDED.client_code,
+    assignment_code = EXCLUDED.assignment_code,
+    invoice_date = EXCLUDED.invoice_date,
+    due_date = EXCLUDED.due_date,
+    billed = EXCLUDED.billed,
+    paid = EXCLUDED.paid,
+    tds = EXCLUDED.tds,
+    outstanding = EXCLUDED.outstanding,
+    updated_at = EXCLUDED.updated_at;
+  GET DIAGNOSTICS refreshed = ROW_COUNT;
+
+  UPDATE public.invoices i SET status = CASE
+      WHEN l.paid + l.tds > 0 AND l.outstanding <= 0.005 THEN 'Paid'
+      WHEN l.paid + l.tds > 0 THEN 'Part-Paid'
+      WHEN i.status IN ('Paid', 'Part-Paid') THEN 'Issued'
+      ELSE i.status
+    END
+  FROM public.invoice_ledger l
+  WHERE l.invoice_no = i.invoice_no
+    AND (p_invoice_nos IS NULL OR i.invoice_no = ANY(p_invoice_nos))
+    AND COALESCE(i.status, '') <> 'Cancelled';
+
+  DELETE FROM public.client_ledger
+  WHERE p_invoice_nos IS NULL OR client_code = ANY(affected_clients);
+
+  INSERT INTO public.client_ledger (client_code, billed, paid, tds, outstanding, open_invoices, updated_at)
+  SELECT l.client_code, SUM(l.billed), SUM(l.paid), SUM(l.tds), SUM(l.outstanding),
+         COUNT(*) FILTER (WHERE l.outstanding > 0), timezone('utc'::text, now())
+  FROM public.invoice_ledger l
+  JOIN public.clients c ON c.client_code = l.client_code
+  WHERE p_invoice_nos IS NULL OR l.client_code = ANY(affected_clients)
+  GROUP BY l.client_code;
+
+  RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 13. Audit log queries (GET /api/audit-logs lists newest first on (created_at, id), optionally
+-- narrowed by who or what; the archive job's created_at < cutoff scan uses the first index)
+CREATE INDEX IF NOT EXISTS idx_audit_logs_created ON public.audit_logs (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_user ON public.audit_logs (user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_entity ON public.audit_logs (entity_type, entity_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_action ON public.audit_logs (action, created_at DESC, id DESC);